@@ -0,0 +1,27 @@
+"""
+The load-testing and benchmark suite of the API.
+
+`seed` fills a MySQL database with a synthetic, reproducible dataset and
+`run` drives a weighted mix of user journeys through the app at a fixed
+concurrency, reporting the throughput and the p50/p95/p99 latency of every
+route as JSON; `compare` diffs two such reports.
+
+    python -m bench seed --reset --users 2000 --courses 40
+    python -m bench run --concurrency 32 --duration 30 --output base.json
+    python -m bench compare base.json head.json
+
+A deadline rush, e.g. to compare the write-behind mode against the direct
+inserts, is the mix of the write journeys:
+
+    python -m bench run --mix commit_submit=50,message_post=50
+
+`micro` times single code paths in-process against the code they replaced,
+without a MySQL server; bench/README.md records their numbers:
+
+    python -m bench micro --scale 0.1 executor
+
+The app is driven in-process through its ASGI interface unless `--url`
+points to a running server. Both share the `MYSQL_*` and `MEET_TEAM_JWT`
+settings of the app: the seed writes through its pool and the driver signs
+its tokens with its secret.
+"""
@@ -0,0 +1,98 @@
+"""The CLI entry point of the benchmark suite"""
+
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import fields
+
+from . import __doc__ as usage
+from . import micro
+from .driver import MIX, RunConfig, compare, run
+from .seed import SeedSizes, load_world, seed
+
+
+def _mix(value: str) -> dict[str, float]:
+    """Parse `course_browse=50,review_submit=50`"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main(argv: list[str] | None = None) -> int:
+    """The CLI entry point"""
+    parser = argparse.ArgumentParser(
+        prog="bench",
+        description=usage.split("\n\n")[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="fill the database")
+    for size in fields(SeedSizes):
+        seed_parser.add_argument(f"--{size.name}", type=int, default=size.default)
+    seed_parser.add_argument(
+        "--reset", action="store_true", help="wipe the existing rows first"
+    )
+
+    run_parser = commands.add_parser("run", help="drive the load")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--duration", type=float, default=30, help="seconds")
+    run_parser.add_argument("--warmup", type=float, default=5, help="seconds")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--url", default=None, help="a running server")
+    run_parser.add_argument(
+        "--mix",
+        type=_mix,
+        default=dict(MIX),
+        help=f"weighted journeys, default {','.join(f'{k}={v}' for k, v in MIX.items())}",
+    )
+    run_parser.add_argument("--output", default=None, help="write the report here")
+
+    compare_parser = commands.add_parser("compare", help="diff two reports")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+
+    micro_parser = commands.add_parser(
+        "micro", help="time code paths in-process, without MySQL"
+    )
+    micro_parser.add_argument(
+        "scenarios", nargs="*", help=f"default all: {', '.join(micro.SCENARIOS)}"
+    )
+    micro_parser.add_argument(
+        "--scale", type=float, default=1, help="multiply the work done"
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "seed":
+        sizes = SeedSizes(
+            **{size.name: getattr(args, size.name) for size in fields(SeedSizes)}
+        )
+        for table, count in seed(sizes, args.reset).items():
+            print(f"{table:16} {count}")
+    elif args.command == "run":
+        config = RunConfig(
+            args.concurrency, args.duration, args.warmup, args.seed, args.url, args.mix
+        )
+        report = json.dumps(asyncio.run(run(config, load_world())), indent=2)
+        if args.output is None:
+            print(report)
+        else:
+            with open(args.output, "w", encoding="utf-8") as file:
+                file.write(report + "\n")
+    elif args.command == "compare":
+        with (
+            open(args.base, encoding="utf-8") as base,
+            open(args.head, encoding="utf-8") as head,
+        ):
+            print("\n".join(compare(json.load(base), json.load(head))))
+    elif args.command == "micro":
+        print(json.dumps(micro.run(args.scenarios, args.scale), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+This module drives the benchmark load.
+
+`concurrency` virtual users loop over weighted journeys, each a few requests
+a browser would send for one page. Every request is timed under its route
+template, and the requests sent during the warm-up are not counted.
+"""
+
+import asyncio
+import random
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+
+import httpx
+
+from src.meet_team_api.api.utils.auth import issue_token
+
+from .seed import World
+
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class RouteStats:
+    """The latencies, in seconds, and the errors of one route"""
+
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self, elapsed: float) -> dict:
+        """The JSON report of the route"""
+        latencies = sorted(self.latencies)
+        report = {
+            "count": len(latencies),
+            "errors": self.errors,
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+        }
+        if latencies:
+            for p in PERCENTILES:
+                report[f"p{p}_ms"] = round(percentile(latencies, p) * 1000, 3)
+            report["mean_ms"] = round(sum(latencies) / len(latencies) * 1000, 3)
+            report["max_ms"] = round(latencies[-1] * 1000, 3)
+        return report
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    """The nearest-rank percentile of sorted values"""
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+class Journey:
+    """The requests of one simulated user, timed into the shared stats"""
+
+    def __init__(
+        self, client: httpx.AsyncClient, stats: dict, rng: random.Random, world: World
+    ):
+        self.client = client
+        self.stats = stats
+        self.rng = rng
+        self.world = world
+        self.recording = False
+        self.user_id, self.group_id, self.course_id = rng.choice(world.memberships)
+        self.headers = {"Authorization": f"Bearer {issue_token(self.user_id)}"}
+
+    async def request(self, route: str, method: str, url: str, **kwargs):
+        """Send one request, recorded under `route`"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, url, headers=self.headers, **kwargs
+            )
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        elapsed = time.perf_counter() - start
+        if self.recording:
+            stats = self.stats.setdefault(route, RouteStats())
+            stats.latencies.append(elapsed)
+            stats.errors += failed
+
+    async def course_browse(self):
+        """The course catalog and the user's own courses"""
+        term = self.rng.choice((None, None, "Data", "Course 00"))
+        params = {"limit": 10} if term is None else {"limit": 10, "searchTerm": term}
+        await self.request("GET /course", "GET", "/course", params=params)
+        await self.request("GET /user/courses", "GET", "/user/courses")
+
+    async def group_page(self):
+        """A group's page: its info, tasks and reviews"""
+        group = self.group_id
+        await self.request("GET /group/", "GET", "/group/", params={"group": group})
+        await self.request("GET /task/all", "GET", "/task/all", params={"group": group})
+        await self.request(
+            "GET /group/{group_id}/review", "GET", f"/group/{group}/review"
+        )
+
+    async def task_detail(self):
+        """A task of the user's group and its messages"""
+        task_id = self.rng.choice(self.world.tasks[self.group_id])
+        await self.request("GET /task/", "GET", "/task/", params={"taskId": task_id})
+        await self.request("GET /message/{task_id}", "GET", f"/message/{task_id}")
+
+    async def review_submit(self):
+        """The user rates the other members of the group"""
+        reviews = {
+            str(user_id): {
+                "content": "Benchmark review",
+                "rating": self.rng.randint(2, 10) / 2,
+            }
+            for user_id in self.world.members[self.group_id]
+            if user_id != self.user_id
+        }
+        await self.request(
+            "POST /review/{group_id}",
+            "POST",
+            f"/review/{self.group_id}",
+            json=reviews,
+        )
+
+    async def commit_submit(self):
+        """The user pushes a commit on a task of the group"""
+        task_id = self.rng.choice(self.world.tasks[self.group_id])
+        await self.request(
+            "POST /commit/",
+            "POST",
+            "/commit/",
+            json={
+                "task_id": task_id,
+                "title": "Benchmark commit",
+                "description": "Benchmark commit",
+                "reference_link": "https://example.com/bench",
+            },
+        )
+
+    async def message_post(self):
+        """The user posts a message on a task of the group"""
+        task_id = self.rng.choice(self.world.tasks[self.group_id])
+        await self.request(
+            "POST /message/",
+            "POST",
+            "/message/",
+            json={"task_id": task_id, "description": "Benchmark message"},
+        )
+
+
+# Journey name -> default weight; the write-heavy ones are opt-in with --mix
+MIX = {
+    "course_browse": 35,
+    "group_page": 30,
+    "task_detail": 25,
+    "review_submit": 10,
+    "commit_submit": 0,
+    "message_post": 0,
+}
+
+
+@dataclass
+class RunConfig:
+    """The settings of one benchmark run"""
+
+    concurrency: int = 16
+    duration: float = 30
+    warmup: float = 5
+    seed: int = 42
+    url: str | None = None
+    mix: dict[str, float] = field(default_factory=lambda: dict(MIX))
+
+
+async def _user(journey: Journey, config: RunConfig, deadline: float):
+    names = list(config.mix)
+    weights = list(config.mix.values())
+    while time.perf_counter() < deadline:
+        name = journey.rng.choices(names, weights)[0]
+        await getattr(journey, name)()
+
+
+async def run(config: RunConfig, world: World) -> dict:
+    """Drive the load and return the JSON report"""
+    unknown = set(config.mix) - set(MIX)
+    if unknown:
+        raise ValueError(f"Unknown journeys: {', '.join(sorted(unknown))}")
+
+    async with AsyncExitStack() as stack:
+        if config.url is None:
+            # imported here: loading the app opens its pool and background threads
+            # pylint: disable-next=import-outside-toplevel
+            from src.meet_team_api.main import app
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            # a crashing handler counts as a 500, as behind a server
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            base_url = "http://bench"
+        else:
+            transport = httpx.AsyncHTTPTransport(retries=0)
+            base_url = config.url
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30)
+        )
+
+        stats: dict[str, RouteStats] = {}
+        journeys = [
+            Journey(client, stats, random.Random(config.seed * 1000 + i), world)
+            for i in range(config.concurrency)
+        ]
+        start = time.perf_counter()
+        deadline = start + config.warmup + config.duration
+        users = [
+            asyncio.create_task(_user(journey, config, deadline))
+            for journey in journeys
+        ]
+        await asyncio.sleep(config.warmup)
+        for journey in journeys:
+            journey.recording = True
+        measured = time.perf_counter()
+        await asyncio.gather(*users)
+        elapsed = time.perf_counter() - measured
+
+    total = RouteStats()
+    for route in stats.values():
+        total.latencies.extend(route.latencies)
+        total.errors += route.errors
+    return {
+        "config": {
+            "concurrency": config.concurrency,
+            "duration": config.duration,
+            "warmup": config.warmup,
+            "seed": config.seed,
+            "target": config.url or "in-process",
+            "mix": config.mix,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "total": total.summary(elapsed),
+        "routes": {
+            route: route_stats.summary(elapsed)
+            for route, route_stats in sorted(stats.items())
+        },
+    }
+
+
+def compare(base: dict, head: dict) -> list[str]:
+    """The per-route changes between two reports, as printable lines"""
+    lines = [
+        f"{'route':32} {'rps':>16} "
+        + " ".join(f"{f'p{p}_ms':>22}" for p in PERCENTILES)
+    ]
+    routes = sorted(set(base["routes"]) | set(head["routes"]))
+    for route in ["total", *routes]:
+        before = base["total"] if route == "total" else base["routes"].get(route, {})
+        after = head["total"] if route == "total" else head["routes"].get(route, {})
+        cells = [_delta(before, after, "throughput_rps", 16)]
+        cells += [_delta(before, after, f"p{p}_ms", 22) for p in PERCENTILES]
+        lines.append(f"{route:32} " + " ".join(cells))
+    return lines
+
+
+def _delta(before: dict, after: dict, key: str, width: int) -> str:
+    if key not in before or key not in after:
+        return f"{after.get(key, '-')!s:>{width}}"
+    old, new = before[key], after[key]
+    change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+    return f"{f'{new} ({change})':>{width}}"
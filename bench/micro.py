@@ -0,0 +1,423 @@
+"""
+This module holds the micro-benchmarks.
+
+Each scenario times one code path in-process against the code it replaced,
+and needs no MySQL server: the database is stood in for by a sleep where its
+latency matters. The numbers are per operation; `scale` multiplies the
+amount of work, so a quick run can check that the scenarios still work.
+"""
+
+import asyncio
+import datetime
+import functools
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable
+
+import jwt
+
+from src.meet_team_api import db
+from src.meet_team_api.api.handlers.course import CatalogSnapshot
+from src.meet_team_api.api.utils import auth
+from src.meet_team_api.api.utils.json_response import dumps
+from src.meet_team_api.api.utils.pubsub import Broker
+from src.meet_team_api.api.utils import user_in_group
+from src.meet_team_api.api.utils.trigram import TrigramIndex
+
+# Scenario name -> function(scale) returning its report
+SCENARIOS: dict[str, Callable[[float], dict]] = {}
+
+
+def scenario(func):
+    """Register a scenario under its function name"""
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+def per_call_us(func, calls: int, rounds: int = 3) -> float:
+    """The best time of `rounds` runs of `calls` calls, in microseconds a call"""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return round(best / calls * 1e6, 3)
+
+
+class _Socket:
+    """A raw MySQL connection, as far as the pool looks at it"""
+
+    unread_result = False
+    in_transaction = False
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class _StubPool(db.ConnectionPool):
+    def _connect(self) -> db.PooledConnection:
+        return db.PooledConnection(self, _Socket())
+
+
+@scenario
+def pool_checkout(scale: float = 1) -> dict:
+    """
+    The pool's own cost: a checkout and return of a connection, alone and with
+    32 threads sharing 10 connections for 1 ms queries.
+    """
+    calls = max(1, int(20_000 * scale))
+    pool = _StubPool(size=10)
+
+    def checkout():
+        with pool.acquire():
+            pass
+
+    contended = _StubPool(size=10, timeout=30)
+    per_thread = max(1, int(100 * scale))
+
+    def worker():
+        for _ in range(per_thread):
+            with contended.acquire():
+                time.sleep(0.001)
+
+    threads = [threading.Thread(target=worker) for _ in range(32)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = contended.stats()
+    return {
+        "checkout_us": per_call_us(checkout, calls),
+        "contended_checkouts_per_s": round(stats["checkouts"] / elapsed),
+        "contended_wait_mean_ms": round(
+            stats["wait_time_total"] / stats["checkouts"] * 1000, 3
+        ),
+    }
+
+
+@scenario
+def executor(scale: float = 1) -> dict:
+    """
+    Concurrent requests to a handler whose query takes 5 ms, run on the event
+    loop as before and on the DB executor now.
+    """
+    requests = max(1, int(200 * scale))
+    query_time = 0.005
+
+    def handler():
+        time.sleep(query_time)
+
+    async def on_loop():
+        handler()
+
+    async def load(call) -> float:
+        start = time.perf_counter()
+        await asyncio.gather(*(call() for _ in range(requests)))
+        return round(requests / (time.perf_counter() - start), 1)
+
+    return {
+        "requests": requests,
+        "query_ms": query_time * 1000,
+        "workers": db.executor._max_workers,  # pylint: disable=protected-access
+        "before_rps": asyncio.run(load(on_loop)),
+        "after_rps": asyncio.run(load(db.non_blocking(handler))),
+    }
+
+
+@scenario
+def auth_token(scale: float = 1) -> dict:
+    """
+    Resolving the bearer token of a request: verified by every route as
+    before, and through the token cache now, on a hit and on a miss.
+    """
+    calls = max(1, int(20_000 * scale))
+    secret = auth.JWT_SECRET or "bench-secret-of-at-least-32-bytes"
+    token = jwt.encode({"id": 42}, secret, algorithm=auth.JWT_ALGORITHM)
+    cache = auth.TokenCache()
+
+    def per_route():
+        payload = jwt.decode(
+            token, os.getenv("MEET_TEAM_JWT", secret), algorithms=[auth.JWT_ALGORITHM]
+        )
+        return int(payload["id"])
+
+    def cached():
+        user_id = cache.get(token)
+        if user_id is None:
+            user_id = per_route()
+            cache.put(token, user_id)
+        return user_id
+
+    def missed():
+        cache.clear()
+        return cached()
+
+    return {
+        "before_us": per_call_us(per_route, calls),
+        "after_hit_us": per_call_us(cached, calls),
+        "after_miss_us": per_call_us(missed, calls),
+    }
+
+
+SUBJECTS = (
+    "Algorithms",
+    "Databases",
+    "Networks",
+    "Compilers",
+    "Graphics",
+    "Operating Systems",
+    "Machine Learning",
+    "Software Engineering",
+)
+LEVELS = ("Introduction to", "Advanced", "Applied", "Topics in", "Seminar on")
+
+
+def course_names(count: int) -> list[str]:
+    """A reproducible synthetic catalog"""
+    rng = random.Random(42)
+    return [
+        f"{rng.choice(LEVELS)} {rng.choice(SUBJECTS)} {i:05d}" for i in range(count)
+    ]
+
+
+@scenario
+def membership(scale: float = 1) -> dict:
+    """
+    The authorization checks of a request answered from the membership cache,
+    each of which used to be a query.
+    """
+    calls = max(1, int(50_000 * scale))
+    cache = user_in_group.MembershipCache()
+    cache.set_groups(7, frozenset(range(1, 6)))
+    cache.set_task_group(42, 3)
+    saved, user_in_group.membership_cache = user_in_group.membership_cache, cache
+    try:
+        return {
+            "user_in_group_us": per_call_us(
+                lambda: user_in_group.user_in_group(7, 3), calls
+            ),
+            "user_in_task_group_us": per_call_us(
+                lambda: user_in_group.user_in_task_group(7, 42), calls
+            ),
+        }
+    finally:
+        user_in_group.membership_cache = saved
+
+
+@scenario
+def course_search(scale: float = 1) -> dict:
+    """
+    A search box query over a 20k course catalog: a substring scan of every
+    name, as `name LIKE '%term%'` did, against the trigram index.
+    """
+    names = course_names(max(10, int(20_000 * scale)))
+    folded = [name.casefold() for name in names]
+    start = time.perf_counter()
+    index = TrigramIndex()
+    for doc_id, name in enumerate(names):
+        index.add(doc_id, name)
+    build = time.perf_counter() - start
+
+    report = {"courses": len(names), "index_build_ms": round(build * 1000, 1)}
+
+    def like(words: list[str]) -> list[int]:
+        return [i for i, name in enumerate(folded) if all(w in name for w in words)]
+
+    for term in ("data", "machine learn", "00042"):
+        report[term] = {
+            "like_us": per_call_us(functools.partial(like, term.split()), 20),
+            "trigram_us": per_call_us(functools.partial(index.search, term), 20),
+            "matches": len(like(term.split())),
+        }
+    return report
+
+
+def task_rows(count: int) -> list[dict]:
+    """Task rows as the cursor returns them"""
+    start = datetime.datetime(2024, 3, 1, 9, 30)
+    return [
+        {
+            "id": i,
+            "name": f"Task {i}",
+            "description": "Seeded task " * 4,
+            "status": ("Todo", "Doing", "Done")[i % 3],
+            "create_at": start + datetime.timedelta(minutes=i),
+            "close_at": None if i % 3 else start + datetime.timedelta(days=1),
+        }
+        for i in range(count)
+    ]
+
+
+@scenario
+def json_rendering(scale: float = 1) -> dict:
+    """
+    Rendering a 5k task list: the timestamps formatted row by row for the
+    stdlib encoder as before, and the rows encoded as they are now.
+    """
+    rows = task_rows(max(1, int(5_000 * scale)))
+
+    def stdlib():
+        converted = []
+        for row in rows:
+            # a copy, about 1 ms, so the rows can be rendered again
+            row = dict(row)
+            for key in ("create_at", "close_at"):
+                if row[key] is not None:
+                    row[key] = row[key].strftime("%Y-%m-%d %H:%M:%S")
+            converted.append(row)
+        return json.dumps(
+            {"data": converted},
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+    return {
+        "rows": len(rows),
+        "bytes": len(dumps({"data": rows})),
+        "before_ms": round(per_call_us(stdlib, 10) / 1000, 3),
+        "after_ms": round(per_call_us(lambda: dumps({"data": rows}), 10) / 1000, 3),
+    }
+
+
+@scenario
+def idle_subscribers(scale: float = 1) -> dict:
+    """
+    5k idle stream clients waiting on task messages: their memory, and the
+    time a message takes to reach the 1k watching the same task.
+    """
+    watchers = max(1, int(1_000 * scale))
+    others = max(1, int(4_000 * scale))
+
+    async def load() -> dict:
+        broker = Broker()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        subscriptions = [broker.subscribe("task.1") for _ in range(watchers)]
+        subscriptions += [
+            broker.subscribe(f"task.{2 + i // 10}") for i in range(others)
+        ]
+        clients = [asyncio.create_task(sub.get()) for sub in subscriptions]
+        await asyncio.sleep(0)
+        memory = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        broker.publish("task.1", {"id": 1})
+        await asyncio.gather(*clients[:watchers])
+        fan_out = time.perf_counter() - start
+
+        start = time.perf_counter()
+        broker.publish("task.2", {"id": 2})
+        await asyncio.gather(*clients[watchers : watchers + 10])
+        quiet = time.perf_counter() - start
+
+        for client in clients:
+            client.cancel()
+        for sub in subscriptions:
+            sub.close()
+        return {
+            "subscribers": len(subscriptions),
+            "bytes_per_subscriber": memory // len(subscriptions),
+            "watchers": watchers,
+            "fan_out_ms": round(fan_out * 1000, 3),
+            "fan_out_10_ms": round(quiet * 1000, 3),
+        }
+
+    return asyncio.run(load())
+
+
+class _Prepared:
+    """A prepared cursor and its connection, minus the server"""
+
+    def cursor(self, **kwargs):
+        return self
+
+    def execute(self, operation, params):
+        pass
+
+
+@scenario
+def prepared_lookup(scale: float = 1) -> dict:
+    """
+    What the prepared statement cache adds on the client to each query: a
+    hit on a hot statement, and the sighting of an `IN` list built at run
+    time, which stays on the text protocol. What it saves is on the server.
+    """
+    calls = max(1, int(50_000 * scale))
+    cache = db.StatementCache(_Prepared())
+    hot = "SELECT id, name FROM task WHERE group_id = %s AND status = %s"
+    while cache.execute(hot, (1, "Todo")) is None:
+        pass
+    # never hot enough, as a list as long as its input keeps changing
+    cold = db.StatementCache(_Prepared(), prepare_after=sys.maxsize)
+    lists = itertools.cycle(
+        [
+            (
+                f"SELECT id FROM user WHERE id IN ({', '.join(['%s'] * size)})",
+                [1] * size,
+            )
+            for size in range(1, 65)
+        ]
+    )
+
+    return {
+        "hit_us": per_call_us(lambda: cache.execute(hot, (1, "Todo")), calls),
+        "run_time_sql_us": per_call_us(lambda: cold.execute(*next(lists)), calls),
+    }
+
+
+@scenario
+def catalog_page(scale: float = 1) -> dict:
+    """
+    A `GET /course` page served from the in-memory catalog of 20k courses:
+    the rebuild done in the background, and the pages the requests read.
+    """
+    rng = random.Random(42)
+    rows = [
+        {
+            "id": i + 1,
+            "name": name,
+            "year": rng.randint(2020, 2025),
+            "semester": rng.choice(("1", "2")),
+            "description": f"Seeded course {i + 1}",
+        }
+        for i, name in enumerate(course_names(max(10, int(20_000 * scale))))
+    ]
+    start = time.perf_counter()
+    snapshot = CatalogSnapshot(rows)
+    rebuild = time.perf_counter() - start
+    deep = rows[len(rows) * 3 // 4]["id"]
+    return {
+        "courses": len(rows),
+        "rebuild_ms": round(rebuild * 1000, 1),
+        "first_page_us": per_call_us(
+            lambda: snapshot.page(None, None, None, 0, 10), 10_000
+        ),
+        "deep_keyset_page_us": per_call_us(
+            lambda: snapshot.page(None, None, deep, 0, 10), 10_000
+        ),
+        "year_semester_page_us": per_call_us(
+            lambda: snapshot.page(2024, "1", None, 100, 10), 10_000
+        ),
+    }
+
+
+def run(names: list[str] | None = None, scale: float = 1) -> dict:
+    """Run the named scenarios, all of them by default"""
+    unknown = set(names or ()) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    return {name: SCENARIOS[name](scale) for name in names or SCENARIOS}
@@ -0,0 +1,244 @@
+"""
+This module seeds the benchmark dataset.
+
+The dataset is derived from a random seed and the sizes only, with explicit
+ids, so two runs seeded alike read the same rows. Every course has one
+professor and `groups` groups of `members` students; every group has its
+tasks, every task its commits and messages, and every member reviews the
+other members of the group.
+"""
+
+import random
+from dataclasses import dataclass
+
+from src.meet_team_api.api.utils import ratings
+from src.meet_team_api.db import get_connection, get_cursor
+from src.meet_team_api.migrate import up
+
+# Child tables first, so they can be emptied without disabling the foreign keys
+SEEDED_TABLES = (
+    "user_group_rating",
+    "user_rating",
+    "review",
+    "message",
+    "`commit`",
+    "task",
+    "group_member",
+    "`group`",
+    "course_member",
+    "course",
+    "user",
+)
+INSERT_CHUNK = 1000
+TASK_STATUSES = ("Todo", "Doing", "Done")
+SUBJECTS = ("Algorithms", "Databases", "Networks", "Compilers", "Graphics")
+
+
+@dataclass
+class SeedSizes:
+    """The size of the dataset"""
+
+    users: int = 2000
+    courses: int = 40
+    groups: int = 8
+    members: int = 5
+    tasks: int = 20
+    commits: int = 3
+    messages: int = 5
+    seed: int = 42
+
+
+def _insert(cur, table: str, columns: tuple[str, ...], rows: list[tuple]):
+    """Insert the rows in multi-row chunks"""
+    values = ", ".join(["%s"] * len(columns))
+    for start in range(0, len(rows), INSERT_CHUNK):
+        cur.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values})",
+            rows[start : start + INSERT_CHUNK],
+        )
+
+
+def _generate(sizes: SeedSizes) -> dict[str, tuple[tuple[str, ...], list[tuple]]]:
+    """The rows of every table, as table -> (columns, rows)"""
+    rng = random.Random(sizes.seed)
+    if sizes.members < 2:
+        raise ValueError("A group needs two members, an assignee and a reviewer")
+    if sizes.members * sizes.groups + 1 > sizes.users:
+        raise ValueError("Not enough users to fill the groups of a course")
+
+    users = [
+        (i, f"bench{i:06d}", "bench", f"Bench User {i}", f"Seeded user {i}")
+        for i in range(1, sizes.users + 1)
+    ]
+    courses, course_members, groups, group_members = [], [], [], []
+    tasks, commits, messages, reviews = [], [], [], []
+    group_id = task_id = commit_id = message_id = 0
+
+    for course_id in range(1, sizes.courses + 1):
+        people = rng.sample(range(1, sizes.users + 1), sizes.members * sizes.groups + 1)
+        owner, students = people[0], people[1:]
+        courses.append(
+            (
+                course_id,
+                f"Course {course_id:04d} {rng.choice(SUBJECTS)}",
+                owner,
+                rng.randint(2020, 2025),
+                rng.choice(("1", "2")),
+                f"Seeded course {course_id}",
+            )
+        )
+        course_members.append((course_id, owner, "Prof"))
+        course_members.extend((course_id, user_id, "Stu") for user_id in students)
+
+        for index in range(sizes.groups):
+            group_id += 1
+            members = students[index * sizes.members : (index + 1) * sizes.members]
+            groups.append(
+                (group_id, course_id, members[0], f"Group {index + 1}", "Seeded group")
+            )
+            group_members.extend((user_id, group_id) for user_id in members)
+
+            for _ in range(sizes.tasks):
+                task_id += 1
+                assignee, reviewer = rng.sample(members, 2)
+                tasks.append(
+                    (
+                        task_id,
+                        f"Task {task_id}",
+                        group_id,
+                        members[0],
+                        assignee,
+                        reviewer,
+                        f"Seeded task {task_id}",
+                        rng.choice(TASK_STATUSES),
+                    )
+                )
+                for _ in range(sizes.commits):
+                    commit_id += 1
+                    commits.append(
+                        (
+                            commit_id,
+                            task_id,
+                            assignee,
+                            f"Commit {commit_id}",
+                            "Seeded commit",
+                            f"https://example.com/commit/{commit_id}",
+                        )
+                    )
+                for _ in range(sizes.messages):
+                    message_id += 1
+                    messages.append(
+                        (
+                            message_id,
+                            task_id,
+                            rng.choice(members),
+                            f"Seeded message {message_id}",
+                        )
+                    )
+
+            reviews.extend(
+                (
+                    user_id,
+                    reviewer_id,
+                    group_id,
+                    "Seeded review",
+                    rng.randint(2, 10) / 2,
+                )
+                for reviewer_id in members
+                for user_id in members
+                if user_id != reviewer_id
+            )
+
+    return {
+        "user": (("id", "account", "password", "name", "description"), users),
+        "course": (
+            ("id", "name", "owner_id", "year", "semester", "description"),
+            courses,
+        ),
+        "course_member": (("course_id", "user_id", "role"), course_members),
+        "`group`": (("id", "course_id", "owner_id", "name", "description"), groups),
+        "group_member": (("user_id", "group_id"), group_members),
+        "task": (
+            (
+                "id",
+                "name",
+                "group_id",
+                "creator_id",
+                "assignee_id",
+                "reviewer_id",
+                "description",
+                "status",
+            ),
+            tasks,
+        ),
+        "`commit`": (
+            ("id", "task_id", "creator_id", "title", "description", "reference_link"),
+            commits,
+        ),
+        "message": (("id", "task_id", "creator_id", "description"), messages),
+        "review": (
+            ("user_id", "reviewer_id", "group_id", "content", "rating"),
+            reviews,
+        ),
+    }
+
+
+def seed(sizes: SeedSizes, reset: bool = False) -> dict[str, int]:
+    """
+    Migrate the database and fill it, returns the row count per table.
+
+    Raises:
+        Exception: If the database already has users and `reset` isn't set.
+    """
+    up()
+    tables = _generate(sizes)
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        cur.execute("SELECT COUNT(*) AS count FROM user")
+        if cur.fetchone()["count"] and not reset:
+            raise Exception("The database isn't empty, pass --reset to wipe it")
+        for table in SEEDED_TABLES:
+            cur.execute(f"DELETE FROM {table}")
+        for table in reversed(SEEDED_TABLES):
+            if table in tables:
+                _insert(cur, table, *tables[table])
+        ratings.rebuild(cur)
+        conn.commit()
+    return {table.strip("`"): len(rows) for table, (_, rows) in tables.items()}
+
+
+@dataclass
+class World:
+    """The seeded ids the driver picks its requests from"""
+
+    # (user_id, group_id, course_id) of every group membership
+    memberships: list[tuple[int, int, int]]
+    members: dict[int, list[int]]
+    tasks: dict[int, list[int]]
+
+
+def load_world() -> World:
+    """Read back the ids of the seeded dataset"""
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        cur.execute("""
+            SELECT gm.user_id, gm.group_id, g.course_id
+            FROM group_member gm
+            JOIN `group` g ON g.id = gm.group_id
+            ORDER BY gm.group_id, gm.user_id
+            """)
+        memberships = [
+            (row["user_id"], row["group_id"], row["course_id"])
+            for row in cur.fetchall()
+        ]
+        cur.execute("SELECT id, group_id FROM task ORDER BY id")
+        tasks: dict[int, list[int]] = {}
+        for row in cur.fetchall():
+            tasks.setdefault(row["group_id"], []).append(row["id"])
+
+    if not memberships:
+        raise Exception("The database has no groups, run `python -m bench seed`")
+    members: dict[int, list[int]] = {}
+    for user_id, group_id, _ in memberships:
+        members.setdefault(group_id, []).append(user_id)
+    return World(memberships, members, tasks)
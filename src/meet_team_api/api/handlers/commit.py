@@ -1,111 +1,142 @@
-from typing import Dict
+from mysql.connector.abstracts import MySQLCursorAbstract
+
+from ...db import UnitOfWork, get_connection, get_cursor, non_blocking, transactional
+from ...write_behind import write_behind
+from ..utils.http_cache import resource_versions
+from ..utils.user_in_group import user_in_group, user_in_task_group
+from ..utils.user_loader import UserLoader
+
+
+@non_blocking
+def find_all(user_id, group_id):
+    with get_connection() as conn:
+        cur: MySQLCursorAbstract = get_cursor(conn)
+
+        user_in_group(user_id, group_id, cur)
+
+        cur.execute(
+            """
+            SELECT
+                task.id,
+                task.name,
+                task.create_at AS task_create,
+                task.status,
+                task.assignee_id,
+                c.create_at AS commit_create
+            FROM
+                task
+            INNER JOIN `commit` c ON
+                c.task_id = task.id
+            WHERE task.group_id=%s AND task.assignee_id IS NOT NULL
+            """,
+            (group_id,),
+        )
+        ret = cur.fetchall()
+        UserLoader(cur).resolve_names(ret, "assignee_id", "user_name", keep_id=False)
 
-from mysql.connector.abstracts import (MySQLConnectionAbstract,
-                                       MySQLCursorAbstract)
-from mysql.connector.types import RowItemType
+    return ret
 
-from ...db import get_connection, get_cursor
 
+@non_blocking
+@transactional
+def create(uow: UnitOfWork, user_id, task_id, title, description, reference_link):
+    """This function is to create commits given `task_id`"""
+    cur = uow.cur
 
-async def find_all(user_id, group_id):
-    conn: MySQLConnectionAbstract = get_connection()
-    cur: MySQLCursorAbstract = get_cursor(conn)
+    group_id = user_in_task_group(user_id, task_id, cur)
 
     cur.execute(
         """
-        SELECT EXISTS(
-            SELECT * FROM group_member
-            WHERE user_id = %s AND group_id = %s
-        ) AS in_group
-        """
+        INSERT INTO
+            `commit` (
+                task_id,
+                creator_id,
+                title,
+                description,
+                reference_link
+            )
+        VALUES (%s, %s, %s, %s, %s)
+        """,
+        (task_id, user_id, title, description, reference_link),
     )
-
-    exist = cur.fetchone()
-    if not isinstance(exist, Dict[str, RowItemType]) or exist["in_group"] is False:
-        cur.close()
-        conn.close()
-        raise Exception("You're not in this group")
-
+    new_commit_id = cur.lastrowid
     cur.execute(
         """
-        SELECT
-            task.id,
-            task.name,
-            task.create_at AS task_create,
-            task.status,
-            u.name AS user_name,
-            c.create_at AS commit_create
-        FROM
-            task
-        INNER JOIN `commit` c ON
-            c.task_id = task.id
-        INNER JOIN `user` u ON
-            task.assignee_id = u.id
-        WHERE task.group_id=%s
+        UPDATE `task`
+        SET status='Doing'
+        WHERE id = %s
         """,
-        (group_id,),
+        (task_id,),
     )
-    ret = cur.fetchall()
-
-    cur.close()
-    conn.close()
-
-    return ret
+    uow.after_commit(resource_versions.bump, "task", task_id)
+    uow.after_commit(resource_versions.bump, "group_activity", group_id)
 
+    return new_commit_id
 
-async def create(user_id, task_id, title, description, reference_link):
-    """This function is to create commits given `task_id`"""
-    conn: MySQLConnectionAbstract = get_connection()
-    cur: MySQLCursorAbstract = get_cursor(conn)
 
-    cur.execute(
-        """
-        WITH task_with_group AS (
-            SELECT t.* FROM `task` t
-            INNER JOIN `group` g ON t.group_id=g.id
-            WHERE t.id=%s
-        )
-        SELECT EXISTS (
-            SELECT * FROM task_with_group tg
-            INNER JOIN group_member gm ON tg.group_id=gm.group_id
-            WHERE gm.user_id=%s
-        ) AS in_group
-        """,
-        (task_id, user_id),
+@non_blocking
+def enqueue(user_id, task_id, title, description, reference_link) -> str:
+    """This function is to journal a commit for the write-behind flusher"""
+    group_id = user_in_task_group(user_id, task_id)
+    return write_behind.enqueue(
+        "commit",
+        {
+            "task_id": task_id,
+            "user_id": user_id,
+            "group_id": group_id,
+            "title": title,
+            "description": description,
+            "reference_link": reference_link,
+        },
     )
 
-    exist = cur.fetchone()
-    if exist is None or exist["in_group"] is False:
-        cur.close()
-        conn.close()
-        raise Exception("You're not in this group")
 
-    cur.execute(
+def _flush_journal(uow: UnitOfWork, commits: list[dict]):
+    """This function inserts journaled commits, called by the flusher"""
+    cur = uow.cur
+
+    cur.executemany(
         """
-        INSERT INTO
+        INSERT IGNORE INTO
             `commit` (
                 task_id,
                 creator_id,
                 title,
                 description,
-                reference_link
+                reference_link,
+                client_ref
             )
-        VALUES (%s, %s, %s, %s, %s)
+        VALUES (%s, %s, %s, %s, %s, %s)
         """,
-        (task_id, user_id, title, description, reference_link),
+        [
+            (
+                commit["task_id"],
+                commit["user_id"],
+                commit["title"],
+                commit["description"],
+                commit["reference_link"],
+                commit["ref"],
+            )
+            for commit in commits
+        ],
     )
-    new_commit_id = cur.lastrowid
+    # one status update per task, however many commits it got; in id order so
+    # concurrent flushes lock the rows in the same order
+    task_ids = sorted({commit["task_id"] for commit in commits})
     cur.execute(
-        """
+        f"""
         UPDATE `task`
         SET status='Doing'
-        WHERE id = %s
+        WHERE id IN ({", ".join(["%s"] * len(task_ids))})
         """,
-        (task_id,),
+        task_ids,
+    )
+    uow.after_commit(resource_versions.bump, "task", *task_ids)
+    uow.after_commit(
+        resource_versions.bump,
+        "group_activity",
+        *{commit["group_id"] for commit in commits},
     )
-    conn.commit()
 
-    cur.close()
-    conn.close()
 
-    return new_commit_id
+write_behind.register("commit", _flush_journal)
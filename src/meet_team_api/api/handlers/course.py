@@ -1,38 +1,258 @@
 """This is the course handlers, for the course router"""
 
+import base64
+import bisect
+import csv
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
 from typing import Optional
 
-from ...db import get_connection, get_cursor
+import mysql.connector
+from mysql.connector import errorcode
+
+from ...db import (
+    UnitOfWork,
+    get_connection,
+    get_cursor,
+    get_read_connection,
+    non_blocking,
+    transactional,
+)
 from ...models.course import CourseId
+from ..utils.http_cache import resource_versions
+from ..utils.json_response import dumps
+from ..utils.trigram import TrigramIndex
 
+COURSE_SEARCH_BACKEND = os.getenv("MEET_TEAM_COURSE_SEARCH", "fulltext")
+COURSE_SEARCH_INDEX_TTL = float(os.getenv("MEET_TEAM_COURSE_SEARCH_INDEX_TTL", "60"))
+# Seconds between two rebuilds of the in-memory catalog, 0 reads MySQL instead
+COURSE_CATALOG_REFRESH = float(os.getenv("MEET_TEAM_COURSE_CATALOG_REFRESH", "30"))
+
+logger = logging.getLogger(__name__)
+
+# MySQL errors meaning "no FULLTEXT index here", we fall back to trigrams then
+_NO_FULLTEXT_ERRNOS = {
+    errorcode.ER_FT_MATCHING_KEY_NOT_FOUND,
+    errorcode.ER_TABLE_CANT_HANDLE_FT,
+}
+
+
+class CourseSearchIndex:
+    """
+    The in-process trigram index over the catalog, used when the database
+    can't serve the FULLTEXT search. It is rebuilt lazily after a course
+    write or once it is older than `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float = COURSE_SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self.enabled = COURSE_SEARCH_BACKEND == "trigram"
+        self._rows: dict[int, dict] = {}
+        self._index: TrigramIndex | None = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Mark the index stale, called by the course writes"""
+        with self._lock:
+            self._index = None
+
+    def _build(self, cur):
+        cur.execute(
+            """
+            SELECT id, name, year, semester, description
+            FROM course
+            """
+        )
+        rows, index = {}, TrigramIndex()
+        for row in cur.fetchall():
+            index.add(row["id"], f"{row['name']} {row['description'] or ''}")
+            del row["description"]
+            rows[row["id"]] = row
+        self._rows, self._index = rows, index
+        self._built_at = time.monotonic()
+
+    def search(self, cur, term: str) -> list[dict]:
+        """All courses matching `term`, best first"""
+        with self._lock:
+            if self._index is None or time.monotonic() - self._built_at > self.ttl:
+                self._build(cur)
+            return [self._rows[doc_id] for doc_id, _ in self._index.search(term)]
+
+
+course_search_index = CourseSearchIndex()
+
+
+class CatalogSnapshot:
+    """
+    A copy of the catalog as of one read, never modified.
+
+    The courses are kept sorted by id for every year, semester and (year,
+    semester) filter, so a page is a bisect and a slice, and indexed by
+    trigrams for the search when the trigram backend is on.
+    """
+
+    def __init__(self, rows: list[dict]):
+        self.built_at = time.monotonic()
+        self.index = TrigramIndex()
+        self.courses: dict[int, dict] = {}
+        self._views: dict[tuple, tuple[list[int], list[dict]]] = {}
+        for row in sorted(rows, key=lambda row: row["id"]):
+            self.index.add(row["id"], f"{row['name']} {row['description'] or ''}")
+            course = {key: row[key] for key in ("id", "name", "year", "semester")}
+            self.courses[course["id"]] = course
+            year, semester = course["year"], str(course["semester"])
+            for key in ((None, None), (year, None), (None, semester), (year, semester)):
+                ids, courses = self._views.setdefault(key, ([], []))
+                ids.append(course["id"])
+                courses.append(course)
+
+    def page(
+        self,
+        year: int | None,
+        semester: str | None,
+        after_id: int | None,
+        offset: int,
+        limit: int,
+    ) -> list[dict]:
+        """Up to `limit` courses by id, after `after_id` or else from `offset`"""
+        ids, courses = self._views.get((year, semester), ([], []))
+        start = offset if after_id is None else bisect.bisect_right(ids, after_id)
+        return courses[start : start + limit]
+
+    def search(self, term: str, year: int | None, semester: str | None) -> list[dict]:
+        """All courses matching `term`, best first"""
+        matches = (self.courses[doc_id] for doc_id, _ in self.index.search(term))
+        return [
+            course
+            for course in matches
+            if (year is None or course["year"] == year)
+            and (semester is None or str(course["semester"]) == semester)
+        ]
+
+
+class CourseCatalog:
+    """
+    The course catalog served from memory, for `find_all`.
+
+    A background thread rebuilds the snapshot every `refresh` seconds, and
+    right away when this process writes a course. The reads are served the
+    current snapshot meanwhile, however stale (stale-while-revalidate), so
+    only the first one, before any snapshot exists, waits on MySQL. The
+    rebuilds after a write read the primary, the periodic ones may read a
+    replica. The writes of other workers show up with the next periodic
+    rebuild.
+    """
+
+    def __init__(self, refresh: float = COURSE_CATALOG_REFRESH):
+        self.refresh = refresh
+        self.enabled = refresh > 0
+        self._snapshot: CatalogSnapshot | None = None
+        self._dirty = False
+        self._build_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def rebuild(self) -> CatalogSnapshot:
+        """Read the catalog from MySQL into a new snapshot"""
+        with self._build_lock:
+            # a write committed from now on marks the new snapshot dirty again
+            dirty, self._dirty = self._dirty, False
+            # a replica may not have the write yet, the snapshot would miss it
+            connect = get_connection if dirty else get_read_connection
+            with connect() as conn:
+                cur = get_cursor(conn)
+                cur.execute(
+                    """
+                    SELECT id, name, year, semester, description
+                    FROM course
+                    """
+                )
+                self._snapshot = CatalogSnapshot(cur.fetchall())
+        return self._snapshot
+
+    def snapshot(self) -> CatalogSnapshot:
+        """The current snapshot, built on the spot only if there is none yet"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            # wait for a rebuild in progress rather than start another one
+            with self._build_lock:
+                snapshot = self._snapshot
+            if snapshot is None:
+                snapshot = self.rebuild()
+        elif self._thread is None and (
+            self._dirty or time.monotonic() - snapshot.built_at > self.refresh
+        ):
+            # no refresher running, e.g. in a script
+            snapshot = self.rebuild()
+        return snapshot
+
+    def invalidate(self):
+        """Have the snapshot rebuilt, called by the course writes"""
+        self._dirty = True
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            # cleared first, so a write during the rebuild triggers another one
+            self._wake.clear()
+            try:
+                self.rebuild()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("course catalog refresh failed")
+            self._wake.wait(self.refresh)
+
+    def start(self):
+        """Build the snapshot and keep it fresh in the background, if enabled"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="meet_team_course_catalog", daemon=True
+        )
+        self._thread.start()
+
+    def close(self):
+        """Stop the background rebuilds"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+
+course_catalog = CourseCatalog()
 
-async def join(course_id: int, user_id: int):
-    """To add a user into the `course_user` table"""
-    conn = get_connection()
-    cur = get_cursor(conn)
 
+@non_blocking
+def join(course_id: int, user_id: int):
+    """To add a user into the `course_user` table"""
     query = """
     INSERT INTO course_member (course_id, user_id)
     VALUES (%s, %s)
     """
-    try:
+    with get_connection() as conn:
+        cur = get_cursor(conn)
         cur.execute(query, (course_id, user_id))
         conn.commit()
-    except Exception as e:
-        cur.close()
-        conn.close()
-        raise e
-    cur.close()
-    conn.close()
+    resource_versions.bump("course", course_id)
     return True
 
 
-async def create_course(
-    course_name, course_year, course_semester, owner_id
+@non_blocking
+@transactional
+def create_course(
+    uow: UnitOfWork, course_name, course_year, course_semester, owner_id
 ) -> CourseId:
     """To add a new user in"""
-    conn = get_connection()
-    cur = get_cursor(conn)
+    cur = uow.cur
 
     course_query = """
     INSERT INTO course (name, year, semester, owner_id)
@@ -46,102 +266,221 @@ async def create_course(
     VALUES (%s, %s, %s)
     """
     cur.execute(member_query, (course_id, owner_id, "Prof"))
-    conn.commit()
 
-    new_course_id = cur.lastrowid
-    cur.close()
-    conn.close()
-    return new_course_id
+    uow.after_commit(course_search_index.invalidate)
+    uow.after_commit(course_catalog.invalidate)
+    uow.after_commit(resource_versions.bump, "course", course_id)
+    return course_id
+
+
+def _encode_cursor(**position) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def _decode_cursor(cursor: str, key: str) -> int:
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))[key])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _boolean_query(search_term: str) -> str:
+    # every word is required, the last one as a prefix for typeahead
+    words = re.findall(r"\w+", search_term)
+    return " ".join(
+        f"+{word}*" if i == len(words) - 1 else f"+{word}"
+        for i, word in enumerate(words)
+    )
+
+
+def _filters(year: int | None, semester: str | None) -> tuple[list[str], tuple]:
+    conditions, params = [], ()
+    if year is not None:
+        conditions.append("year = %s")
+        params += (year,)
+    if semester is not None:
+        conditions.append("semester = %s")
+        params += (semester,)
+    return conditions, params
+
 
+def _offset_page(ret: list, offset: int, limit: int) -> tuple[list, str | None]:
+    next_cursor = None
+    if len(ret) > limit:
+        ret = ret[:limit]
+        next_cursor = _encode_cursor(offset=offset + limit)
+    return ret, next_cursor
 
-async def find_all(offset: int, limit: int, search_term: str | None = None):
-    conn = get_connection()
-    cur = get_cursor(conn)
 
-    # fetch all courses from db
+def _search(
+    offset: int,
+    limit: int,
+    search_term: str,
+    cursor: str | None,
+    year: int | None,
+    semester: str | None,
+) -> tuple[list, str | None]:
+    # relevance isn't a stable seek key, so search pages are positional
+    if cursor is not None:
+        offset = _decode_cursor(cursor, "offset")
+
+    if course_catalog.enabled and course_search_index.enabled:
+        matches = course_catalog.snapshot().search(search_term, year, semester)
+        return _offset_page(matches[offset : offset + limit + 1], offset, limit)
+
+    ret = None
+    with get_read_connection() as conn:
+        cur = get_cursor(conn)
+        if not course_search_index.enabled:
+            boolean_query = _boolean_query(search_term)
+            if not boolean_query:
+                return [], None
+            conditions, params = _filters(year, semester)
+            try:
+                cur.execute(
+                    f"""
+                    SELECT
+                        id,
+                        name,
+                        year,
+                        semester
+                    FROM course
+                    WHERE MATCH(name, description) AGAINST (%s IN BOOLEAN MODE)
+                    {"".join(f" AND {condition}" for condition in conditions)}
+                    ORDER BY
+                        MATCH(name, description) AGAINST (%s IN BOOLEAN MODE) DESC,
+                        id
+                    LIMIT %s OFFSET %s
+                    """,
+                    (boolean_query, *params, boolean_query, limit + 1, offset),
+                )
+                ret = cur.fetchall()
+            except mysql.connector.Error as e:
+                if e.errno not in _NO_FULLTEXT_ERRNOS:
+                    raise
+                course_search_index.enabled = True
+        if ret is None:
+            ret = [
+                row
+                for row in course_search_index.search(cur, search_term)
+                if (year is None or row["year"] == year)
+                and (semester is None or str(row["semester"]) == semester)
+            ][offset : offset + limit + 1]
+
+    return _offset_page(ret, offset, limit)
+
+
+@non_blocking
+def find_all(
+    offset: int,
+    limit: int,
+    search_term: str | None = None,
+    cursor: str | None = None,
+    year: int | None = None,
+    semester: int | None = None,
+) -> tuple[list, str | None]:
+    """
+    This function lists the courses, returns the page and the cursor of the
+    next page.
+
+    Without `search_term` the courses are ordered by id and `cursor` (the
+    `next_cursor` of the previous page) seeks past the last id seen, so deep
+    pages cost as much as the first one; without a cursor the legacy `offset`
+    is used. With `search_term` the courses are ranked by relevance through
+    the FULLTEXT index, or the trigram index when the database lacks one.
+    `year` and `semester` narrow the list.
+
+    With the catalog enabled, the pages are read from its in-memory snapshot,
+    and so is the search with the trigram backend; a FULLTEXT search still
+    goes to MySQL. Either search requires every word of `search_term`.
+    """
+    semester = None if semester is None else str(semester)
     if search_term:
-        cur.execute(
-            """
-            SELECT
-                id,
-                name,
-                year,
-                semester
-            FROM course
-            WHERE name LIKE %s
-            LIMIT %s OFFSET %s
-            """,
-            ('%' + search_term + '%', limit, offset),
+        return _search(offset, limit, search_term, cursor, year, semester)
+
+    after_id = None if cursor is None else _decode_cursor(cursor, "id")
+    if course_catalog.enabled:
+        # fetch one extra row to know whether there is a next page
+        ret = course_catalog.snapshot().page(
+            year, semester, after_id, offset, limit + 1
         )
     else:
-        cur.execute(
-            """
-            SELECT
-                id,
-                name,
-                year,
-                semester
-            FROM course
-            LIMIT %s OFFSET %s
-            """,
-            (limit, offset),
-        )
-    ret = cur.fetchall()
-
-    cur.close()
-    conn.close()
-    return ret
+        conditions, params = _filters(year, semester)
+        if after_id is not None:
+            conditions.insert(0, "id > %s")
+            params = (after_id, *params, limit + 1)
+            paging = "LIMIT %s"
+        else:
+            params = (*params, limit + 1, offset)
+            paging = "LIMIT %s OFFSET %s"
+        query = f"""
+        SELECT
+            id,
+            name,
+            year,
+            semester
+        FROM course
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY id
+        {paging}
+        """
 
+        with get_read_connection() as conn:
+            cur = get_cursor(conn)
+            cur.execute(query, params)
+            ret = cur.fetchall()
 
+    next_cursor = None
+    if len(ret) > limit:
+        ret = ret[:limit]
+        if ret:
+            next_cursor = _encode_cursor(id=ret[-1]["id"])
+    return ret, next_cursor
 
 
-async def find_course(course_id: int, user_id: int) -> Optional[dict[str, int | str]]:
+@non_blocking
+def find_course(course_id: int, user_id: int) -> Optional[dict[str, int | str]]:
     """This function returns the course info given `course_id`"""
-    conn = get_connection()
-    cur = get_cursor(conn)
+    with get_connection() as conn:
+        cur = get_cursor(conn)
 
-    # fetch course info
-    cur.execute(
-        """
-        WITH c AS (
-            SELECT
-                id,
-                name,
-                owner_id AS teacher_id,
-                year,
-                semester,
-                description
-            FROM course
-            WHERE id = %s
-        ), cm AS (
-            SELECT EXISTS(
-                select * 
-                from course_member
-                inner join c on course_id=c.id
-                where user_id = %s
-            ) as exist
+        # fetch course info
+        cur.execute(
+            """
+            WITH c AS (
+                SELECT
+                    id,
+                    name,
+                    owner_id AS teacher_id,
+                    year,
+                    semester,
+                    description
+                FROM course
+                WHERE id = %s
+            ), cm AS (
+                SELECT EXISTS(
+                    select *
+                    from course_member
+                    inner join c on course_id=c.id
+                    where user_id = %s
+                ) as exist
+            )
+            SELECT c.*, u.name  AS teacher, cm.exist AS in_course
+            FROM c, cm, `user` u
+            WHERE u.id=c.teacher_id
+            """,
+            (course_id, user_id),
         )
-        SELECT c.*, u.name  AS teacher, cm.exist AS in_course
-        FROM c, cm, `user` u
-        WHERE u.id=c.teacher_id
-        """,
-        (course_id, user_id),
-    )
-    ret: dict[str, int | str] = cur.fetchone()
-
-    cur.close()
-    conn.close()
+        ret: dict[str, int | str] = cur.fetchone()
 
     return ret
 
 
-async def update_course(
+@non_blocking
+def update_course(
     user_id: int, course_id: int, new_name: str | None, new_desc: str | None
 ) -> int:
     """This function update the info of course"""
-    conn = get_connection()
-    cur = get_cursor(conn)
-
     has_name = isinstance(new_name, str)
     has_desc = isinstance(new_desc, str)
 
@@ -158,10 +497,135 @@ async def update_course(
     if isinstance(new_name, str):
         params = (new_name,) + params
 
-    cur.execute(query, params)
-    conn.commit()
-
-    cur.close()
-    conn.close()
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        cur.execute(query, params)
+        conn.commit()
+    course_search_index.invalidate()
+    course_catalog.invalidate()
+    resource_versions.bump("course", course_id)
 
     return course_id
+
+
+# The export of a course: one query per resource, all scoped by the course's
+# groups and ordered by id so an export is reproducible
+EXPORT_QUERIES = {
+    "tasks": """
+        SELECT
+            t.id,
+            t.group_id,
+            g.name AS group_name,
+            t.name,
+            t.description,
+            t.status,
+            t.creator_id,
+            t.assignee_id,
+            t.reviewer_id,
+            t.create_at,
+            t.close_at
+        FROM `group` g
+        INNER JOIN task t ON t.group_id = g.id
+        WHERE g.course_id = %s
+        ORDER BY t.id
+        """,
+    "commits": """
+        SELECT
+            c.id,
+            c.task_id,
+            t.group_id,
+            c.creator_id,
+            c.title,
+            c.description,
+            c.reference_link,
+            c.create_at
+        FROM `group` g
+        INNER JOIN task t ON t.group_id = g.id
+        INNER JOIN `commit` c ON c.task_id = t.id
+        WHERE g.course_id = %s
+        ORDER BY c.id
+        """,
+    "reviews": """
+        SELECT
+            r.id,
+            r.group_id,
+            r.reviewer_id,
+            r.user_id,
+            r.content,
+            r.rating,
+            r.create_at
+        FROM `group` g
+        INNER JOIN review r ON r.group_id = g.id
+        WHERE g.course_id = %s
+        ORDER BY r.id
+        """,
+}
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_CHUNK_SIZE = int(os.getenv("MEET_TEAM_EXPORT_CHUNK_SIZE", "1000"))
+
+
+@non_blocking
+def is_staff(course_id: CourseId, user_id: int) -> bool:
+    """Whether the user owns the course or is one of its professors or TAs"""
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        cur.execute(
+            """
+            SELECT EXISTS(
+                SELECT 1 FROM course
+                WHERE id = %s AND owner_id = %s
+            ) OR EXISTS(
+                SELECT 1 FROM course_member
+                WHERE course_id = %s AND user_id = %s AND role IN ('Prof', 'TA')
+            ) AS allowed
+            """,
+            (course_id, user_id, course_id, user_id),
+        )
+        return bool(cur.fetchone()["allowed"])
+
+
+def _ndjson_chunk(resource: Optional[str], columns, rows) -> bytes:
+    lines = []
+    for row in rows:
+        record = dict(zip(columns, row))
+        if resource is not None:
+            record = {"type": resource, **record}
+        lines.append(dumps(record))
+    return b"\n".join(lines) + b"\n"
+
+
+def _csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def export(course_id: CourseId, resources: list[str], fmt: str):
+    """
+    Stream the rows of `resources` of a course, as NDJSON or CSV chunks.
+
+    This is a plain generator for a `StreamingResponse`. The queries run on
+    an unbuffered cursor read `EXPORT_CHUNK_SIZE` rows at a time, so memory
+    stays flat whatever the size of the course. NDJSON records carry a
+    `type` field when several resources are exported; CSV takes a single
+    resource and starts with a header row.
+    """
+    with get_connection() as conn:
+        try:
+            for resource in resources:
+                cur = conn.cursor()
+                cur.execute(EXPORT_QUERIES[resource], (course_id,))
+                columns = cur.column_names
+                if fmt == "csv":
+                    yield _csv_chunk([columns])
+                while rows := cur.fetchmany(EXPORT_CHUNK_SIZE):
+                    if fmt == "csv":
+                        yield _csv_chunk(rows)
+                    else:
+                        tag = resource if len(resources) > 1 else None
+                        yield _ndjson_chunk(tag, columns, rows)
+        except BaseException:
+            # the client went away or a query failed mid-stream: don't drain
+            # the rest of the result set just to reuse the connection
+            conn.discard()
+            raise
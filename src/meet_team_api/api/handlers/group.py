@@ -1,19 +1,46 @@
 """This module is the handler for `group`"""
 
+import os
 from typing import Optional
 
-from ...db import get_connection, get_cursor
+import mysql.connector
+from mysql.connector import errorcode
+
+from ...db import (
+    UnitOfWork,
+    get_connection,
+    get_cursor,
+    get_read_connection,
+    non_blocking,
+    transactional,
+)
 from ...models.course import CourseId
 from ...models.group import GroupId
 from ...models.user import UserId
+from ..utils.http_cache import ETAG_VALIDATORS, VersionedCache, resource_versions
+from ..utils.user_in_group import membership_cache, user_in_group
+from ..utils.user_loader import UserLoader
+
+DASHBOARD_CACHE_SIZE = int(os.getenv("MEET_TEAM_DASHBOARD_CACHE_SIZE", "1024"))
+DASHBOARD_CACHE_MAX_AGE = float(os.getenv("MEET_TEAM_DASHBOARD_CACHE_MAX_AGE", "5"))
+
+# off with the ETag validators, whose versions it relies on
+dashboard_cache = VersionedCache(
+    DASHBOARD_CACHE_SIZE if ETAG_VALIDATORS > 0 else 0, DASHBOARD_CACHE_MAX_AGE
+)
 
 
-async def create(
-    course_id: CourseId, owner_id: UserId, name: str, description: Optional[str]
+@non_blocking
+@transactional
+def create(
+    uow: UnitOfWork,
+    course_id: CourseId,
+    owner_id: UserId,
+    name: str,
+    description: Optional[str],
 ):
     """This function is to create group, write into db"""
-    conn = get_connection()
-    cur = get_cursor(conn)
+    cur = uow.cur
 
     cur.execute(
         """
@@ -31,79 +58,71 @@ async def create(
         """,
         (owner_id, new_group_id),
     )
-    conn.commit()
+    uow.after_commit(membership_cache.invalidate_user, owner_id)
+    uow.after_commit(resource_versions.bump, "group", new_group_id)
+    uow.after_commit(resource_versions.bump, "course_groups", course_id)
 
-    cur.close()
-    conn.close()
     return new_group_id
 
 
-async def find_by_course(course_id: CourseId):
-    conn = get_connection()
-    cursor = get_cursor(conn)
+@non_blocking
+def find_by_course(course_id: CourseId):
+    with get_read_connection() as conn:
+        cursor = get_cursor(conn)
 
-    cursor.execute(
-        """
-        SELECT
-            g.id AS id,
-            g.name AS name,
-            g.description AS description,
-            u.name AS owner
-        FROM `course` c
-        INNER JOIN
-            `group` g
-        ON
-            c.id=g.course_id
-        INNER JOIN
-            `user` u
-        ON
-            g.owner_id = u.id
-        WHERE c.id=%s
-        """,
-        (course_id,),
-    )
-    groups = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT id, name, description, owner_id
+            FROM `group`
+            WHERE course_id=%s
+            """,
+            (course_id,),
+        )
+        groups = cursor.fetchall()
+        UserLoader(cursor).resolve_names(groups, "owner_id", "owner", keep_id=False)
 
-    cursor.close()
-    conn.close()
     return groups
 
 
-async def find_one(group_id: GroupId, user_id: UserId):
+@non_blocking
+def find_one(group_id: GroupId, user_id: UserId):
     """This function finds a group's information given group_id"""
-    conn = get_connection()
-    cur = get_cursor(conn)
-
-    cur.execute(
-        """
-    SELECT user.id, user.name, user.account, user.description
-    FROM group_member gm
-    INNER JOIN user ON gm.user_id=user.id
-    WHERE gm.group_id=%s
-    """,
-        (group_id,),
-    )
-    members = cur.fetchall()
+    with get_connection() as conn:
+        cur = get_cursor(conn)
 
-    cur.execute(
-        """
-        SELECT
-            g.id,
-            c.name AS course,
-            g.owner_id AS ownerId,
-            u.name AS owner,
-            g.name AS name,
-            g.description
-        FROM `group` g
-        INNER JOIN user u ON g.owner_id=u.id
-        INNER JOIN course c ON g.course_id=c.id
-        WHERE g.id=%s
+        cur.execute(
+            """
+        SELECT user.id, user.name, user.account, user.description
+        FROM group_member gm
+        INNER JOIN user ON gm.user_id=user.id
+        WHERE gm.group_id=%s
         """,
-        (group_id,),
-    )
-    group = cur.fetchone()
-    cur.close()
-    conn.close()
+            (group_id,),
+        )
+        members = cur.fetchall()
+
+        cur.execute(
+            """
+            SELECT
+                g.id,
+                c.name AS course,
+                g.course_id AS courseId,
+                g.owner_id AS ownerId,
+                g.name AS name,
+                g.description
+            FROM `group` g
+            INNER JOIN course c ON g.course_id=c.id
+            WHERE g.id=%s
+            """,
+            (group_id,),
+        )
+        group = cur.fetchone()
+        if group is not None:
+            # the owner is almost always a member, so this rarely queries
+            users = UserLoader(cur)
+            users.prime(members)
+            users.resolve_names([group], "ownerId", "owner")
+
     return {
         "group": group,
         "members": members,
@@ -111,13 +130,11 @@ async def find_one(group_id: GroupId, user_id: UserId):
     }
 
 
-async def update(
+@non_blocking
+def update(
     user_id: UserId, group_id: GroupId, new_name: Optional[str], new_desc: Optional[str]
 ):
     """This function update the info of course"""
-    conn = get_connection()
-    cur = get_cursor(conn)
-
     has_name = isinstance(new_name, str)
     has_desc = isinstance(new_desc, str)
 
@@ -134,55 +151,199 @@ async def update(
     if isinstance(new_name, str):
         params = (new_name,) + params
 
-    cur.execute(query, params)
-    conn.commit()
-
-    cur.close()
-    conn.close()
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        cur.execute(query, params)
+        conn.commit()
+    resource_versions.bump("group", group_id)
 
     return group_id
 
 
-async def join(user_id: UserId, group_id: GroupId):
-    """This function is to add a user into a group"""
-    conn = get_connection()
-    cur = get_cursor(conn)
+@non_blocking
+def join(user_id: UserId, group_id: GroupId):
+    """This function is to add a user into a group, a member joining again is fine"""
+    with get_connection() as conn:
+        cur = get_cursor(conn)
 
-    cur.execute(
-        """
-        INSERT INTO group_member (user_id, group_id)
-        VALUES (%s, %s)
-        """,
-        (user_id, group_id),
-    )
-    conn.commit()
+        try:
+            cur.execute(
+                """
+                INSERT INTO group_member (user_id, group_id)
+                VALUES (%s, %s)
+                """,
+                (user_id, group_id),
+            )
+        except mysql.connector.IntegrityError as e:
+            # not IGNORE, which would also let a missing group through
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+        conn.commit()
+    membership_cache.invalidate_user(user_id)
+    resource_versions.bump("group", group_id)
 
-    cur.close()
-    conn.close()
     return True
 
 
-async def find_members_by_name_pattern(group_id: GroupId, name_pattern: str):
+@non_blocking
+def find_members_by_name_pattern(group_id: GroupId, name_pattern: str):
     """This function finds group members by name pattern"""
-    conn = get_connection()
-    cur = get_cursor(conn)
+    with get_connection() as conn:
+        cur = get_cursor(conn)
 
-    cur.execute(
-        """
-        SELECT id, name
-        FROM user
-        WHERE id IN (
-            SELECT user_id
-            FROM group_member
-            WHERE group_id = %s
+        cur.execute(
+            """
+            SELECT id, name
+            FROM user
+            WHERE id IN (
+                SELECT user_id
+                FROM group_member
+                WHERE group_id = %s
+            )
+            AND name LIKE %s
+            """,
+            (group_id, f"%{name_pattern}%"),
         )
-        AND name LIKE %s
-        """,
-        (group_id, f"%{name_pattern}%"),
-    )
-    members = cur.fetchall()
+        members = cur.fetchall()
 
-    cur.close()
-    conn.close()
     return members
 
+
+def dashboard_resources(group_id: GroupId) -> list[tuple[str, GroupId]]:
+    """
+    What a group's dashboard is computed from: its members and everything
+    happening in its tasks, bumped as `group_activity` by the task, commit and
+    message writes
+    """
+    return [("group", group_id), ("group_activity", group_id)]
+
+
+@non_blocking
+def dashboard(group_id: GroupId, user_id: UserId) -> dict:
+    """
+    This function returns the progress of a group: its tasks by status, and
+    the tasks, commits, messages and last activity of each task and member.
+
+    The result is the same for every member, it is cached until one of the
+    `dashboard_resources` is written or for `DASHBOARD_CACHE_MAX_AGE` seconds.
+    """
+    user_in_group(user_id, group_id)
+    data = dashboard_cache.get(group_id)
+    if data is not None:
+        return data
+
+    clock = resource_versions.clock()
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+
+        cur.execute(
+            """
+            SELECT
+                t.id,
+                t.name,
+                t.status,
+                t.assignee_id,
+                t.reviewer_id,
+                t.create_at,
+                t.close_at,
+                COALESCE(c.commits, 0) AS commits,
+                COALESCE(m.messages, 0) AS messages,
+                GREATEST(
+                    t.create_at,
+                    COALESCE(c.last_commit_at, t.create_at),
+                    COALESCE(m.last_message_at, t.create_at)
+                ) AS last_activity_at
+            FROM task t
+            LEFT JOIN (
+                SELECT
+                    c.task_id,
+                    COUNT(*) AS commits,
+                    MAX(c.create_at) AS last_commit_at
+                FROM `commit` c
+                INNER JOIN task ct ON ct.id = c.task_id
+                WHERE ct.group_id = %s
+                GROUP BY c.task_id
+            ) c ON c.task_id = t.id
+            LEFT JOIN (
+                SELECT
+                    m.task_id,
+                    COUNT(*) AS messages,
+                    MAX(m.create_at) AS last_message_at
+                FROM message m
+                INNER JOIN task mt ON mt.id = m.task_id
+                WHERE mt.group_id = %s
+                GROUP BY m.task_id
+            ) m ON m.task_id = t.id
+            WHERE t.group_id = %s
+            ORDER BY t.id
+            """,
+            (group_id, group_id, group_id),
+        )
+        tasks = cur.fetchall()
+
+        cur.execute(
+            """
+            SELECT
+                gm.user_id,
+                COALESCE(a.assigned, 0) AS assigned,
+                COALESCE(a.done, 0) AS done,
+                COALESCE(c.commits, 0) AS commits,
+                COALESCE(m.messages, 0) AS messages,
+                GREATEST(
+                    COALESCE(c.last_commit_at, m.last_message_at),
+                    COALESCE(m.last_message_at, c.last_commit_at)
+                ) AS last_activity_at
+            FROM group_member gm
+            LEFT JOIN (
+                SELECT
+                    assignee_id,
+                    COUNT(*) AS assigned,
+                    COUNT(CASE WHEN status = 'Done' THEN 1 END) AS done
+                FROM task
+                WHERE group_id = %s
+                GROUP BY assignee_id
+            ) a ON a.assignee_id = gm.user_id
+            LEFT JOIN (
+                SELECT
+                    c.creator_id,
+                    COUNT(*) AS commits,
+                    MAX(c.create_at) AS last_commit_at
+                FROM `commit` c
+                INNER JOIN task ct ON ct.id = c.task_id
+                WHERE ct.group_id = %s
+                GROUP BY c.creator_id
+            ) c ON c.creator_id = gm.user_id
+            LEFT JOIN (
+                SELECT
+                    m.creator_id,
+                    COUNT(*) AS messages,
+                    MAX(m.create_at) AS last_message_at
+                FROM message m
+                INNER JOIN task mt ON mt.id = m.task_id
+                WHERE mt.group_id = %s
+                GROUP BY m.creator_id
+            ) m ON m.creator_id = gm.user_id
+            WHERE gm.group_id = %s
+            ORDER BY gm.user_id
+            """,
+            (group_id, group_id, group_id, group_id),
+        )
+        members = cur.fetchall()
+        UserLoader(cur).resolve_names(members, "user_id", "name")
+
+    by_status = {"Todo": 0, "Doing": 0, "Done": 0}
+    for task in tasks:
+        if task["status"] in by_status:
+            by_status[task["status"]] += 1
+    activity = [t["last_activity_at"] for t in tasks if t["last_activity_at"]]
+    data = {
+        "status": by_status,
+        "total": len(tasks),
+        "commits": sum(t["commits"] for t in tasks),
+        "messages": sum(t["messages"] for t in tasks),
+        "last_activity_at": max(activity, default=None),
+        "tasks": tasks,
+        "members": members,
+    }
+    dashboard_cache.put(group_id, dashboard_resources(group_id), clock, data)
+    return data
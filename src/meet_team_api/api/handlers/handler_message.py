@@ -1,66 +1,255 @@
-# create 新的message
-from typing import Dict
+"""
+This module is the handler for `message`.
 
-from mysql.connector.abstracts import (MySQLConnectionAbstract,
-                                       MySQLCursorAbstract)
-from mysql.connector.types import RowItemType
+New messages are published on the `task:<task_id>` channel of the pub/sub
+broker, which feeds the SSE and WebSocket streams of the message router.
+"""
 
-from ...db import get_connection, get_cursor
+import logging
+import os
+import threading
 
-async def find_all(creator_id,task_id):
-    conn: MySQLConnectionAbstract = get_connection()
-    cur: MySQLCursorAbstract = get_cursor(conn)
+from mysql.connector.abstracts import MySQLCursorAbstract
 
-    cur.execute(
-        """
-        SELECT EXISTS(
-            SELECT * FROM task
-            WHERE user_id = %s AND task_id = %s
-        ) AS in_task
-        """
+from ...db import UnitOfWork, get_connection, get_cursor, non_blocking
+from ...write_behind import write_behind
+from ..utils.http_cache import resource_versions
+from ..utils.pubsub import PubSubBackend, broker
+from ..utils.user_in_group import user_in_task_group
+from ..utils.user_loader import UserLoader
+
+MESSAGE_PAGE_SIZE = int(os.getenv("MEET_TEAM_MESSAGE_PAGE_SIZE", "200"))
+MESSAGE_BACKEND = os.getenv("MEET_TEAM_MESSAGE_BACKEND", "local")
+MESSAGE_POLL_INTERVAL = float(os.getenv("MEET_TEAM_MESSAGE_POLL_INTERVAL", "1"))
+# How many ids below the last one seen each poll reads again
+MESSAGE_POLL_WINDOW = int(os.getenv("MEET_TEAM_MESSAGE_POLL_WINDOW", "100"))
+
+logger = logging.getLogger(__name__)
+
+
+def task_channel(task_id: int) -> str:
+    """The broker channel of a task's messages"""
+    return f"task:{task_id}"
+
+
+def _with_names(cur: MySQLCursorAbstract, rows: list[dict]) -> list[dict]:
+    return UserLoader(cur).resolve_names(rows, "creator_id", "user_name")
+
+
+@non_blocking
+def find_all(user_id, task_id, after_id: int = 0, limit: int = MESSAGE_PAGE_SIZE):
+    """This function returns the messages of a task posted after `after_id`"""
+    with get_connection() as conn:
+        cur: MySQLCursorAbstract = get_cursor(conn)
+
+        user_in_task_group(user_id, task_id, cur)
+
+        cur.execute(
+            """
+            SELECT id, task_id, creator_id, description, create_at
+            FROM message
+            WHERE task_id = %s AND id > %s
+            ORDER BY id
+            LIMIT %s
+            """,
+            (task_id, after_id, limit),
+        )
+        ret = _with_names(cur, cur.fetchall())
+
+    return ret
+
+
+@non_blocking
+def create(task_id, creator_id, description):
+    """This function is to create a new message, and publish it"""
+    with get_connection() as conn:
+        cur: MySQLCursorAbstract = get_cursor(conn)
+
+        group_id = user_in_task_group(creator_id, task_id, cur)
+
+        cur.execute(
+            """
+            INSERT INTO `message` (task_id, creator_id, description)
+            VALUES (%s, %s, %s)
+            """,
+            (task_id, creator_id, description),
+        )
+        conn.commit()
+
+        cur.execute(
+            """
+            SELECT id, task_id, creator_id, description, create_at
+            FROM message
+            WHERE id = %s
+            """,
+            (cur.lastrowid,),
+        )
+        message = _with_names(cur, [cur.fetchone()])[0]
+
+    resource_versions.bump("group_activity", group_id)
+    broker.publish(task_channel(task_id), message)
+    return message
+
+
+@non_blocking
+def enqueue(task_id, creator_id, description) -> dict:
+    """
+    This function is to journal a new message for the write-behind flusher.
+
+    Returns the message without its id and time, which it gets once flushed
+    and published, carrying the same `ref`.
+    """
+    group_id = user_in_task_group(creator_id, task_id)
+    ref = write_behind.enqueue(
+        "message",
+        {
+            "task_id": task_id,
+            "creator_id": creator_id,
+            "group_id": group_id,
+            "description": description,
+        },
     )
+    return {
+        "id": None,
+        "ref": ref,
+        "task_id": task_id,
+        "creator_id": creator_id,
+        "description": description,
+        "create_at": None,
+    }
 
-    exist = cur.fetchone()
-    if not isinstance(exist, Dict[str, RowItemType]) or exist["in_task"] is False:
-        cur.close()
-        conn.close()
-        raise Exception("You're not in this group")
 
-    cur.execute(
+def _flush_journal(uow: UnitOfWork, messages: list[dict]):
+    """This function inserts journaled messages and publishes them once committed"""
+    cur = uow.cur
+
+    cur.executemany(
         """
-        SELECT
-            message.id,
-            message.description
-            message.create_at AS message_create,
-            u.name AS user_name,
-        FROM
-            message
-        INNER JOIN user u ON
-            message.creator_id = u.id
-        WHERE message.task_id=%s
+        INSERT IGNORE INTO `message` (task_id, creator_id, description, client_ref)
+        VALUES (%s, %s, %s, %s)
         """,
-        (task_id,),
+        [
+            (
+                message["task_id"],
+                message["creator_id"],
+                message["description"],
+                message["ref"],
+            )
+            for message in messages
+        ],
+    )
+    refs = [message["ref"] for message in messages]
+    cur.execute(
+        f"""
+        SELECT id, task_id, creator_id, description, create_at, client_ref AS ref
+        FROM message
+        WHERE client_ref IN ({", ".join(["%s"] * len(refs))})
+        ORDER BY id
+        """,
+        refs,
+    )
+    for message in _with_names(cur, cur.fetchall()):
+        uow.after_commit(broker.publish, task_channel(message["task_id"]), message)
+    uow.after_commit(
+        resource_versions.bump,
+        "group_activity",
+        *{message["group_id"] for message in messages},
     )
-    ret = cur.fetchall()
 
-    cur.close()
-    conn.close()
 
-    return ret
+write_behind.register("message", _flush_journal)
 
 
-async def create(task_id, creator_id, description):
-    """This function is to create a new message """
-    conn: MySQLConnectionAbstract = get_connection()
-    cur: MySQLCursorAbstract = get_cursor(conn)
-    cur.execute(
-        """ 
-        INSERT INTO `message` (task_id, creator_id, description)
-        VALUES (%s, %s, %s)
-        """, 
-        (task_id, creator_id, description),
-    )
-    conn.commit()
+class MessagePollBackend(PubSubBackend):
+    """
+    A broker backend for multi-worker deployments, reading `message` itself.
+
+    Each process runs one poller issuing a primary-key range query every
+    `interval` seconds, whatever its number of subscribers, so messages
+    posted through any worker reach every stream. Local publishes are still
+    delivered at once; the subscriptions drop the copy the poller sees.
+
+    Ids are allocated at insert but become visible at commit, so a message
+    may show up below the last id polled. Each poll reads the last `window`
+    ids again and delivers the ones it hadn't seen; a message committing
+    later than `window` newer ones is only found by a client resuming.
+    """
+
+    def __init__(
+        self, interval: float = MESSAGE_POLL_INTERVAL, window: int = MESSAGE_POLL_WINDOW
+    ):
+        self.interval = interval
+        self.window = window
+        self._delivered: set[int] = set()
+        self._deliver = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, deliver):
+        self._deliver = deliver
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="meet_team_message_poll", daemon=True
+        )
+        self._thread.start()
+
+    def publish(self, channel: str, message: dict):
+        if self._deliver is not None:
+            self._deliver(channel, message)
+
+    def close(self):
+        self._stop.set()
+
+    def _poll(self, last_id: int | None) -> int | None:
+        with get_connection() as conn:
+            cur = get_cursor(conn)
+            if last_id is None:
+                # the messages already there count as delivered
+                cur.execute(
+                    """
+                    SELECT id
+                    FROM message
+                    ORDER BY id DESC
+                    LIMIT %s
+                    """,
+                    (max(self.window, 1),),
+                )
+                self._delivered = {row["id"] for row in cur.fetchall()}
+                return max(self._delivered, default=0)
+            cur.execute(
+                """
+                SELECT id, task_id, creator_id, description, create_at
+                FROM message
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+                """,
+                (last_id - self.window, self.window + MESSAGE_PAGE_SIZE),
+            )
+            rows = [row for row in cur.fetchall() if row["id"] not in self._delivered]
+            rows = _with_names(cur, rows)
+        for row in rows:
+            self._deliver(task_channel(row["task_id"]), row)
+        last_id = max([last_id, *(row["id"] for row in rows)])
+        self._delivered = {
+            message_id
+            for message_id in self._delivered.union(row["id"] for row in rows)
+            if message_id > last_id - self.window
+        }
+        return last_id
+
+    def _run(self):
+        last_id = None
+        while not self._stop.wait(self.interval):
+            try:
+                last_id = self._poll(last_id)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("message poll failed")
+
 
-    cur.close()
-    conn.close()
+def install_backend():
+    """Install the broker backend chosen by `MEET_TEAM_MESSAGE_BACKEND`"""
+    if MESSAGE_BACKEND == "poll":
+        broker.use_backend(MessagePollBackend())
+    elif MESSAGE_BACKEND != "local":
+        raise ValueError(f"Unknown message backend {MESSAGE_BACKEND!r}")
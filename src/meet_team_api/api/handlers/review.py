@@ -1,12 +1,17 @@
 """This module is the handler for `review`"""
 
 from fastapi import status, HTTPException
-from fastapi.responses import JSONResponse
 
-from ...db import get_connection, get_cursor
+from ...db import UnitOfWork, get_connection, get_cursor, non_blocking, transactional
 from ...models.user import UserId
+from ..utils import ratings as rating_aggregates
+from ..utils.http_cache import resource_versions
+from ..utils.json_response import JSONResponse
+from ..utils.user_in_group import user_in_group
+from ..utils.user_loader import UserLoader
 
 
+@non_blocking
 def get_group_members_and_reviews(group_id: int, user_id: int) -> list:
     """
     Retrieves the group members and their reviews for a given group and user.
@@ -53,51 +58,40 @@ def get_group_members_and_reviews(group_id: int, user_id: int) -> list:
                 }
             }
     """
-    conn = get_connection()
-    cursor = get_cursor(conn)
+    with get_connection() as conn:
+        cursor = get_cursor(conn)
 
+        # check if user is in the group
+        user_in_group(user_id, group_id, cursor)
 
-    # check if user is in the group
-    cursor.execute(
-        """
-        SELECT EXISTS(
-            SELECT * FROM group_member
-            WHERE user_id = %s AND group_id = %s
-        ) AS in_group
+        # fetch member ids
+        cursor.execute(
+            """
+        SELECT user_id
+        FROM `group_member`
+        WHERE group_id = %s
         """,
-        (user_id, group_id),
-    )
-    if cursor.fetchone()["in_group"] == 0:
-        cursor.close()
-        conn.close()
-        raise Exception("You're not in this group")
+            (group_id,),
+        )
+        member_ids = [row["user_id"] for row in cursor.fetchall()]
 
-    # fetch members
-    cursor.execute(
-        """
-    SELECT u.id, u.name, u.description
-    FROM `user` u
-    JOIN `group_member` gm ON u.id = gm.user_id
-    WHERE gm.group_id = %s
-    """,
-        (group_id,),
-    )
-    members = cursor.fetchall()
+        # fetch reviews
+        cursor.execute(
+            """
+        SELECT id, user_id, content, rating, create_at
+        FROM `review`
+        WHERE group_id = %s AND reviewer_id = %s
+        """,
+            (group_id, user_id),
+        )
+        reviews = cursor.fetchall()
 
-    # fetch reviews
-    cursor.execute(
-        """
-    SELECT r.id, r.user_id, r.content, r.rating, r.create_at, u.name
-    FROM `review` r
-    JOIN `user` u ON u.id = r.user_id
-    WHERE r.group_id = %s AND r.reviewer_id = %s
-    """,
-        (group_id, user_id),
-    )
-    reviews = cursor.fetchall()
+        # reviewed users are members, one lookup resolves both lists
+        users = UserLoader(cursor)
+        profiles = users.load_many(member_ids + [r["user_id"] for r in reviews])
+        members = [dict(profiles[uid]) for uid in member_ids if uid in profiles]
+        users.resolve_names(reviews, "user_id", "name")
 
-    cursor.close()
-    conn.close()
     return {
         "data": {
             "members": members,
@@ -106,13 +100,16 @@ def get_group_members_and_reviews(group_id: int, user_id: int) -> list:
     }
 
 
-async def upsert_review(
-    group_id, reviewer_id, reviews: dict[UserId, str | float]
+@non_blocking
+@transactional
+def upsert_review(
+    uow: UnitOfWork, group_id, reviewer_id, reviews: dict[UserId, str | float]
 ) -> dict:
     """
     Upsert a review for a group and user.
 
     Args:
+        uow (UnitOfWork): The transaction, passed by `transactional`.
         group_id (int): The ID of the group.
         user_id (int): The ID of the user.
         content (str): The content of the review.
@@ -120,11 +117,20 @@ async def upsert_review(
     Returns:
         dict: The result message.
     """
-    conn = get_connection()
-    cursor = get_cursor(conn)
-
     print(group_id, reviewer_id, reviews)
 
+    ratings = {
+        int(user_id): (review["rating"] * 10) // 5 / 2
+        for user_id, review in reviews.items()
+    }
+
+    cursor = uow.cur
+
+    # the ratings being replaced, to keep the aggregates in step
+    old_ratings = rating_aggregates.previous_ratings(
+        cursor, group_id, reviewer_id, ratings
+    )
+
     # upsert review
     cursor.executemany(
         """
@@ -138,22 +144,22 @@ async def upsert_review(
             (
                 group_id,
                 reviewer_id,
-                user_id,
+                int(user_id),
                 review["content"],
-                (review["rating"] * 10) // 5 / 2,
+                ratings[int(user_id)],
             )
             for user_id, review in reviews.items()
         ],
     )
-
-    cursor.close()
-    conn.commit()
-    conn.close()
+    rating_aggregates.apply_ratings(cursor, group_id, old_ratings, ratings)
+    # their profiles show the average rating
+    uow.after_commit(resource_versions.bump, "user", *ratings)
 
     return {"data": {"message": "ok"}}
 
 
-async def get_user_review(user_id: UserId):
+@non_blocking
+def get_user_review(user_id: UserId):
     """
     Retrieves all reviews written to a specific user.
 
@@ -176,22 +182,20 @@ async def get_user_review(user_id: UserId):
         HTTPException: If an error occurs during the retrieval process.
     """
     try:
-        conn = get_connection()
-        cursor = get_cursor(conn)
-
-        cursor.execute(
-            """
-        SELECT r.id, r.content, r.rating, c.name AS course
-        FROM `review` AS r
-        JOIN `course` AS c ON r.group_id = c.id
-        WHERE r.user_id = %s
-        """,
-            (user_id,),
-        )
+        with get_connection() as conn:
+            cursor = get_cursor(conn)
+
+            cursor.execute(
+                """
+            SELECT r.id, r.content, r.rating, c.name AS course
+            FROM `review` AS r
+            JOIN `course` AS c ON r.group_id = c.id
+            WHERE r.user_id = %s
+            """,
+                (user_id,),
+            )
 
-        reviews = cursor.fetchall()
-        cursor.close()
-        conn.close()
+            reviews = cursor.fetchall()
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -0,0 +1,181 @@
+"""
+This module is the handler for the roster import of a course.
+
+A roster is a list of {account, role, group} entries: every account is
+enrolled in the course with its role (default `Stu`) and, when a group name
+is given, added to that group of the course. Entries are processed in
+batches of `ROSTER_BATCH_SIZE`, each resolved with one query per table and
+written in one transaction, and importing the same roster twice is a no-op.
+"""
+
+import csv
+import io
+import json
+import os
+
+from mysql.connector.abstracts import MySQLCursorAbstract
+
+from ...db import get_connection, get_cursor
+from ...models.course import CourseId
+from ..utils.http_cache import resource_versions
+from ..utils.user_in_group import membership_cache
+
+ROSTER_BATCH_SIZE = int(os.getenv("MEET_TEAM_ROSTER_BATCH_SIZE", "1000"))
+ROSTER_ROLES = ("Prof", "TA", "Stu")
+
+
+def parse_roster(body: bytes, content_type: str) -> list[dict]:
+    """
+    Read a roster sent as CSV (with an `account` header) or as JSON (a list
+    of objects, or `{"students": [...]}`).
+
+    Raises:
+        ValueError: If the body can't be read as a roster.
+    """
+    if content_type.startswith("text/csv"):
+        reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        if reader.fieldnames is None or "account" not in reader.fieldnames:
+            raise ValueError("The CSV roster needs an `account` column")
+        return list(reader)
+
+    entries = json.loads(body)
+    if isinstance(entries, dict):
+        entries = entries.get("students")
+    if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+        raise ValueError("The JSON roster must be a list of objects")
+    return entries
+
+
+def _placeholders(values) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def _import_batch(
+    cur: MySQLCursorAbstract, course_id: CourseId, groups: dict[str, int], batch
+) -> tuple[list[dict], set[int]]:
+    """Enroll one batch, returns the per-entry results and the users regrouped"""
+    accounts = {str(entry.get("account") or "").strip() for _, entry in batch}
+    accounts.discard("")
+    user_ids = {}
+    if accounts:
+        cur.execute(
+            f"""
+            SELECT id, account FROM user
+            WHERE account IN ({_placeholders(accounts)})
+            """,
+            tuple(accounts),
+        )
+        user_ids = {row["account"]: row["id"] for row in cur.fetchall()}
+
+    enrolled, grouped = set(), set()
+    if user_ids:
+        ids = tuple(user_ids.values())
+        cur.execute(
+            f"""
+            SELECT user_id FROM course_member
+            WHERE course_id = %s AND user_id IN ({_placeholders(ids)})
+            """,
+            (course_id, *ids),
+        )
+        enrolled = {row["user_id"] for row in cur.fetchall()}
+        if groups:
+            cur.execute(
+                f"""
+                SELECT gm.user_id, gm.group_id
+                FROM group_member gm
+                WHERE gm.group_id IN ({_placeholders(groups)})
+                    AND gm.user_id IN ({_placeholders(ids)})
+                """,
+                (*groups.values(), *ids),
+            )
+            grouped = {(row["user_id"], row["group_id"]) for row in cur.fetchall()}
+
+    results, members, group_members = [], [], []
+    for row_number, entry in batch:
+        account = str(entry.get("account") or "").strip()
+        role = entry.get("role") or "Stu"
+        group_name = entry.get("group") or None
+        result = {"row": row_number, "account": account}
+        results.append(result)
+
+        user_id = user_ids.get(account)
+        group_id = groups.get(group_name) if group_name is not None else None
+        if user_id is None:
+            result["status"] = "unknown account"
+            continue
+        if role not in ROSTER_ROLES:
+            result["status"] = "invalid role"
+            continue
+        if group_name is not None and group_id is None:
+            result["status"] = "unknown group"
+            continue
+
+        new_member = user_id not in enrolled
+        if new_member:
+            enrolled.add(user_id)
+            members.append((course_id, user_id, role))
+        new_in_group = group_id is not None and (user_id, group_id) not in grouped
+        if new_in_group:
+            grouped.add((user_id, group_id))
+            group_members.append((user_id, group_id))
+
+        result["user_id"] = user_id
+        if group_id is not None:
+            result["group_id"] = group_id
+        if new_member:
+            result["status"] = "enrolled"
+        else:
+            result["status"] = "grouped" if new_in_group else "unchanged"
+
+    # IGNORE keeps a concurrent import of the same roster harmless
+    if members:
+        cur.execute(
+            f"""
+            INSERT IGNORE INTO course_member (course_id, user_id, role)
+            VALUES {", ".join(["(%s, %s, %s)"] * len(members))}
+            """,
+            [value for member in members for value in member],
+        )
+    if group_members:
+        cur.execute(
+            f"""
+            INSERT IGNORE INTO group_member (user_id, group_id)
+            VALUES {", ".join(["(%s, %s)"] * len(group_members))}
+            """,
+            [value for member in group_members for value in member],
+        )
+    return results, {user_id for user_id, _ in group_members}
+
+
+def import_roster(course_id: CourseId, entries: list[dict]):
+    """
+    Enroll a roster, yielding the results of each batch once committed.
+
+    This is a plain generator for a `StreamingResponse`; a connection is only
+    held while a batch is written, never across a yield to the client.
+    """
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        cur.execute(
+            """
+            SELECT id, name FROM `group`
+            WHERE course_id = %s
+            """,
+            (course_id,),
+        )
+        groups = {row["name"]: row["id"] for row in cur.fetchall()}
+
+    numbered = list(enumerate(entries, start=1))
+    for start in range(0, len(numbered), ROSTER_BATCH_SIZE):
+        batch = numbered[start : start + ROSTER_BATCH_SIZE]
+        with get_connection() as conn:
+            cur = get_cursor(conn)
+            results, regrouped = _import_batch(cur, course_id, groups, batch)
+            conn.commit()
+        for user_id in regrouped:
+            membership_cache.invalidate_user(user_id)
+        resource_versions.bump("course", course_id)
+        resource_versions.bump(
+            "group", *{r["group_id"] for r in results if "group_id" in r}
+        )
+        yield results
@@ -1,150 +1,108 @@
+import json
 from typing import Optional
 
-from mysql.connector.abstracts import MySQLConnectionAbstract, MySQLCursorAbstract
+from mysql.connector.abstracts import MySQLCursorAbstract
 
-from ...db import get_connection, get_cursor
+from ...db import get_connection, get_cursor, get_read_connection, non_blocking
 from ...models.user import UserId
-from ..utils.user_in_group import user_in_group
+from ..utils.http_cache import resource_versions
+from ..utils.user_in_group import user_in_group, user_in_task_group
 
+# The DATE_FORMAT of the timestamps in the task document, bound as a parameter:
+# mysql-connector doesn't unescape `%%`, a `%s` in the literal is a placeholder
+ISO_DATETIME = "%Y-%m-%dT%H:%i:%s"
 
-async def find_all(group_id: int, user_id: int, me: bool):
-    conn = get_connection()
-    cur = get_cursor(conn)
 
+@non_blocking
+def find_all(group_id: int, user_id: int, me: bool):
     try:
         user_in_group(user_id, group_id)
     except Exception as e:
         raise e
 
+    with get_read_connection() as conn:
+        cur = get_cursor(conn)
+
+        if me:
+            query = """
+            SELECT id, name, task.description, status, create_at, close_at
+            FROM task
+            WHERE group_id = %s AND %s IN (assignee_id, reviewer_id)
+            """
+            cur.execute(query, (group_id, user_id))
+        else:
+            query = """
+            SELECT id, name, description, status, create_at, close_at
+            FROM task
+            WHERE group_id = %s
+            """
+            cur.execute(query, (group_id,))
+        ret = cur.fetchall()
 
-    if me:
-        query = """
-        SELECT id, name, task.description, status, create_at, close_at
-        FROM task
-        WHERE group_id = %s AND %s IN (assignedd_id, reviewer_id)
-        """
-        cur.execute(query, (group_id, user_id))
-    else:
-        query = """
-        SELECT id, name, description, status, create_at, close_at
-        FROM task
-        WHERE group_id = %s
-        """
-        cur.execute(query, (group_id,))
-    ret = cur.fetchall()
-    for row in ret:
-        if row["create_at"] is not None:
-            row["create_at"] = row["create_at"].strftime("%Y-%m-%d %H:%M:%S")
-        if row["close_at"] is not None:
-            row["close_at"] = row["close_at"].strftime("%Y-%m-%d %H:%M:%S")
-    cur.close()
-    conn.close()
     return ret
 
 
-async def find_one(task_id: int, user_id):
-    conn = get_connection()
-    cur = get_cursor(conn)
-
-    # check if the user is in the group
-    cur.execute(
-        """
-        SELECT EXISTS(
-            SELECT *
-            FROM `group_member` gm
-            INNER JOIN `task` t
-            ON t.group_id = gm.group_id
-            WHERE user_id=%s AND t.id=%s
-        ) AS in_group;
-        """,
-        (user_id, task_id),
-    )
-    result = cur.fetchone()
-    if result["in_group"] is False:
-        cur.close()
-        conn.close()
-        raise Exception("You're not in this group")
+@non_blocking
+def find_one(task_id: int, user_id):
+    """
+    This function returns a task with its assignee, reviewer and commits.
 
-    cur.execute(
-        """
-        SELECT
-            task.id,
-            task.name,
-            task.description,
-            assignee_id,
-            u1.name AS assignee_name,
-            reviewer_id,
-            u2.name AS reviewer_name,
-            task.create_at,
-            task.close_at,
-            task.status
-        FROM task
-        LEFT JOIN `user` u1 ON u1.id=assignee_id
-        LEFT JOIN `user` u2 ON u2.id=reviewer_id
-        WHERE task.id=%s
-        """,
-        (task_id,),
-    )
-    task_info = cur.fetchone()
-    if task_info["create_at"] is not None:
-        task_info["create_at"] = task_info["create_at"].isoformat()
-    if task_info["close_at"] is not None:
-        task_info["close_at"] = task_info["close_at"].isoformat()
-    if task_info.get("assignee_id", None) is not None:
-        task_info["assignee"] = {
-            "id": task_info["assignee_id"],
-            "name": task_info["assignee_name"],
-        }
-        del task_info["assignee_id"]
-        del task_info["assignee_name"]
-    else:
-        task_info["assignee"] = {
-            "id": None,
-            "name": None,
-        }
-    if task_info.get("reviewer_id", None) is not None:
-        task_info["reviewer"] = {
-            "id": task_info["reviewer_id"],
-            "name": task_info["reviewer_name"],
-        }
-        del task_info["reviewer_id"]
-        del task_info["reviewer_name"]
-    else:
-        task_info["reviewer"] = {
-            "id": None,
-            "name": None,
-        }
-
-    cur.execute(
-        """
-        WITH c AS (
-            SELECT *
-            FROM `commit`
-            WHERE task_id=%s
+    Everything, including the membership check, is one query: MySQL builds
+    the response document with JSON_OBJECT / JSON_ARRAYAGG, and no row comes
+    back when the task doesn't exist or the user isn't in its group.
+    """
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+
+        cur.execute(
+            """
+            SELECT JSON_OBJECT(
+                'task', JSON_OBJECT(
+                    'id', t.id,
+                    'name', t.name,
+                    'description', t.description,
+                    'create_at', DATE_FORMAT(t.create_at, %s),
+                    'close_at', DATE_FORMAT(t.close_at, %s),
+                    'status', t.status,
+                    'assignee', JSON_OBJECT('id', u1.id, 'name', u1.name),
+                    'reviewer', JSON_OBJECT('id', u2.id, 'name', u2.name)
+                ),
+                'commits', COALESCE(
+                    (
+                        SELECT JSON_ARRAYAGG(JSON_OBJECT(
+                            'id', c.id,
+                            'creator_id', c.creator_id,
+                            'username', u.name,
+                            'title', c.title,
+                            'description', c.description,
+                            'reference_link', c.reference_link,
+                            'create_at', DATE_FORMAT(c.create_at, %s)
+                        ))
+                        FROM `commit` c
+                        INNER JOIN `user` u ON c.creator_id=u.id
+                        WHERE c.task_id=t.id
+                    ),
+                    JSON_ARRAY()
+                )
+            ) AS detail
+            FROM task t
+            INNER JOIN `group_member` gm
+            ON gm.group_id=t.group_id AND gm.user_id=%s
+            LEFT JOIN `user` u1 ON u1.id=t.assignee_id
+            LEFT JOIN `user` u2 ON u2.id=t.reviewer_id
+            WHERE t.id=%s
+            """,
+            (ISO_DATETIME, ISO_DATETIME, ISO_DATETIME, user_id, task_id),
         )
-        SELECT
-            c.id,
-            c.creator_id,
-            u.name AS username,
-            c.title,
-            c.description,
-            c.reference_link,
-            c.create_at
-        FROM c
-        INNER JOIN `user` u
-        ON c.creator_id=u.id;
-        """,
-        (task_id,),
-    )
-    commit_info = cur.fetchall()
-    for cmt in commit_info:
-        cmt["create_at"] = cmt["create_at"].isoformat()
-    cur.close()
-    conn.close()
-    return {"task": task_info, "commits": commit_info}
-
-
-async def create(
+        row = cur.fetchone()
+
+    if row is None:
+        raise Exception("You're not in this group")
+    return json.loads(row["detail"])
+
+
+@non_blocking
+def create(
     user_id: int,
     group_id: int,
     name: str,
@@ -152,10 +110,9 @@ async def create(
     assignee_id: Optional[int],
     reviewer_id: Optional[int],
 ) -> int | None:
-    conn: MySQLConnectionAbstract = get_connection()
-    cur: MySQLCursorAbstract = get_cursor(conn)
+    with get_connection() as conn:
+        cur: MySQLCursorAbstract = get_cursor(conn)
 
-    try:
         cur.execute(
             """
             INSERT INTO
@@ -174,46 +131,152 @@ async def create(
         conn.commit()
 
         new_task_id: Optional[int] = cur.lastrowid
-    except Exception as e:
-        cur.close()
-        conn.close()
-        raise e
+    resource_versions.bump("group_activity", group_id)
 
-    cur.close()
-    conn.close()
     return new_task_id
 
 
-async def patch(user_id: UserId, task_id: int):
-    conn = get_connection()
-    cur = get_cursor(conn)
-    # check if the user is in the group
-    cur.execute(
-        """
-        SELECT EXISTS(
-            SELECT *
-            FROM `group_member` gm
-            INNER JOIN `task` t
-            ON t.group_id = gm.group_id
-            WHERE user_id=%s AND t.id=%s
-        ) AS in_group;
-        """,
-        (user_id, task_id),
-    )
-    result = cur.fetchone()
-    if result["in_group"] is False:
-        cur.close()
-        conn.close()
-        raise Exception("You're not in this group")
+# Rows per multi-row INSERT, keeps a statement well under max_allowed_packet
+TASK_INSERT_CHUNK = 500
+
+
+def _insert_tasks(cur: MySQLCursorAbstract, rows: list[tuple]) -> list[int]:
+    """
+    Insert tasks with multi-row INSERTs and return their ids, in order.
+
+    Each row is (name, description, group_id, creator_id, assignee_id,
+    reviewer_id). InnoDB hands the rows of one multi-row VALUES insert
+    consecutive auto-increment values (the row count is known upfront, in
+    every `innodb_autoinc_lock_mode`), `lastrowid` being the first of them.
+    """
+    cur.execute("SELECT @@auto_increment_increment AS step")
+    step = cur.fetchone()["step"]
+    ids = []
+    for start in range(0, len(rows), TASK_INSERT_CHUNK):
+        chunk = rows[start : start + TASK_INSERT_CHUNK]
+        cur.execute(
+            f"""
+            INSERT INTO
+                task (
+                    name,
+                    description,
+                    group_id,
+                    creator_id,
+                    assignee_id,
+                    reviewer_id
+                )
+            VALUES {", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(chunk))}
+            """,
+            [value for row in chunk for value in row],
+        )
+        ids.extend(cur.lastrowid + i * step for i in range(len(chunk)))
+    return ids
 
-    cur.execute(
-        """
-        UPDATE `task` SET status='Done'
-        WHERE id = %s
-        """,
-        (task_id,),
-    )
-    conn.commit()
-
-    cur.close()
-    conn.close()
+
+@non_blocking
+def bulk_create(user_id: UserId, group_id: int, tasks: list[dict]) -> list[int]:
+    """
+    This function creates many tasks of a group in one transaction.
+
+    `tasks` are `TaskCreateModel` dicts; their assignees and reviewers must be
+    members of the group. Returns the new ids in the order of `tasks`.
+    """
+    with get_connection() as conn:
+        cur: MySQLCursorAbstract = get_cursor(conn)
+
+        user_in_group(user_id, group_id, cur)
+
+        people = {t[role] for t in tasks for role in ("assignee", "reviewer")}
+        people.discard(None)
+        if people:
+            cur.execute(
+                f"""
+                SELECT user_id FROM group_member
+                WHERE group_id = %s
+                    AND user_id IN ({", ".join(["%s"] * len(people))})
+                """,
+                (group_id, *people),
+            )
+            outsiders = people - {row["user_id"] for row in cur.fetchall()}
+            if outsiders:
+                raise ValueError(
+                    f"Users {sorted(outsiders)} are not members of this group"
+                )
+
+        ids = _insert_tasks(
+            cur,
+            [
+                (
+                    t["name"],
+                    t["description"],
+                    group_id,
+                    user_id,
+                    t["assignee"],
+                    t["reviewer"],
+                )
+                for t in tasks
+            ],
+        )
+        conn.commit()
+    resource_versions.bump("group_activity", group_id)
+
+    return ids
+
+
+@non_blocking
+def create_from_template(
+    user_id: UserId, course_id: int, tasks: list[dict]
+) -> dict[int, list[int]]:
+    """
+    This function copies template tasks into every group of a course.
+
+    The copies are unassigned, the groups distribute them. Everything is one
+    transaction; returns group id -> the new task ids, in template order.
+    """
+    with get_connection() as conn:
+        cur: MySQLCursorAbstract = get_cursor(conn)
+
+        cur.execute(
+            """
+            SELECT id FROM `group`
+            WHERE course_id = %s
+            ORDER BY id
+            """,
+            (course_id,),
+        )
+        group_ids = [row["id"] for row in cur.fetchall()]
+
+        ids = _insert_tasks(
+            cur,
+            [
+                (t["name"], t["description"], group_id, user_id, None, None)
+                for group_id in group_ids
+                for t in tasks
+            ],
+        )
+        conn.commit()
+    resource_versions.bump("group_activity", *group_ids)
+
+    return {
+        group_id: ids[i * len(tasks) : (i + 1) * len(tasks)]
+        for i, group_id in enumerate(group_ids)
+    }
+
+
+@non_blocking
+def patch(user_id: UserId, task_id: int):
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        # check if the user is in the group
+        group_id = user_in_task_group(user_id, task_id, cur)
+
+        cur.execute(
+            """
+            UPDATE `task` SET status='Done'
+            WHERE id = %s
+            """,
+            (task_id,),
+        )
+        conn.commit()
+    resource_versions.bump("task", task_id)
+    resource_versions.bump("group_activity", group_id)
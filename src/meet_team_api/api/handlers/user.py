@@ -1,10 +1,13 @@
 """This is the user handlers, for the user router"""
 
-from ...db import get_connection, get_cursor
+from ...db import get_connection, get_cursor, non_blocking
 from ...models.user import UserId
+from ..utils.http_cache import resource_versions
+from ..utils.user_loader import UserLoader, user_profiles
 
 
-async def register(account: str, password: str, name: str) -> int | None:
+@non_blocking
+def register(account: str, password: str, name: str) -> int | None:
     """
     Register a new user in the database.
 
@@ -19,28 +22,27 @@ async def register(account: str, password: str, name: str) -> int | None:
     Raises:
         Exception: If an error occurs during the registration process.
     """
-    conn = get_connection()
-    cur = get_cursor(conn)
+    with get_connection() as conn:
+        cur = get_cursor(conn)
 
-    query = """
-    INSERT INTO user (account, password, name)
-    VALUES (%(account)s, %(password)s, %(name)s)
-    """
-    new_user = {"account": account, "password": password, "name": name}
+        query = """
+        INSERT INTO user (account, password, name)
+        VALUES (%(account)s, %(password)s, %(name)s)
+        """
+        new_user = {"account": account, "password": password, "name": name}
 
-    try:
-        cur.execute(query, new_user)
-        conn.commit()
-    except Exception as e:
-        raise e
+        try:
+            cur.execute(query, new_user)
+            conn.commit()
+        except Exception as e:
+            raise e
 
-    new_user_id = cur.lastrowid
-    cur.close()
-    conn.close()
+        new_user_id = cur.lastrowid
     return new_user_id
 
 
-async def login(account: str, password: str) -> int | None:
+@non_blocking
+def login(account: str, password: str) -> int | None:
     """
     Asynchronously logs in a user given their account and password.
 
@@ -51,21 +53,20 @@ async def login(account: str, password: str) -> int | None:
     Returns:
         int | None: The ID of the user if they exist and their password matches, None otherwise.
     """
-    conn = get_connection()
-    cur = get_cursor(conn)
+    with get_connection() as conn:
+        cur = get_cursor(conn)
 
-    query = """
-    SELECT id FROM user
-    WHERE account=%s AND password=%s
-    """
-    cur.execute(query, (account, password))
-    ret = cur.fetchone()
-    cur.close()
-    conn.close()
+        query = """
+        SELECT id FROM user
+        WHERE account=%s AND password=%s
+        """
+        cur.execute(query, (account, password))
+        ret = cur.fetchone()
     return ret
 
 
-async def find_info(user_id: UserId, is_self: bool) -> dict[str, str]:
+@non_blocking
+def find_info(user_id: UserId, is_self: bool) -> dict[str, str]:
     """
     Asynchronously fetches the user information for a given user ID.
 
@@ -79,23 +80,25 @@ async def find_info(user_id: UserId, is_self: bool) -> dict[str, str]:
             - 'account' (str): The account of the user.
             - 'name' (str): The name of the user.
             - 'description' (str): The description of the user.
+            - 'avg_rating' (float | None): The average rating the user received.
             If the user does not exist, an empty dictionary is returned.
     """
-    conn = get_connection()
-    cur = get_cursor(conn)
-    ret = {}
-    query: str = """
-    SELECT id, account, name, description
-    FROM user WHERE id=%s
-    """
-    cur.execute(query, (user_id,))
-    ret = cur.fetchone()
-    cur.close()
-    conn.close()
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        ret = {}
+        query: str = """
+        SELECT u.id, u.account, u.name, u.description, ur.avg_rating
+        FROM user u
+        LEFT JOIN user_rating ur ON ur.user_id = u.id
+        WHERE u.id=%s
+        """
+        cur.execute(query, (user_id,))
+        ret = cur.fetchone()
     return ret
 
 
-async def fetch_course(user_id: UserId):
+@non_blocking
+def fetch_course(user_id: UserId):
     """
     Asynchronously fetches the courses associated with a user.
 
@@ -109,40 +112,43 @@ async def fetch_course(user_id: UserId):
             - str: The name of the teacher associated with the course.
             - int: The year of the course.
             - str: The semester of the course.
+            - float | None: The user's average rating in the course.
     """
-    conn = get_connection()
-    cur = get_cursor(conn)
-    ret = []
-
-    cur.execute(
-        """
-        WITH joined_courses AS (
-            SELECT * FROM `course_member` cm
-            WHERE cm.user_id=%s
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        ret = []
+
+        cur.execute(
+            """
+            WITH joined_courses AS (
+                SELECT * FROM `course_member` cm
+                WHERE cm.user_id=%s
+            )
+            SELECT
+                c.id,
+                c.name,
+                c.owner_id,
+                c.year,
+                c.semester,
+                (
+                    SELECT SUM(ugr.rating_sum) / SUM(ugr.rating_count)
+                    FROM user_group_rating ugr
+                    INNER JOIN `group` g ON g.id = ugr.group_id
+                    WHERE ugr.user_id = %s AND g.course_id = c.id
+                ) AS rating
+            FROM `course` c
+            INNER JOIN joined_courses jc ON c.id=jc.course_id
+            """,
+            (user_id, user_id),
         )
-        SELECT
-            c.id,
-            c.name,
-            u.name AS teacher,
-            c.year,
-            c.semester
-        FROM `course` c
-        INNER JOIN
-            `user` u
-        ON
-            c.owner_id = u.id
-        INNER JOIN joined_courses jc ON c.id=jc.course_id
-        """,
-        (user_id,),
-    )
-    ret = cur.fetchall()
-
-    cur.close()
-    conn.close()
+        ret = cur.fetchall()
+        UserLoader(cur).resolve_names(ret, "owner_id", "teacher", keep_id=False)
+
     return ret
 
 
-async def fetch_tasks(user_id: UserId):
+@non_blocking
+def fetch_tasks(user_id: UserId):
     """
     Asynchronously fetches the tasks associated with a user.
 
@@ -156,31 +162,30 @@ async def fetch_tasks(user_id: UserId):
             - str: The description of the task.
             - str: The status of the task.
     """
-    conn = get_connection()
-    cur = get_cursor(conn)
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+
+        cur.execute(
+            """
+            SELECT
+                id,
+                name,
+                description,
+                status
+            FROM
+                `task`
+            WHERE
+                assignee_id = %s
+            """,
+            (user_id,),
+        )
+        ret = cur.fetchall()
 
-    cur.execute(
-        """
-        SELECT
-            id,
-            name,
-            description,
-            status
-        FROM
-            `task`
-        WHERE
-            assignee_id = %s
-        """,
-        (user_id,),
-    )
-    ret = cur.fetchall()
-
-    cur.close()
-    conn.close()
     return ret
 
 
-async def update_info(user_id: UserId, description: str | None):
+@non_blocking
+def update_info(user_id: UserId, description: str | None):
     """
     Update the user information with the given user ID and description.
 
@@ -191,19 +196,19 @@ async def update_info(user_id: UserId, description: str | None):
     Returns:
         bool: True if the user information was successfully updated, False otherwise.
     """
-    conn = get_connection()
-    cur = get_cursor(conn)
-
-    cur.execute(
-        """
-        UPDATE `user` u
-        SET description=%s
-        WHERE u.id=%s
-        """,
-        (description, user_id),
-    )
-    conn.commit()
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+
+        cur.execute(
+            """
+            UPDATE `user` u
+            SET description=%s
+            WHERE u.id=%s
+            """,
+            (description, user_id),
+        )
+        conn.commit()
+    user_profiles.invalidate(user_id)
+    resource_versions.bump("user", user_id)
 
-    cur.close()
-    conn.close()
     return True
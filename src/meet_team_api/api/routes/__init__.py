@@ -2,6 +2,7 @@
 
 from fastapi import APIRouter
 
+from .admin import admin_router
 from .commit import commit_router
 from .course import course_router
 from .group import group_router
@@ -12,6 +13,7 @@ from .routes_message import message_router
 
 router = APIRouter()
 
+router.include_router(admin_router, prefix="/admin", tags=["Admin"])
 router.include_router(user_router, prefix="/user", tags=["User"])
 router.include_router(course_router, prefix="/course", tags=["Course"])
 router.include_router(commit_router, prefix="/commit", tags=["Commit"])
@@ -0,0 +1,34 @@
+"""This is the route for the admin tools"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, status
+
+from ...slow_query import slow_query_log
+from ..utils.auth import require_admin
+from ..utils.json_response import JSONResponse
+
+admin_router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@admin_router.get("/slow-queries")
+async def slow_queries(handler: Optional[str] = None):
+    """
+    The slowest statements of each handler (or of `handler` only), with
+    their EXPLAIN plans once captured
+    """
+    return JSONResponse(
+        {
+            "data": {
+                "threshold_ms": slow_query_log.threshold * 1000,
+                "handlers": slow_query_log.top(handler),
+            }
+        },
+        status_code=status.HTTP_200_OK,
+    )
+
+
+@admin_router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries():
+    """Forget the recorded slow statements, e.g. after adding an index"""
+    slow_query_log.clear()
@@ -1,35 +1,41 @@
 """This is the route for commit"""
 
-import os
-from typing import Annotated
-
-import jwt
-from fastapi import APIRouter, Header, status
+from fastapi import APIRouter, status
 from fastapi.exceptions import HTTPException
-from fastapi.responses import JSONResponse
 
 from ...models.commit import CommitCreateRequest, CommitCreateResponse
+from ...write_behind import write_behind
 from ..handlers import commit
+from ..utils.auth import CurrentUser
+from ..utils.json_response import JSONResponse
 
 commit_router = APIRouter()
 
 
 @commit_router.post("/")
 async def create(
-    req: CommitCreateRequest, authorization: Annotated[str | None, Header()]
+    req: CommitCreateRequest, user_id: CurrentUser
 ) -> CommitCreateResponse:
-    """This route if to find all commits given the group"""
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms=["HS256"]
+    """
+    This route is to create a commit.
+
+    In write-behind mode the commit is only journaled: the answer is a 202
+    with its `ref` and no id yet.
+    """
+    if write_behind.enabled:
+        try:
+            ref = await commit.enqueue(
+                user_id, req.task_id, req.title, req.description, req.reference_link
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e),
+            ) from e
+        return JSONResponse(
+            content={"commit": {"id": None, "ref": ref}},
+            status_code=status.HTTP_202_ACCEPTED,
         )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
 
     try:
         new_commit_id = await commit.create(
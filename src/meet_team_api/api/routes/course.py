@@ -1,38 +1,34 @@
 """This is the router for /course"""
 
-import os
-from typing import Annotated, Optional
+from typing import Optional
 
-import jwt
-from fastapi import APIRouter, Header, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 
 from ...models.course import CourseId, CreateCourseRequest, UpdateCourseRequest
-from ..handlers import course, group
+from ..handlers import course, group, roster
+from ..utils.auth import CurrentUser
+from ..utils.http_cache import ConditionalGet
+from ..utils.json_response import JSONResponse, dumps
 
 course_router = APIRouter()
 
 
 @course_router.get("/{course_id}")
 async def find_one(
-    authorization: Annotated[str | None, Header()],
+    request: Request,
+    user_id: CurrentUser,
     course_id: int = -1,
     groups: bool = False,
 ):
     """This is for finding specific course's information"""
+    cache = ConditionalGet(request, user_id, "private, no-cache")
+    hit = cache.not_modified()
+    if hit is not None:
+        return hit
+
     ret = {"data": None}
-    print(course_id)
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
+    resources = [("course", course_id)]
     try:
         course_info = await course.find_course(course_id, user_id)
         ret["data"] = {"course": course_info}
@@ -51,23 +47,124 @@ async def find_one(
                 detail={"message": "Fetch Groups Failed", "error": str(e)},
                 status_code=status.HTTP_403_FORBIDDEN,
             ) from e
+        resources.append(("course_groups", course_id))
+        resources.extend(("group", g["id"]) for g in groups_info)
+
+    return cache.respond(ret, resources)
+
+
+@course_router.get("/{course_id}/export")
+async def export(
+    course_id: CourseId,
+    user_id: CurrentUser,
+    format: str = "ndjson",  # pylint: disable=redefined-builtin
+    resource: Optional[str] = None,
+):
+    """
+    This route streams a course's tasks, commits and reviews, for its staff.
+
+    `format` is `ndjson` or `csv`; `resource` (`tasks`, `commits` or
+    `reviews`) narrows the export and is required for CSV.
+    """
+    if format not in course.EXPORT_FORMATS:
+        raise HTTPException(
+            detail={"message": f"format must be one of {course.EXPORT_FORMATS}"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    if resource is not None and resource not in course.EXPORT_QUERIES:
+        raise HTTPException(
+            detail={
+                "message": f"resource must be one of {list(course.EXPORT_QUERIES)}"
+            },
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    if format == "csv" and resource is None:
+        raise HTTPException(
+            detail={"message": "CSV exports need a resource"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if not await course.is_staff(course_id, user_id):
+        raise HTTPException(
+            detail={"message": "Only the course staff can export it"},
+            status_code=status.HTTP_403_FORBIDDEN,
+        )
+
+    resources = [resource] if resource is not None else list(course.EXPORT_QUERIES)
+    filename = f"course-{course_id}-{resource or 'all'}.{format}"
+    return StreamingResponse(
+        course.export(course_id, resources, format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@course_router.post("/{course_id}/roster")
+async def import_roster(course_id: CourseId, request: Request, user_id: CurrentUser):
+    """
+    This route enrolls a roster into the course and its groups, for its staff.
+
+    The body is a CSV (`Content-Type: text/csv`, columns `account`, `role`,
+    `group`) or a JSON list of the same objects. One NDJSON result per entry
+    is streamed back, with a `status` of `enrolled`, `grouped`, `unchanged`,
+    `unknown account`, `unknown group` or `invalid role`.
+    """
+    if not await course.is_staff(course_id, user_id):
+        raise HTTPException(
+            detail={"message": "Only the course staff can import a roster"},
+            status_code=status.HTTP_403_FORBIDDEN,
+        )
+    try:
+        entries = roster.parse_roster(
+            await request.body(), request.headers.get("content-type", "")
+        )
+    except ValueError as e:
+        raise HTTPException(
+            detail={"message": str(e)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        ) from e
 
-    return JSONResponse(ret, status_code=status.HTTP_200_OK)
+    return StreamingResponse(
+        (
+            b"".join(dumps(result) + b"\n" for result in results)
+            for results in roster.import_roster(course_id, entries)
+        ),
+        media_type="application/x-ndjson",
+    )
 
 
 @course_router.get("")
 async def find_all(
-    searchTerm: Optional[str] = None, offset: int = 0, limit: int = 10
+    searchTerm: Optional[str] = None,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    year: Optional[int] = None,
+    semester: Optional[int] = None,
 ):
-    """This is the for listing the courses"""
+    """
+    This is the for listing the courses.
+
+    Pass the `next_cursor` of a page as `cursor` to get the following page;
+    `offset` is kept for the legacy clients and ignored when `cursor` is set.
+    `year` and `semester` keep the courses of that term only.
+    """
     courses = []
     meta = {}
     try:
-        courses = await course.find_all(offset, limit, searchTerm)
+        courses, next_cursor = await course.find_all(
+            offset, limit, searchTerm, cursor, year, semester
+        )
         meta = {
             "offset": offset,
             "limit": limit,
+            "next_cursor": next_cursor,
         }
+    except ValueError as e:
+        raise HTTPException(
+            detail={"message": str(e)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        ) from e
     except Exception as e:
         raise HTTPException(
             detail={"message": str(e)},
@@ -83,20 +180,8 @@ async def find_all(
 
 
 @course_router.post("/{course_id}/join")
-async def join(course_id: CourseId, authorization: Annotated[str | None, Header()]):
+async def join(course_id: CourseId, user_id: CurrentUser):
     """This router is for adding a user into a course"""
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
     try:
         new_course_id = await course.join(course_id, user_id)
     except Exception as e:
@@ -111,23 +196,9 @@ async def join(course_id: CourseId, authorization: Annotated[str | None, Header(
 
 
 @course_router.post("/")
-async def create(
-    req: CreateCourseRequest, authorization: Annotated[str | None, Header()]
-):
+async def create(req: CreateCourseRequest, user_id: CurrentUser):
     """This route is to create a course"""
 
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
     try:
         new_course_id = await course.create_course(
             req.name, req.year, req.semester, user_id
@@ -144,22 +215,8 @@ async def create(
 
 
 @course_router.patch("/")
-async def update_info(
-    req: UpdateCourseRequest, authorization: Annotated[str | None, Header()]
-):
+async def update_info(req: UpdateCourseRequest, user_id: CurrentUser):
     """This route provide update function toward course"""
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
     try:
         course_id = await course.update_course(
             user_id, req.id, req.name, req.description
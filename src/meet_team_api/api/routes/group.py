@@ -1,16 +1,16 @@
 """This is the router for /group"""
 
-import os
-from typing import Annotated, Optional
+from typing import Optional
 
-import jwt
-from fastapi import APIRouter, Header, Query, status
+from fastapi import APIRouter, Query, Request, status
 from fastapi.exceptions import HTTPException
-from fastapi.responses import JSONResponse
 
+from ...db import run_blocking
 from ...models.group import GroupCreateRequest, GroupUpdateRequest
 from ..handlers import group as group_handler
-from ..utils.get_userid import get_user_id
+from ..utils.auth import CurrentUser
+from ..utils.http_cache import ConditionalGet
+from ..utils.json_response import JSONResponse
 from ..utils.user_in_group import user_in_group
 from ..handlers import review as review_handler
 
@@ -18,22 +18,8 @@ group_router = APIRouter()
 
 
 @group_router.post("/")
-async def create(
-    req: GroupCreateRequest, authorization: Annotated[str | None, Header()]
-):
+async def create(req: GroupCreateRequest, user_id: CurrentUser):
     """This function is to handle the routing of creating group given information"""
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms=["HS256"]
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
     try:
         new_group_id = await group_handler.create(
             req.course_id, user_id, req.name, req.description
@@ -54,46 +40,29 @@ async def create(
 
 
 @group_router.get("/")
-async def info(group: int, authorization: Annotated[str | None, Header()]):
+async def info(group: int, request: Request, user_id: CurrentUser):
     """This funtion is to get group info"""
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms=["HS256"]
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
+    cache = ConditionalGet(request, user_id, "private, no-cache")
+    hit = cache.not_modified()
+    if hit is not None:
+        return hit
     try:
         data = await group_handler.find_one(group, user_id)
     except Exception as e:
         raise HTTPException(
             detail=str(e), status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         ) from e
-    return JSONResponse(content={"data": data}, status_code=status.HTTP_200_OK)
+
+    resources = [("group", group)]
+    resources.extend(("user", member["id"]) for member in data["members"])
+    if data["group"] is not None:
+        resources.append(("course", data["group"]["courseId"]))
+    return cache.respond({"data": data}, resources)
 
 
 @group_router.patch("/")
-async def update(
-    req: GroupUpdateRequest, authorization: Annotated[str | None, Header()]
-):
+async def update(req: GroupUpdateRequest, user_id: CurrentUser):
     """This route provide update function toward course"""
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
     try:
         group_id = await group_handler.update(
             user_id, req.id, req.name, req.description
@@ -110,19 +79,7 @@ async def update(
 
 
 @group_router.post("/{group_id}/join")
-async def join(group_id: int, authorization: Annotated[str | None, Header()]):
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
+async def join(group_id: int, user_id: CurrentUser):
     try:
         succeed = await group_handler.join(user_id, group_id)
     except Exception as e:
@@ -137,16 +94,34 @@ async def join(group_id: int, authorization: Annotated[str | None, Header()]):
     )
 
 
+@group_router.get("/{group_id}/dashboard")
+async def dashboard(group_id: int, request: Request, user_id: CurrentUser):
+    """
+    The progress of a group in one response: task counts by status, and the
+    commits, messages and last activity of every task and member
+    """
+    cache = ConditionalGet(request, user_id, "private, no-cache")
+    hit = cache.not_modified()
+    if hit is not None:
+        return hit
+    try:
+        data = await group_handler.dashboard(group_id, user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=str(e),
+        ) from e
+    return cache.respond({"data": data}, group_handler.dashboard_resources(group_id))
+
+
 @group_router.get("/{group_id}/review")
-async def get_group_members_and_reviews(
-    group_id: int, authorization: Annotated[str, Header(name="Authorization")]
-):
+async def get_group_members_and_reviews(group_id: int, user_id: CurrentUser):
     """
     Get the group members and their reviews.
 
     Parameters:
         - group_id (int): The ID of the group.
-        - token (str): The JWT token for authentication.
+        - user_id (int): The ID of the authenticated user.
 
     Returns:
         - dict: The response containing the group members and their reviews.
@@ -154,9 +129,8 @@ async def get_group_members_and_reviews(
     Raises:
         - HTTPException: If the group does not exist or the token is invalid or cannot be decoded.
     """
-    user_id = get_user_id(authorization)
     try:
-        return review_handler.get_group_members_and_reviews(group_id, user_id)
+        return await review_handler.get_group_members_and_reviews(group_id, user_id)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -167,8 +141,8 @@ async def get_group_members_and_reviews(
 @group_router.get("/{group_id}/members")
 async def find_members_by_name_pattern(
     group_id: int,
+    user_id: CurrentUser,
     name: Optional[str] = Query(default=None),
-    authorization: Annotated[str, Header(name="authorization")] = None
 ):
     """
     Find the members whose name match the given pattern.
@@ -176,7 +150,7 @@ async def find_members_by_name_pattern(
     Parameters:
         - group_id (int): The ID of the group.
         - name_pattern (str): The pattern to match the name.
-        - token (str): The JWT token for authentication.
+        - user_id (int): The ID of the authenticated user.
 
     Returns:
         - dict: The response containing the members' information.
@@ -185,16 +159,14 @@ async def find_members_by_name_pattern(
         - HTTPException: If the group does not exist or the token is invalid or cannot be decoded.
     """
     try:
-        user_in_group(user_id=get_user_id(authorization), group_id=group_id)
+        await run_blocking(user_in_group, user_id=user_id, group_id=group_id)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=str(e),
         ) from e
     try:
-        members = await group_handler.find_members_by_name_pattern(
-            group_id, name
-        )
+        members = await group_handler.find_members_by_name_pattern(group_id, name)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
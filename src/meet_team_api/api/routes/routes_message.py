@@ -1,33 +1,191 @@
 """This is the route for message"""
 
+import asyncio
 import os
-from typing import Annotated 
-
-import jwt
-from fastapi import APIRouter, Header, status
-from fastapi.exceptions import HTTPException
-from fastapi.responses import JSONResponse
+from contextlib import aclosing
+from typing import Annotated, Optional
 
+from fastapi import (
+    APIRouter,
+    Header,
+    HTTPException,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
 
+from ...db import run_blocking
 from ...models.models_message import MessageCreateRequest
+from ...write_behind import write_behind
 from ..handlers import handler_message
+from ..utils.auth import CurrentUser, StreamUser, decode_token
+from ..utils.json_response import JSONResponse, dumps
+from ..utils.pubsub import broker
+from ..utils.user_in_group import user_in_task_group
 
-message_router = APIRouter() # 建FastAPI router
+# Seconds between the keep-alives of an idle stream, so proxies keep it open
+STREAM_KEEPALIVE = float(os.getenv("MEET_TEAM_STREAM_KEEPALIVE", "15"))
 
-@message_router.post("/") # 設POST router,當訪問此router時會調用create()
-async def create(
+message_router = APIRouter()  # 建FastAPI router
 
-    
-      req: MessageCreateRequest, authorization: Annotated[str | None, Header()]= None
-):
-    try: # 創建新的message
-        new_message_id = await handler_message.create( # 調用 message.create
-            req.task_id, req.creator_id, req.description,
+
+@message_router.post("/")  # 設POST router,當訪問此router時會調用create()
+async def create(req: MessageCreateRequest, user_id: CurrentUser):
+    """
+    The message is posted by the authenticated user.
+
+    In write-behind mode the message is only journaled: the answer is a 202
+    with its `ref`, and the streams get it with its id once flushed.
+    """
+    if write_behind.enabled:
+        try:
+            message = await handler_message.enqueue(
+                req.task_id, user_id, req.description
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e),
+            ) from e
+        return JSONResponse(
+            {"message": "Message accepted", "data": {"message": message}},
+            status_code=status.HTTP_202_ACCEPTED,
         )
-        return {"message": "Message created successfully"}
+
+    try:  # 創建新的message
+        message = await handler_message.create(  # 調用 message.create
+            req.task_id,
+            user_id,
+            req.description,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=str(e),
+        ) from e
+    return JSONResponse(
+        {"message": "Message created successfully", "data": {"message": message}},
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+@message_router.get("/{task_id}")
+async def find_all(task_id: int, user_id: CurrentUser, after: int = 0):
+    """The messages of a task posted after the message `after`, oldest first"""
+    try:
+        messages = await handler_message.find_all(user_id, task_id, after)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=str(e),
+        ) from e
+    return JSONResponse(
+        {"data": {"messages": messages}}, status_code=status.HTTP_200_OK
+    )
+
+
+async def _stream(user_id: int, task_id: int, after: int):
+    """
+    Yield a task's messages after `after`, then the new ones as they come, and
+    None when idle for `STREAM_KEEPALIVE` seconds.
+
+    The subscription is taken before the backlog is read, so a message posted
+    in between is delivered once, not lost.
+    """
+    with broker.subscribe(handler_message.task_channel(task_id), after) as sub:
+        while True:
+            backlog = await handler_message.find_all(user_id, task_id, sub.last_id)
+            for message in backlog:
+                if not sub.seen(message):
+                    yield message
+            if len(backlog) < handler_message.MESSAGE_PAGE_SIZE:
+                break
+        while not sub.overflowed:
+            yield await sub.get(STREAM_KEEPALIVE)
+        # a cut-off slow client reconnects and resumes from its last id
+
+
+@message_router.get("/{task_id}/stream")
+async def stream(
+    task_id: int,
+    user_id: StreamUser,
+    after: int = 0,
+    last_event_id: Annotated[Optional[int], Header()] = None,
+):
+    """
+    The Server-Sent Events stream of a task's messages.
+
+    Resumes after `Last-Event-ID` (sent by reconnecting browsers) or `after`;
+    authenticates with the `Authorization` header or a `token` query
+    parameter.
+    """
+    try:
+        await run_blocking(user_in_task_group, user_id, task_id)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=str(e),
         ) from e
-    
\ No newline at end of file
+
+    async def events():
+        messages = _stream(user_id, task_id, last_event_id or after)
+        async with aclosing(messages):
+            async for message in messages:
+                if message is None:
+                    yield b": keep-alive\n\n"
+                else:
+                    yield b"id: %d\nevent: message\ndata: %s\n\n" % (
+                        message["id"],
+                        dumps(message),
+                    )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _wait_disconnect(websocket: WebSocket):
+    """Read and ignore the client frames until it disconnects"""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@message_router.websocket("/{task_id}/ws")
+async def stream_ws(
+    websocket: WebSocket,
+    task_id: int,
+    token: Optional[str] = None,
+    after: int = 0,
+):
+    """
+    The WebSocket stream of a task's messages, resuming after `after`.
+
+    The token comes in the `token` query parameter or the `Authorization`
+    header; idle connections get a `{"type": "ping"}` frame.
+    """
+    authorization = websocket.headers.get("authorization")
+    try:
+        user_id = decode_token(token if token is not None else authorization[7:])
+        await run_blocking(user_in_task_group, user_id, task_id)
+    except Exception:  # pylint: disable=broad-except
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    # reading is what notices a client leaving, so it runs alongside the sends
+    closed = asyncio.create_task(_wait_disconnect(websocket))
+    messages = _stream(user_id, task_id, after)
+    try:
+        async with aclosing(messages):
+            async for message in messages:
+                if closed.done():
+                    break
+                payload = {"type": "ping"} if message is None else message
+                await websocket.send_text(dumps(payload).decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closed.cancel()
@@ -1,17 +1,14 @@
 """This is the route for task"""
 
-import os
+from fastapi import APIRouter, HTTPException, Request, status
 
-import jwt
-from fastapi import APIRouter, HTTPException, status
-from fastapi.params import Header
-from fastapi.responses import JSONResponse
-from typing_extensions import Annotated
-
-from ...api.handlers import task
-from ...models.task import TaskCreateModel
+from ...api.handlers import course, task
+from ...db import run_blocking
+from ...models.task import TaskBulkCreateModel, TaskCreateModel
+from ..utils.auth import CurrentUser
+from ..utils.http_cache import ConditionalGet
+from ..utils.json_response import JSONResponse
 from ..utils.user_in_group import user_in_group
-from ..utils.get_userid import get_user_id
 
 task_router = APIRouter()
 
@@ -19,12 +16,11 @@ task_router = APIRouter()
 @task_router.get("/all")
 async def find_all(
     group: int,
+    user_id: CurrentUser,
     me: bool = False,
-    authorization: Annotated[None | str, Header()] = None,
 ):
     """This function find all tasks given group_id and the if `self` or not"""
-    user_id = get_user_id(authorization)
-    user_in_group(user_id, group)
+    await run_blocking(user_in_group, user_id, group)
     try:
         tasks = await task.find_all(group, user_id, me)
     except Exception as e:
@@ -38,20 +34,14 @@ async def find_all(
 @task_router.get("/")
 async def find_one(
     taskId: int,
-    authorization: Annotated[None | str, Header()] = None,
+    request: Request,
+    user_id: CurrentUser,
 ):
     """This function find one task given task id"""
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
+    cache = ConditionalGet(request, user_id, "private, no-cache")
+    hit = cache.not_modified()
+    if hit is not None:
+        return hit
     try:
         data = await task.find_one(taskId, user_id)
     except Exception as e:
@@ -59,27 +49,15 @@ async def find_one(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=str(e),
         ) from e
-    return JSONResponse(content=data, status_code=200)
+    return cache.respond(data, [("task", taskId)])
 
 
 @task_router.post("/{group_id}")
 async def create(
     req: TaskCreateModel,
     group_id: int,
-    authorization: Annotated[None | str, Header()] = None,
+    user_id: CurrentUser,
 ):
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
     try:
         new_id = await task.create(
             user_id, group_id, req.name, req.description, req.assignee, req.reviewer
@@ -92,20 +70,61 @@ async def create(
     return JSONResponse(content={"task": {"id": new_id}})
 
 
-@task_router.patch("/{task_id}")
-async def update(task_id: int, authorization: Annotated[None | str, Header()] = None):
+@task_router.post("/{group_id}/bulk")
+async def bulk_create(
+    req: TaskBulkCreateModel,
+    group_id: int,
+    user_id: CurrentUser,
+):
+    """This function creates many tasks at once, e.g. a sprint plan"""
     try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
+        new_ids = await task.bulk_create(
+            user_id, group_id, [t.model_dump() for t in req.tasks]
         )
-        user_id = payload["id"]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
+            detail=str(e),
         ) from e
+    return JSONResponse(
+        content={"tasks": [{"id": new_id} for new_id in new_ids]},
+        status_code=status.HTTP_201_CREATED,
+    )
 
+
+@task_router.post("/course/{course_id}/bulk")
+async def create_from_template(
+    req: TaskBulkCreateModel,
+    course_id: int,
+    user_id: CurrentUser,
+):
+    """This function lets the course staff seed template tasks into every group"""
+    if not await course.is_staff(course_id, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the course staff can seed tasks",
+        )
+    created = await task.create_from_template(
+        user_id, course_id, [t.model_dump() for t in req.tasks]
+    )
+    return JSONResponse(
+        content={
+            "groups": [
+                {"id": group_id, "tasks": [{"id": new_id} for new_id in new_ids]}
+                for group_id, new_ids in created.items()
+            ]
+        },
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+@task_router.patch("/{task_id}")
+async def update(task_id: int, user_id: CurrentUser):
     try:
         await task.patch(user_id, task_id)
     except Exception as e:
@@ -1,27 +1,28 @@
 """This is the router for /user"""
 
-import os
-from typing import Annotated, Optional
+from typing import Optional
 
-import jwt
-from fastapi import APIRouter, Header, HTTPException, status, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Request, status, Query
 
 from ...models.user import LoginRequest, RegisterRequest, UserInfoUpdate
 from ..handlers import user as user_handler
+from ..utils.auth import CurrentUser, issue_token
+from ..utils.http_cache import ConditionalGet
+from ..utils.json_response import JSONResponse
 
 user_router = APIRouter()
 
 
 @user_router.get("/courses")
 async def fetch_course(
-    user_id: Optional[int] = Query(default=None),
-    authorization: Annotated[str | None, Header()] = None):
+    current_user: CurrentUser, user_id: Optional[int] = Query(default=None)
+):
     """
     Fetches the courses associated with a user.
 
     Parameters:
-        authorization (str | None, Header()): The authorization header containing the bearer token.
+        current_user (UserId): The authenticated user, resolved from the bearer token.
+        user_id (int | None): The user whose courses are fetched. Defaults to the current user.
 
     Returns:
         JSONResponse: A JSON response containing the fetched courses.
@@ -30,19 +31,8 @@ async def fetch_course(
         HTTPException: If the bearer token is invalid or not provided.
         HTTPException: If there is an internal server error while fetching the courses.
     """
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        if user_id is None:
-            user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
+    if user_id is None:
+        user_id = current_user
 
     try:
         courses = await user_handler.fetch_course(user_id)
@@ -57,12 +47,12 @@ async def fetch_course(
 
 
 @user_router.get("/tasks")
-async def fetch_tasks(authorization: Annotated[str | None, Header()] = None):
+async def fetch_tasks(user_id: CurrentUser):
     """
     Fetches tasks for a user.
 
     Args:
-        authorization (str | None, optional): The bearer token for authentication. Defaults to None.
+        user_id (UserId): The authenticated user, resolved from the bearer token.
 
     Raises:
         HTTPException: If the bearer token is invalid or not provided.
@@ -76,17 +66,6 @@ async def fetch_tasks(authorization: Annotated[str | None, Header()] = None):
         - 403 Forbidden: If the bearer token is invalid.
         - 500 Internal Server Error: If there is an internal server error.
     """
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
     try:
         tasks = await user_handler.fetch_tasks(user_id)
         return JSONResponse(
@@ -100,47 +79,44 @@ async def fetch_tasks(authorization: Annotated[str | None, Header()] = None):
 
 
 @user_router.get("/{user_id}")
-async def find_one(user_id: int, authorization: Annotated[str | None, Header()] = None):
+async def find_one(user_id: int, request: Request, current_user: CurrentUser):
     """
     Retrieves information about a user with the given user ID.
 
     Parameters:
         user_id (int): The ID of the user to retrieve information for.
-        authorization (Annotated[str | None, Header()], optional): The authorization token for the request. Defaults to None.
+        request (Request): The request, read for its `If-None-Match` header.
+        current_user (UserId): The authenticated user, resolved from the bearer token.
 
     Returns:
-        JSONResponse: A JSON response containing the user information. The response has a status code of 200 if the request is successful.
+        Response: A JSON response containing the user information, with an ETag. The response has a status code of 200 if the request is successful, 304 if the client's copy is still current.
 
     Raises:
         HTTPException: If the authorization token is invalid or missing. The exception has a status code of 403.
 
     """
 
-    is_self = False
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        is_self = payload["id"] == user_id
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
+    is_self = current_user == user_id
+    # someone else's profile may be a little stale, one's own never
+    cache = ConditionalGet(
+        request, current_user, "private, no-cache" if is_self else "private, max-age=30"
+    )
+    hit = cache.not_modified()
+    if hit is not None:
+        return hit
 
     data = await user_handler.find_info(user_id, is_self)
 
-    return JSONResponse({"data": data}, status_code=status.HTTP_200_OK)
+    return cache.respond({"data": data}, [("user", user_id)])
 
 
 @user_router.get("/")
-async def find_self(authorization: Annotated[str | None, Header()] = None):
+async def find_self(user_id: CurrentUser):
     """
     Retrieves information about the authenticated user.
 
     Parameters:
-        authorization (Annotated[str | None, Header()], optional): The authorization token for the request. Defaults to None.
+        user_id (UserId): The authenticated user, resolved from the bearer token.
 
     Returns:
         JSONResponse: A JSON response containing the user information. The response has a status code of 200 if the request is successful.
@@ -150,18 +126,6 @@ async def find_self(authorization: Annotated[str | None, Header()] = None):
 
     """
 
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
     data = await user_handler.find_info(user_id, True)
 
     return JSONResponse({"data": data}, status_code=status.HTTP_200_OK)
@@ -199,9 +163,7 @@ async def login(login_info: LoginRequest):
         )
 
     # If there's any authorization part, can be implemented here
-    encoded_jwt = jwt.encode(
-        {"id": user_id}, os.getenv("MEET_TEAM_JWT"), algorithm="HS256"
-    )
+    encoded_jwt = issue_token(user_id)
 
     return JSONResponse(
         {"data": {"token": encoded_jwt, "user": {"id": user_id}}},
@@ -242,15 +204,13 @@ async def register(user: RegisterRequest):
 
 
 @user_router.patch("/")
-async def update_info(
-    req: UserInfoUpdate, authorization: Annotated[str | None, Header()] = None
-):
+async def update_info(req: UserInfoUpdate, user_id: CurrentUser):
     """
     Updates the information of a user.
 
     Parameters:
         - req (UserInfoUpdate): The request object containing the updated user information.
-        - authorization (Annotated[str | None, Header()], optional): The authorization header. Defaults to None.
+        - user_id (UserId): The authenticated user, resolved from the bearer token.
 
     Returns:
         JSONResponse: A JSON response indicating the success or failure of the update.
@@ -260,19 +220,6 @@ async def update_info(
         HTTPException: If the authorization header is invalid or missing.
             The status code of the exception is 403 (HTTP_403_FORBIDDEN) and the detail of the exception is "Invalid Bearer Token".
     """
-    print(authorization)
-    try:
-        assert isinstance(authorization, str)
-        payload = jwt.decode(
-            authorization[7:], os.getenv("MEET_TEAM_JWT"), algorithms="HS256"
-        )
-        user_id = payload["id"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid Bearer Token",
-        ) from e
-
     succeed = await user_handler.update_info(user_id, req.description)
 
     return JSONResponse(
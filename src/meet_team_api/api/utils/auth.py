@@ -0,0 +1,149 @@
+"""
+This module contains the bearer-token authentication shared by the routes.
+
+Tokens are verified once and the resulting user ID is kept in a bounded
+LRU cache, so clients polling the API don't pay the HMAC check on every call.
+"""
+
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Annotated
+
+import jwt
+from fastapi import Depends, Header, HTTPException, Query, status
+
+from ...db import current_user
+from ...models.user import UserId
+
+JWT_SECRET = os.getenv("MEET_TEAM_JWT")
+JWT_ALGORITHM = "HS256"
+TOKEN_CACHE_SIZE = int(os.getenv("MEET_TEAM_TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL = float(os.getenv("MEET_TEAM_TOKEN_CACHE_TTL", "300"))
+ADMIN_TOKEN = os.getenv("MEET_TEAM_ADMIN_TOKEN")
+
+
+class TokenCache:
+    """A thread-safe LRU of verified token -> (user ID, expiry)"""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[UserId, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> UserId | None:
+        """Return the cached user ID, or None if unknown or expired"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user_id
+
+    def put(self, token: str, user_id: UserId, exp: float | None = None):
+        """Remember a verified token until its `exp` or the cache TTL"""
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        with self._lock:
+            self._entries[token] = (user_id, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every cached token"""
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def decode_token(token: str) -> UserId:
+    """
+    Verify a JWT and return the user ID it carries.
+
+    Raises:
+        jwt.InvalidTokenError: If the token is invalid or expired.
+    """
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
+    payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    try:
+        user_id = int(payload["id"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise jwt.InvalidTokenError("Token carries no user id") from e
+    token_cache.put(token, user_id, payload.get("exp"))
+    return user_id
+
+
+def issue_token(user_id: UserId) -> str:
+    """Sign a token for the given user"""
+    return jwt.encode({"id": user_id}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+async def current_user_id(
+    authorization: Annotated[str | None, Header()] = None,
+) -> UserId:
+    """
+    The FastAPI dependency resolving the `Authorization` header to a user ID,
+    also recorded as the request's `db.current_user` for read-your-writes
+    """
+    try:
+        assert isinstance(authorization, str)
+        user_id = decode_token(authorization[7:])
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid Bearer Token",
+        ) from e
+    current_user.set(user_id)
+    return user_id
+
+
+CurrentUser = Annotated[UserId, Depends(current_user_id)]
+
+
+async def stream_user_id(
+    authorization: Annotated[str | None, Header()] = None,
+    token: Annotated[str | None, Query()] = None,
+) -> UserId:
+    """
+    Like `current_user_id`, but also accepts the bare token as a `token` query
+    parameter: browsers can't set headers on EventSource and WebSocket.
+    """
+    if authorization is None and token is not None:
+        authorization = f"Bearer {token}"
+    return await current_user_id(authorization)
+
+
+StreamUser = Annotated[UserId, Depends(stream_user_id)]
+
+
+async def require_admin(
+    x_admin_token: Annotated[str | None, Header()] = None,
+):
+    """
+    The FastAPI dependency guarding the admin routes with the
+    `MEET_TEAM_ADMIN_TOKEN` shared secret, sent as `X-Admin-Token`; without
+    it set, the admin routes don't exist.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if x_admin_token is None or not hmac.compare_digest(
+        x_admin_token.encode(), ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin token",
+        )
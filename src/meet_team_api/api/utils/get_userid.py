@@ -2,11 +2,13 @@
 This module contains the function `get_user_id` that extracts the user ID from a JWT token.
 """
 
-import os
 import jwt
 
 from fastapi import status, HTTPException
 
+from ...db import current_user
+from .auth import decode_token
+
 
 def get_user_id(token: str) -> int:
     """
@@ -22,10 +24,10 @@ def get_user_id(token: str) -> int:
         HTTPException: If the token is invalid or cannot be decoded.
     """
     try:
-        secret_key = os.getenv("MEET_TEAM_JWT")
-        payload = jwt.decode(token[7:], secret_key, algorithms=["HS256"])
-        return int(payload["id"])
-    except jwt.DecodeError as e:
+        user_id = decode_token(token[7:])
+    except jwt.InvalidTokenError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
         ) from e
+    current_user.set(user_id)
+    return user_id
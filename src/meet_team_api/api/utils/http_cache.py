@@ -0,0 +1,217 @@
+"""
+This module adds ETags and conditional GETs to the read routes.
+
+An ETag is the hash of the response body, so it is valid across restarts
+and workers. On top of that, each write handler bumps the version of the
+resources it changed (`resource_versions.bump("task", task_id)`), and every
+ETag handed out is remembered with the resources its response was built
+from: an `If-None-Match` whose resources haven't been written since gets its
+304 without touching MySQL.
+
+The versions live in the process. With several workers, a write served by
+one worker doesn't bump the others: set `MEET_TEAM_ETAG_VALIDATORS=0` to
+always rebuild the response and compare the hashes instead.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable
+
+from fastapi import Request, Response, status
+
+from .json_response import JSONResponse, dumps
+
+ETAG_VALIDATORS = int(os.getenv("MEET_TEAM_ETAG_VALIDATORS", "16384"))
+RESOURCE_VERSIONS_SIZE = int(os.getenv("MEET_TEAM_RESOURCE_VERSIONS_SIZE", "100000"))
+
+# A resource, e.g. ("task", 42)
+Resource = tuple[str, Hashable]
+
+
+class ResourceVersions:
+    """
+    The write clock of every resource, as of its last bump.
+
+    Versions are ticks of one process-wide clock, so "written since" is a
+    single comparison. Only the `maxsize` last-bumped resources are kept; the
+    others answer with the newest version forgotten, which can only make a
+    validator look stale, never fresh.
+    """
+
+    def __init__(self, maxsize: int = RESOURCE_VERSIONS_SIZE):
+        self.maxsize = maxsize
+        self._clock = 0
+        self._floor = 0
+        self._versions: OrderedDict[Resource, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clock(self) -> int:
+        """The current tick, taken before reading what a response shows"""
+        return self._clock
+
+    def bump(self, kind: str, *ids: Hashable):
+        """Mark resources as written, called by the write handlers"""
+        with self._lock:
+            self._clock += 1
+            for resource_id in ids:
+                self._versions[(kind, resource_id)] = self._clock
+                self._versions.move_to_end((kind, resource_id))
+            while len(self._versions) > self.maxsize:
+                _, version = self._versions.popitem(last=False)
+                self._floor = max(self._floor, version)
+
+    def unchanged_since(self, resources: Iterable[Resource], clock: int) -> bool:
+        """Whether none of the resources was written after `clock`"""
+        with self._lock:
+            return all(
+                self._versions.get(resource, self._floor) <= clock
+                for resource in resources
+            )
+
+
+resource_versions = ResourceVersions()
+
+
+class ValidatorCache:
+    """A thread-safe LRU of (user, URL, ETag) -> (resources, clock)"""
+
+    def __init__(self, maxsize: int = ETAG_VALIDATORS):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple, tuple[tuple[Resource, ...], int]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> tuple[tuple[Resource, ...], int] | None:
+        """The resources and clock an ETag was issued with, if remembered"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, resources: tuple[Resource, ...], clock: int):
+        """Remember an ETag issued for a response"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (resources, clock)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every ETag"""
+        with self._lock:
+            self._entries.clear()
+
+
+validators = ValidatorCache()
+
+
+class VersionedCache:
+    """
+    A thread-safe LRU of computed values, each dropped once a resource it was
+    computed from is written; for responses shared by every user.
+
+    The writes served by other workers don't bump the versions here, so the
+    values are also dropped after `max_age` seconds.
+    """
+
+    def __init__(self, maxsize: int, max_age: float):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self._entries: OrderedDict[
+            Hashable, tuple[tuple[Resource, ...], int, float, Any]
+        ] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        The value, or None if unknown, older than `max_age` or one of its
+        resources was written
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            return None
+        resources, clock, expires_at, value = entry
+        if expires_at <= time.monotonic():
+            return None
+        if not resource_versions.unchanged_since(resources, clock):
+            return None
+        return value
+
+    def put(self, key: Hashable, resources: Iterable[Resource], clock: int, value: Any):
+        """Cache a value computed from `resources`, read after `clock`"""
+        if self.maxsize <= 0 or self.max_age <= 0:
+            return
+        expires_at = time.monotonic() + self.max_age
+        with self._lock:
+            self._entries[key] = (tuple(resources), clock, expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+def _if_none_match(request: Request) -> list[str]:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return []
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+class ConditionalGet:
+    """
+    The conditional handling of one GET.
+
+    The responses are per user, whose access the route checked when it
+    first built them, and are sent as `private`.
+
+        cache = ConditionalGet(request, user_id, "private, no-cache")
+        hit = cache.not_modified()
+        if hit is not None:
+            return hit
+        ...
+        return cache.respond({"data": data}, [("task", task_id)])
+    """
+
+    def __init__(self, request: Request, user_id, cache_control: str):
+        self.cache_control = cache_control
+        self.tags = _if_none_match(request)
+        self._key = (user_id, request.url.path, request.url.query)
+        # taken before the handler reads, so a write racing it stales the ETag
+        self._clock = resource_versions.clock()
+
+    def _not_modified(self, etag: str) -> Response:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": self.cache_control},
+        )
+
+    def not_modified(self) -> Response | None:
+        """A 304 if a sent ETag is known and its resources unchanged since"""
+        for etag in self.tags:
+            entry = validators.get((*self._key, etag))
+            if entry is not None and resource_versions.unchanged_since(*entry):
+                return self._not_modified(etag)
+        return None
+
+    def respond(self, content: Any, resources: Iterable[Resource]) -> Response:
+        """The 200 with its ETag, or a 304 if the client has this very body"""
+        body = dumps(content)
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        validators.put((*self._key, etag), tuple(resources), self._clock)
+        if etag in self.tags or "*" in self.tags:
+            return self._not_modified(etag)
+        return Response(
+            body,
+            status_code=status.HTTP_200_OK,
+            media_type=JSONResponse.media_type,
+            headers={"ETag": etag, "Cache-Control": self.cache_control},
+        )
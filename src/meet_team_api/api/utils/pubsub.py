@@ -0,0 +1,193 @@
+"""
+This module contains the publish/subscribe broker behind the push endpoints.
+
+Subscribers are asyncio queues living on the event loop; publishers may be
+anywhere, including the DB executor threads, so every hand-off goes through
+`call_soon_threadsafe`. Fan-out across processes is the backend's job: the
+default `LocalBackend` only reaches the subscribers of this process, a
+multi-worker deployment installs another one with `broker.use_backend`.
+"""
+
+import asyncio
+import os
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable
+
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("MEET_TEAM_SUBSCRIBER_QUEUE_SIZE", "256"))
+
+Deliver = Callable[[str, dict], None]
+
+
+class PubSubBackend:
+    """
+    The transport between publishers and the local subscribers.
+
+    `start` receives the callback handing a message to the subscribers of
+    this process; `publish` must eventually call it in every process
+    serving the channel, this one included.
+    """
+
+    def start(self, deliver: Deliver):
+        """Start delivering messages through `deliver`"""
+        raise NotImplementedError
+
+    def publish(self, channel: str, message: dict):
+        """Send a message to every subscriber of `channel`"""
+        raise NotImplementedError
+
+    def close(self):
+        """Stop delivering"""
+
+
+class LocalBackend(PubSubBackend):
+    """Deliver within this process only, enough for a single worker"""
+
+    def __init__(self):
+        self._deliver: Deliver | None = None
+
+    def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    def publish(self, channel: str, message: dict):
+        if self._deliver is not None:
+            self._deliver(channel, message)
+
+    def close(self):
+        self._deliver = None
+
+
+class Subscription:
+    """
+    The messages of one channel for one client.
+
+    Messages already seen are dropped, so a client resuming from a backlog,
+    or a backend delivering twice, never gets a duplicate.
+    When the client falls `SUBSCRIBER_QUEUE_SIZE` messages behind it is
+    cut off (`overflowed`) and is expected to resume from its last id.
+    """
+
+    def __init__(self, broker: "Broker", channel: str, last_id: int = 0):
+        self.channel = channel
+        self.last_id = last_id
+        self.overflowed = False
+        # concurrent writers may publish slightly out of order, so duplicates
+        # are told apart by the recent ids rather than by `last_id` alone
+        self._floor = last_id
+        self._recent: deque[int] = deque(maxlen=SUBSCRIBER_QUEUE_SIZE)
+        self._broker = broker
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, message: dict):
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # the client can't keep up: cut it off, it resumes from `last_id`
+            self.overflowed = True
+            self.close()
+
+    def feed(self, message: dict):
+        """Hand a message over from any thread"""
+        self._loop.call_soon_threadsafe(self._put, message)
+
+    def seen(self, message: dict) -> bool:
+        """Whether `message` was already sent, records it otherwise"""
+        message_id = message.get("id")
+        if message_id is None:
+            return False
+        if message_id <= self._floor or message_id in self._recent:
+            return True
+        if len(self._recent) == self._recent.maxlen:
+            self._floor = max(self._floor, self._recent[0])
+        self._recent.append(message_id)
+        self.last_id = max(self.last_id, message_id)
+        return False
+
+    async def get(self, timeout: float | None = None) -> dict | None:
+        """
+        The next unseen message, or None after `timeout` seconds or once the
+        subscription was cut off.
+        """
+        while True:
+            if self.overflowed and self._queue.empty():
+                return None
+            try:
+                message = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            if not self.seen(message):
+                return message
+
+    def close(self):
+        """Stop receiving messages"""
+        self._broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Broker:
+    """Channel name -> local subscriptions, over a pluggable backend"""
+
+    def __init__(self, backend: PubSubBackend | None = None):
+        self._subscriptions: dict[str, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._backend = backend or LocalBackend()
+        self._backend.start(self._deliver)
+
+    def use_backend(self, backend: PubSubBackend):
+        """Swap the transport, e.g. at startup of a multi-worker deployment"""
+        old, self._backend = self._backend, backend
+        old.close()
+        backend.start(self._deliver)
+
+    def close(self):
+        """Stop the backend, falling back to in-process delivery"""
+        self.use_backend(LocalBackend())
+
+    def subscribe(self, channel: str, last_id: int = 0) -> Subscription:
+        """Subscribe from the event loop; use the result as a context manager"""
+        subscription = Subscription(self, channel, last_id)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Drop a subscription, safe to call twice"""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel: str, message: dict):
+        """Publish from any thread"""
+        self._backend.publish(channel, message)
+
+    def channels(self) -> list[str]:
+        """The channels with at least one local subscriber"""
+        with self._lock:
+            return list(self._subscriptions)
+
+    def stats(self) -> dict[str, Any]:
+        """Subscriber counts, for the stats endpoint"""
+        with self._lock:
+            return {
+                "channels": len(self._subscriptions),
+                "subscribers": sum(len(s) for s in self._subscriptions.values()),
+                "backend": type(self._backend).__name__,
+            }
+
+    def _deliver(self, channel: str, message: dict):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.feed(message)
+
+
+broker = Broker()
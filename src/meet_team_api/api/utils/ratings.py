@@ -0,0 +1,110 @@
+"""
+This module maintains the rating aggregates.
+
+`user_group_rating` and `user_rating` hold the running sum and count of the
+ratings a user received, per group and overall, so reading an average never
+scans `review`. Both are updated in the transaction that writes the reviews.
+"""
+
+from mysql.connector.abstracts import MySQLCursorAbstract
+
+from ...models.group import GroupId
+from ...models.user import UserId
+
+
+def previous_ratings(
+    cur: MySQLCursorAbstract, group_id: GroupId, reviewer_id: UserId, user_ids
+) -> dict[UserId, float]:
+    """
+    The ratings a reviewer already gave in a group, locked for the update.
+
+    Call it in the writing transaction, before the upsert: the rows (and the
+    gaps of the missing ones) stay locked until the commit, so two concurrent
+    upserts of the same review can't both count it as new.
+    """
+    user_ids = sorted(user_ids)
+    if not user_ids:
+        return {}
+    cur.execute(
+        f"""
+        SELECT user_id, rating
+        FROM review
+        WHERE group_id = %s AND reviewer_id = %s
+            AND user_id IN ({", ".join(["%s"] * len(user_ids))})
+        FOR UPDATE
+        """,
+        (group_id, reviewer_id, *user_ids),
+    )
+    return {row["user_id"]: row["rating"] for row in cur.fetchall()}
+
+
+def apply_ratings(
+    cur: MySQLCursorAbstract,
+    group_id: GroupId,
+    old: dict[UserId, float],
+    new: dict[UserId, float],
+):
+    """
+    Fold upserted ratings into the aggregates.
+
+    `old` are the ratings the upsert replaced (see `previous_ratings`) and
+    `new` the ratings written: a replaced rating only moves the sum, a new
+    one also bumps the count.
+    """
+    deltas = [
+        (user_id, group_id, rating - old.get(user_id, 0), 0 if user_id in old else 1)
+        for user_id, rating in sorted(new.items())
+    ]
+    if not deltas:
+        return
+    cur.executemany(
+        """
+        INSERT INTO user_group_rating (user_id, group_id, rating_sum, rating_count)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            rating_sum = rating_sum + VALUES(rating_sum),
+            rating_count = rating_count + VALUES(rating_count)
+        """,
+        deltas,
+    )
+    cur.executemany(
+        """
+        INSERT INTO user_rating (user_id, rating_sum, rating_count)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            rating_sum = rating_sum + VALUES(rating_sum),
+            rating_count = rating_count + VALUES(rating_count)
+        """,
+        [
+            (user_id, sum_delta, count_delta)
+            for user_id, _, sum_delta, count_delta in deltas
+        ],
+    )
+
+
+def rebuild(cur: MySQLCursorAbstract):
+    """
+    Recompute both aggregates from `review`, in the caller's transaction.
+
+    INSERT ... SELECT takes shared locks on the reviews it reads, so review
+    writes wait for the rebuild to commit instead of being lost.
+    """
+    cur.execute("DELETE FROM user_rating")
+    cur.execute("DELETE FROM user_group_rating")
+    cur.execute(
+        """
+        INSERT INTO user_group_rating (user_id, group_id, rating_sum, rating_count)
+        SELECT user_id, group_id, SUM(rating), COUNT(*)
+        FROM review
+        WHERE user_id IS NOT NULL AND group_id IS NOT NULL
+        GROUP BY user_id, group_id
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO user_rating (user_id, rating_sum, rating_count)
+        SELECT user_id, SUM(rating_sum), SUM(rating_count)
+        FROM user_group_rating
+        GROUP BY user_id
+        """
+    )
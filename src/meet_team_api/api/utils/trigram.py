@@ -0,0 +1,81 @@
+"""
+This module contains an in-process trigram index.
+
+It backs the course search when the database has no FULLTEXT support. A
+document matches when it contains every word of the query, each anywhere in
+its text, as `name LIKE '%word%'` ANDed over the words would; the trigrams
+only narrow down the documents to check.
+"""
+
+import re
+from collections import defaultdict
+
+_WORD = re.compile(r"\w+")
+
+
+def trigrams(text: str, prefix: bool = False) -> set[str]:
+    """
+    Split a text into padded, case-folded trigrams.
+
+    With `prefix` the last word is left open-ended, so "data str" matches
+    "Data Structures" while the user is still typing.
+    """
+    words = _WORD.findall(text.casefold())
+    grams = set()
+    for i, word in enumerate(words):
+        padded = "  " + word + ("" if prefix and i == len(words) - 1 else " ")
+        for j in range(len(padded) - 2):
+            grams.add(padded[j : j + 3])
+    return grams
+
+
+def _inner_trigrams(word: str) -> set[str]:
+    # the trigrams any text containing `word` has, wherever the word sits
+    return {word[j : j + 3] for j in range(len(word) - 2)}
+
+
+class TrigramIndex:
+    """An inverted index of trigram -> document ids, over the documents' text"""
+
+    def __init__(self):
+        self._postings: dict[str, set[int]] = defaultdict(set)
+        self._texts: dict[int, str] = {}
+
+    def __len__(self):
+        return len(self._postings)
+
+    def add(self, doc_id: int, text: str):
+        """Index a document"""
+        self._texts[doc_id] = " ".join(_WORD.findall(text.casefold()))
+        for gram in trigrams(text):
+            self._postings[gram].add(doc_id)
+
+    def search(self, query: str) -> list[tuple[int, float]]:
+        """
+        The documents containing every word of the query.
+
+        Returns (doc_id, score) pairs, best first and then by id. The score
+        is the share of the query words starting a word of the document, so
+        "struct" ranks "Data Structures" above "Construction".
+        """
+        words = _WORD.findall(query.casefold())
+        if not words:
+            return []
+        candidates: set[int] | None = None
+        for gram in set().union(*map(_inner_trigrams, words)):
+            postings = self._postings.get(gram, set())
+            candidates = postings if candidates is None else candidates & postings
+            if not candidates:
+                return []
+        if candidates is None:
+            # words under three letters have no trigram, every document is checked
+            candidates = set(self._texts)
+
+        ranked = []
+        for doc_id in candidates:
+            text = self._texts[doc_id]
+            if all(word in text for word in words):
+                starts = sum(f" {word}" in f" {text}" for word in words)
+                ranked.append((doc_id, starts / len(words)))
+        ranked.sort(key=lambda hit: (-hit[1], hit[0]))
+        return ranked
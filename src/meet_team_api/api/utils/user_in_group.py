@@ -1,24 +1,160 @@
+"""
+This module checks group membership.
+
+Membership is asked on nearly every request, so the answers are cached in
+memory: user -> the set of groups they belong to, and task -> its group.
+Negative answers are always re-checked against the database, so a user who
+just joined through another worker is never locked out by a stale entry.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from mysql.connector.abstracts import MySQLCursorAbstract
+
 from ...db import get_connection, get_cursor
 from ...models.user import UserId
 from ...models.group import GroupId
 
+MEMBERSHIP_CACHE_TTL = float(os.getenv("MEET_TEAM_MEMBERSHIP_CACHE_TTL", "60"))
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEET_TEAM_MEMBERSHIP_CACHE_SIZE", "65536"))
+
+
+class MembershipCache:
+    """A thread-safe TTL cache of user -> groups and task -> group"""
+
+    def __init__(
+        self, ttl: float = MEMBERSHIP_CACHE_TTL, maxsize: int = MEMBERSHIP_CACHE_SIZE
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._groups: OrderedDict[UserId, tuple[frozenset[GroupId], float]] = (
+            OrderedDict()
+        )
+        self._task_groups: OrderedDict[int, GroupId] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def groups_of(self, user_id: UserId) -> frozenset[GroupId] | None:
+        """The cached groups of a user, or None if unknown or expired"""
+        with self._lock:
+            entry = self._groups.get(user_id)
+            if entry is None:
+                return None
+            groups, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._groups[user_id]
+                return None
+            self._groups.move_to_end(user_id)
+            return groups
+
+    def set_groups(self, user_id: UserId, groups: frozenset[GroupId]):
+        """Cache the groups of a user"""
+        with self._lock:
+            self._groups[user_id] = (groups, time.monotonic() + self.ttl)
+            self._groups.move_to_end(user_id)
+            while len(self._groups) > self.maxsize:
+                self._groups.popitem(last=False)
+
+    def task_group(self, task_id: int) -> GroupId | None:
+        """The cached group of a task; a task never changes group"""
+        with self._lock:
+            group_id = self._task_groups.get(task_id)
+            if group_id is not None:
+                self._task_groups.move_to_end(task_id)
+            return group_id
+
+    def set_task_group(self, task_id: int, group_id: GroupId):
+        """Cache the group of a task"""
+        with self._lock:
+            self._task_groups[task_id] = group_id
+            self._task_groups.move_to_end(task_id)
+            while len(self._task_groups) > self.maxsize:
+                self._task_groups.popitem(last=False)
+
+    def invalidate_user(self, user_id: UserId):
+        """Drop the cached groups of a user, called when they join a group"""
+        with self._lock:
+            self._groups.pop(user_id, None)
+
+    def clear(self):
+        """Drop everything"""
+        with self._lock:
+            self._groups.clear()
+            self._task_groups.clear()
+
+
+membership_cache = MembershipCache()
+
 
-def user_in_group(user_id: UserId, group_id: GroupId):
-    """This function is to check if a user is in a group"""
-    conn = get_connection()
-    cur = get_cursor(conn)
-    # check if the user is in the group
+def _load_groups(cur: MySQLCursorAbstract, user_id: UserId) -> frozenset[GroupId]:
     cur.execute(
         """
-        SELECT EXISTS(
-            SELECT * FROM group_member
-            WHERE user_id = %s AND group_id = %s
-        ) AS in_group
+        SELECT group_id FROM group_member
+        WHERE user_id = %s
         """,
-        (user_id, group_id),
+        (user_id,),
     )
-    if cur.fetchone()["in_group"] == 0:
-        cur.close()
-        conn.close()
+    groups = frozenset(row["group_id"] for row in cur.fetchall())
+    membership_cache.set_groups(user_id, groups)
+    return groups
+
+
+def _load_task_group(cur: MySQLCursorAbstract, task_id: int) -> GroupId | None:
+    cur.execute(
+        """
+        SELECT group_id FROM task
+        WHERE id = %s
+        """,
+        (task_id,),
+    )
+    row = cur.fetchone()
+    if row is None or row["group_id"] is None:
+        return None
+    membership_cache.set_task_group(task_id, row["group_id"])
+    return row["group_id"]
+
+
+def _with_cursor(func, cur: MySQLCursorAbstract | None, *args):
+    if cur is not None:
+        return func(cur, *args)
+    with get_connection() as conn:
+        return func(get_cursor(conn), *args)
+
+
+def user_in_group(
+    user_id: UserId, group_id: GroupId, cur: MySQLCursorAbstract | None = None
+):
+    """
+    This function is to check if a user is in a group.
+
+    Pass `cur` when the caller already holds a connection, so the check does
+    not check out a second one.
+    """
+    groups = membership_cache.groups_of(user_id)
+    if groups is not None and group_id in groups:
+        return True
+    groups = _with_cursor(_load_groups, cur, user_id)
+    if group_id not in groups:
+        raise Exception("You're not in this group")
+    return True
+
+
+def task_group(task_id: int, cur: MySQLCursorAbstract | None = None) -> GroupId:
+    """This function returns the group a task belongs to"""
+    group_id = membership_cache.task_group(task_id)
+    if group_id is None:
+        group_id = _with_cursor(_load_task_group, cur, task_id)
+    if group_id is None:
         raise Exception("You're not in this group")
-    return True
\ No newline at end of file
+    return group_id
+
+
+def user_in_task_group(
+    user_id: UserId, task_id: int, cur: MySQLCursorAbstract | None = None
+) -> GroupId:
+    """This function checks that a user is in the group of a task, returns the group"""
+    group_id = task_group(task_id, cur)
+    user_in_group(user_id, group_id, cur)
+    return group_id
@@ -0,0 +1,136 @@
+"""
+This module resolves user IDs to their public profile (name, description).
+
+Handlers fetch their base rows with plain user IDs and ask a request-scoped
+`UserLoader` for the names: all the IDs of a request are resolved with one
+`WHERE id IN (...)` query, and the answers are kept in a process-wide LRU
+that `handlers/user.update_info` invalidates. The updates made through
+another worker show up once the entry expires.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from mysql.connector.abstracts import MySQLCursorAbstract
+
+from ...models.user import UserId
+
+USER_PROFILE_CACHE_SIZE = int(os.getenv("MEET_TEAM_USER_PROFILE_CACHE_SIZE", "16384"))
+USER_PROFILE_CACHE_TTL = float(os.getenv("MEET_TEAM_USER_PROFILE_CACHE_TTL", "60"))
+
+PROFILE_FIELDS = ("id", "name", "description")
+
+
+class UserProfileCache:
+    """A thread-safe LRU of user ID -> public profile, kept `ttl` seconds"""
+
+    def __init__(
+        self,
+        maxsize: int = USER_PROFILE_CACHE_SIZE,
+        ttl: float = USER_PROFILE_CACHE_TTL,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._profiles: OrderedDict[UserId, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, user_ids) -> dict[UserId, dict]:
+        """The cached profiles among `user_ids`, expired ones left out"""
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._profiles.get(user_id)
+                if entry is None:
+                    continue
+                profile, expires_at = entry
+                if expires_at <= now:
+                    del self._profiles[user_id]
+                    continue
+                self._profiles.move_to_end(user_id)
+                found[user_id] = profile
+        return found
+
+    def put_many(self, profiles):
+        """Cache profiles, each a dict with at least the `PROFILE_FIELDS`"""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for profile in profiles:
+                self._profiles[profile["id"]] = (
+                    {field: profile[field] for field in PROFILE_FIELDS},
+                    expires_at,
+                )
+                self._profiles.move_to_end(profile["id"])
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+
+    def invalidate(self, user_id: UserId):
+        """Forget a profile, called when the user updates it"""
+        with self._lock:
+            self._profiles.pop(user_id, None)
+
+    def clear(self):
+        """Forget every profile"""
+        with self._lock:
+            self._profiles.clear()
+
+
+user_profiles = UserProfileCache()
+
+
+class UserLoader:
+    """
+    A batching loader living for one request.
+
+    It reuses the request's cursor, remembers what it already loaded and only
+    queries the IDs missing from both itself and the process-wide cache.
+    """
+
+    def __init__(self, cur: MySQLCursorAbstract):
+        self._cur = cur
+        self._profiles: dict[UserId, dict] = {}
+
+    def prime(self, rows):
+        """Feed rows that already carry full profiles, e.g. a member list"""
+        rows = [row for row in rows if all(field in row for field in PROFILE_FIELDS)]
+        for row in rows:
+            self._profiles[row["id"]] = row
+        user_profiles.put_many(rows)
+
+    def load_many(self, user_ids) -> dict[UserId, dict]:
+        """The profiles of `user_ids`, unknown users are left out"""
+        wanted = {user_id for user_id in user_ids if user_id is not None}
+        missing = wanted - self._profiles.keys()
+        if missing:
+            cached = user_profiles.get_many(missing)
+            self._profiles.update(cached)
+            missing -= cached.keys()
+        if missing:
+            self._cur.execute(
+                f"""
+                SELECT id, name, description
+                FROM `user`
+                WHERE id IN ({", ".join(["%s"] * len(missing))})
+                """,
+                tuple(missing),
+            )
+            rows = self._cur.fetchall()
+            user_profiles.put_many(rows)
+            self._profiles.update((row["id"], row) for row in rows)
+        return {
+            user_id: self._profiles[user_id]
+            for user_id in wanted
+            if user_id in self._profiles
+        }
+
+    def resolve_names(self, rows, id_key: str, name_key: str, keep_id: bool = True):
+        """Set `row[name_key]` to the name of the user in `row[id_key]`"""
+        profiles = self.load_many(row[id_key] for row in rows)
+        for row in rows:
+            profile = profiles.get(row[id_key])
+            row[name_key] = profile["name"] if profile is not None else None
+            if not keep_id:
+                del row[id_key]
+        return rows
@@ -1,28 +1,789 @@
 """This is to setup the MySQL Database"""
 
+import asyncio
+import contextvars
+import functools
+import itertools
+import logging
 import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 import mysql.connector
+from mysql.connector import errorcode
 from mysql.connector.abstracts import (MySQLConnectionAbstract,
                                        MySQLCursorAbstract)
 
+from .metrics import (
+    InstrumentedCursor,
+    calling_handler,
+    db_transaction_retries,
+    record_acquire,
+)
+
 MYSQL_HOST = os.getenv("MYSQL_HOST")
 MYSQL_USER = os.getenv("MYSQL_USER")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
 MYSQL_DB = os.getenv("MYSQL_DATABASE")
 
+# Pool sizing and recycling, all durations are in seconds
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "10"))
+MYSQL_POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "5"))
+MYSQL_POOL_MAX_IDLE = float(os.getenv("MYSQL_POOL_MAX_IDLE", "300"))
+MYSQL_POOL_MAX_LIFETIME = float(os.getenv("MYSQL_POOL_MAX_LIFETIME", "3600"))
+
+# Prepared statements kept per connection, 0 sends every query as text, and
+# the runs of a statement in the process before it is prepared
+MYSQL_PREPARED_CACHE_SIZE = int(os.getenv("MYSQL_PREPARED_CACHE_SIZE", "64"))
+MYSQL_PREPARE_AFTER = int(os.getenv("MYSQL_PREPARE_AFTER", "3"))
+
+# Attempts of a transaction hitting a deadlock or a lock wait timeout, and the
+# base of the exponential backoff between them, in seconds
+MYSQL_TX_ATTEMPTS = int(os.getenv("MYSQL_TX_ATTEMPTS", "4"))
+MYSQL_TX_BACKOFF = float(os.getenv("MYSQL_TX_BACKOFF", "0.02"))
+
+# Read replicas, as `host[:port]` separated by commas; none by default
+MYSQL_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.getenv("MYSQL_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+MYSQL_REPLICA_POOL_SIZE = int(
+    os.getenv("MYSQL_REPLICA_POOL_SIZE", str(MYSQL_POOL_SIZE))
+)
+MYSQL_REPLICA_MAX_LAG = float(os.getenv("MYSQL_REPLICA_MAX_LAG", "5"))
+MYSQL_REPLICA_CHECK_INTERVAL = float(os.getenv("MYSQL_REPLICA_CHECK_INTERVAL", "5"))
+# Seconds a user's reads stay on the primary after they wrote
+MYSQL_READ_YOUR_WRITES = float(os.getenv("MYSQL_READ_YOUR_WRITES", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out in time"""
+
+
+# Errors meaning "this can't run as a prepared statement (now)", the query is
+# sent as text instead; 1210 is raised by the connector itself
+_UNPREPARABLE_ERRNOS = {
+    errorcode.ER_UNSUPPORTED_PS,
+    errorcode.ER_NEED_REPREPARE,
+    errorcode.ER_MAX_PREPARED_STMT_COUNT_REACHED,
+    errorcode.ER_WRONG_ARGUMENTS,
+}
+_PREPARABLE = {"SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE"}
+
+
+class StatementStats:
+    """The process-wide counters of the prepared statement caches"""
+
+    def __init__(self):
+        self._counts = {"hits": 0, "prepares": 0, "evictions": 0, "fallbacks": 0}
+        self._lock = threading.Lock()
+
+    def add(self, name: str):
+        """Count one event"""
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self) -> dict[str, int | float]:
+        """The counters and the hit rate of the lookups"""
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts["hits"] + counts["prepares"]
+        counts["hit_rate"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+        return counts
+
+
+statement_stats = StatementStats()
+
+
+class StatementSightings:
+    """
+    The runs of the last `size` distinct SQL texts in the process.
+
+    A statement is only prepared once it proved hot: SQL built at run time,
+    e.g. an `IN (%s, %s, ...)` list as long as its input, changes from one
+    call to the next, and preparing it would cost a round trip per call and
+    evict the hot statements.
+    """
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self._counts: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, operation: str) -> int:
+        """Count a run of the statement, returns its runs so far"""
+        with self._lock:
+            count = self._counts.pop(operation, 0) + 1
+            self._counts[operation] = count
+            if len(self._counts) > self.size:
+                self._counts.popitem(last=False)
+            return count
+
+
+statement_sightings = StatementSightings()
+
+
+class StatementCache:
+    """
+    The prepared statements of one connection, by SQL text, in LRU order.
+
+    Each statement is a prepared cursor: MySQL parses and plans it once, then
+    only its parameters travel. Statements with named parameters or without
+    parameters, run fewer than `prepare_after` times in the process, or
+    failing to prepare go through the text protocol.
+    """
+
+    def __init__(
+        self,
+        raw: MySQLConnectionAbstract,
+        size: int = MYSQL_PREPARED_CACHE_SIZE,
+        prepare_after: int = MYSQL_PREPARE_AFTER,
+    ):
+        self._raw = raw
+        self.size = size
+        self.prepare_after = prepare_after
+        # SQL text -> (the text object the cursor was prepared with, cursor);
+        # the connector re-prepares unless given that very object
+        self._cursors: OrderedDict[str, tuple[str, MySQLCursorAbstract]] = OrderedDict()
+        self._unpreparable: set[str] = set()
+
+    def _eligible(self, operation, params) -> bool:
+        return (
+            self.size > 0
+            and isinstance(operation, str)
+            and isinstance(params, (tuple, list))
+            and len(params) > 0
+            and "%(" not in operation
+            and operation.count("%s") == len(params)
+            and operation.lstrip()[:7].split(None, 1)[0].upper() in _PREPARABLE
+            and operation not in self._unpreparable
+        )
+
+    def _drop(self, operation: str):
+        _, cursor = self._cursors.pop(operation)
+        try:
+            cursor.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def execute(self, operation, params) -> MySQLCursorAbstract | None:
+        """
+        Run a query as a prepared statement, returns its cursor to fetch from,
+        or None if it must go through the text protocol
+        """
+        if not self._eligible(operation, params):
+            return None
+        entry = self._cursors.get(operation)
+        if entry is None:
+            if statement_sightings.seen(operation) < self.prepare_after:
+                return None
+            statement_stats.add("prepares")
+            entry = self._cursors[operation] = (
+                operation,
+                self._raw.cursor(prepared=True, dictionary=True),
+            )
+            while len(self._cursors) > self.size:
+                statement_stats.add("evictions")
+                self._drop(next(iter(self._cursors)))
+        else:
+            statement_stats.add("hits")
+            self._cursors.move_to_end(operation)
+
+        text, cursor = entry
+        try:
+            cursor.execute(text, params)
+        except mysql.connector.Error as e:
+            if e.errno not in _UNPREPARABLE_ERRNOS:
+                raise
+            statement_stats.add("fallbacks")
+            self._drop(operation)
+            if (
+                e.errno == errorcode.ER_UNSUPPORTED_PS
+                and len(self._unpreparable) < 1024
+            ):
+                self._unpreparable.add(operation)
+            return None
+        return cursor
+
+
+class PooledConnection:
+    """
+    A checked-out connection.
+
+    It behaves like the underlying `mysql.connector` connection, except that
+    `close()` (or leaving a `with` block) hands it back to the pool instead of
+    tearing down the socket.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw: MySQLConnectionAbstract):
+        self._pool = pool
+        self._raw = raw
+        self._cursors: list[MySQLCursorAbstract] = []
+        self._discarded = False
+        self.statements = StatementCache(raw)
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def raw(self) -> MySQLConnectionAbstract:
+        """The underlying `mysql.connector` connection"""
+        return self._raw
+
+    def commit(self):
+        """Commit, and keep the current user's reads on the primary for a while"""
+        self._raw.commit()
+        recent_writers.wrote(current_user.get())
+
+    def cursor(self, *args, **kwargs) -> MySQLCursorAbstract:
+        """Open a cursor which is closed when the connection is returned"""
+        cur = self._raw.cursor(*args, **kwargs)
+        self._cursors.append(cur)
+        return cur
+
+    def close(self):
+        """Return this connection to its pool"""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.release(self)
+
+    def discard(self):
+        """
+        Close this connection for good instead of returning it to the pool.
+
+        Used when a streamed result set is abandoned halfway: draining the
+        rest of it to reuse the socket costs more than a new connection.
+        """
+        self._discarded = True
+        self.close()
+
+    def reset(self):
+        """Close the open cursors and drop any unfinished work"""
+        for cur in self._cursors:
+            try:
+                cur.close()
+            except Exception:  # pylint: disable=broad-except
+                pass
+        self._cursors.clear()
+        if self._raw.unread_result:
+            self._raw.consume_results()
+        if self._raw.in_transaction:
+            self._raw.rollback()
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of MySQL connections.
+
+    Idle connections are kept LIFO so the hot ones get reused and the cold
+    ones age out through `max_idle`; every connection is recycled after
+    `max_lifetime` and health-checked when borrowed.
+    """
+
+    def __init__(
+        self,
+        size: int = MYSQL_POOL_SIZE,
+        timeout: float = MYSQL_POOL_TIMEOUT,
+        max_idle: float = MYSQL_POOL_MAX_IDLE,
+        max_lifetime: float = MYSQL_POOL_MAX_LIFETIME,
+        **connect_args,
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self._connect_args = connect_args
+        self._idle: deque[PooledConnection] = deque()
+        self._in_use = 0
+        self._waiters = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+    def _connect(self) -> PooledConnection:
+        raw = mysql.connector.connect(**self._connect_args)
+        with self._cond:
+            self._stats["created"] += 1
+        return PooledConnection(self, raw)
+
+    def _expired(self, conn: PooledConnection, now: float) -> bool:
+        return (
+            now - conn.created_at > self.max_lifetime
+            or now - conn.last_used_at > self.max_idle
+        )
+
+    def _discard(self, conn: PooledConnection):
+        with self._cond:
+            self._stats["discarded"] += 1
+        try:
+            conn.raw.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def acquire(self) -> PooledConnection:
+        """Check out a healthy connection, waiting up to `timeout` seconds"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        stale: list[PooledConnection] = []
+        with self._cond:
+            self._waiters += 1
+            try:
+                while not self._idle and self._in_use >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.timeout}s"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters -= 1
+            self._in_use += 1
+            conn = None
+            now = time.monotonic()
+            while self._idle:
+                candidate = self._idle.pop()
+                if self._expired(candidate, now):
+                    stale.append(candidate)
+                else:
+                    conn = candidate
+                    break
+            waited = now - start
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+        record_acquire(waited)
+
+        for candidate in stale:
+            self._discard(candidate)
+
+        try:
+            if conn is not None and not conn.raw.is_connected():
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        conn._pool = self  # pylint: disable=protected-access
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Put a connection back, or drop it if it is broken or too old"""
+        try:
+            # pylint: disable-next=protected-access
+            healthy = not conn._discarded
+            if healthy:
+                conn.reset()
+        except Exception:  # pylint: disable=broad-except
+            healthy = False
+
+        now = time.monotonic()
+        conn.last_used_at = now
+        if not healthy or now - conn.created_at > self.max_lifetime:
+            self._discard(conn)
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def stats(self) -> dict[str, int | float]:
+        """A snapshot of the pool counters"""
+        with self._cond:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiters": self._waiters,
+                **self._stats,
+            }
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            self._discard(conn)
+
+
+pool = ConnectionPool(
+    host=MYSQL_HOST,
+    user=MYSQL_USER,
+    password=MYSQL_PASSWORD,
+    database=MYSQL_DB,
+)
 
-def get_connection() -> MySQLConnectionAbstract:
-    """Initialize the connection"""
-    conn = mysql.connector.connect(
-        host=MYSQL_HOST,
-        user=MYSQL_USER,
-        password=MYSQL_PASSWORD,
-        database=MYSQL_DB,
+
+class Replica:
+    """A read replica: its pool and its last known health"""
+
+    def __init__(self, address: str, size: int = MYSQL_REPLICA_POOL_SIZE):
+        host, _, port = address.partition(":")
+        self.address = address
+        self.pool = ConnectionPool(
+            size=size,
+            host=host,
+            port=int(port or 3306),
+            user=MYSQL_USER,
+            password=MYSQL_PASSWORD,
+            database=MYSQL_DB,
+        )
+        # optimistic until the first check: a dead replica fails over anyway
+        self.healthy = True
+        self.lag: float | None = None
+        self.error: str | None = None
+
+    def check(self, max_lag: float):
+        """Measure the replication lag and mark the replica (un)healthy"""
+        try:
+            with self.pool.acquire() as conn:
+                cur = conn.cursor(dictionary=True)
+                try:
+                    cur.execute("SHOW REPLICA STATUS")
+                except mysql.connector.ProgrammingError as e:
+                    if e.errno != errorcode.ER_PARSE_ERROR:
+                        raise
+                    # before MySQL 8.0.22
+                    cur.execute("SHOW SLAVE STATUS")
+                status = cur.fetchone()
+        except PoolTimeoutError:
+            # busy, not broken: judge it at the next check
+            return
+        except Exception as e:  # pylint: disable=broad-except
+            self.mark_down(str(e))
+            return
+        if status is None:
+            # not replicating from anything, e.g. the primary itself in dev
+            self.lag = 0.0
+        else:
+            lag = status.get(
+                "Seconds_Behind_Source", status.get("Seconds_Behind_Master")
+            )
+            self.lag = None if lag is None else float(lag)
+        if self.lag is None:
+            self.mark_down("replication stopped")
+        elif self.lag > max_lag:
+            self.mark_down(f"{self.lag:.0f}s behind the primary")
+        else:
+            if not self.healthy:
+                logger.info("replica %s is back in rotation", self.address)
+            self.healthy, self.error = True, None
+
+    def mark_down(self, error: str):
+        """Take the replica out of rotation until its next good check"""
+        if self.healthy:
+            logger.warning("replica %s marked down: %s", self.address, error)
+        self.healthy = False
+        self.error = error
+
+
+class ReplicaSet:
+    """
+    The read replicas, used round-robin while healthy.
+
+    A background thread checks every replica each `interval` seconds and
+    takes out the ones lagging more than `max_lag` seconds or unreachable;
+    reads go to the primary when none is left.
+    """
+
+    def __init__(
+        self,
+        addresses: list[str],
+        max_lag: float = MYSQL_REPLICA_MAX_LAG,
+        interval: float = MYSQL_REPLICA_CHECK_INTERVAL,
+    ):
+        self.replicas = [Replica(address) for address in addresses]
+        self.max_lag = max_lag
+        self.interval = interval
+        self._next = itertools.count()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def choose(self) -> Replica | None:
+        """The next healthy replica, or None"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def check(self):
+        """Check every replica now"""
+        for replica in self.replicas:
+            replica.check(self.max_lag)
+
+    def _run(self):
+        while True:
+            self.check()
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        """Start the health checks, if there are replicas"""
+        if not self.replicas or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="meet_team_replica_check", daemon=True
+        )
+        self._thread.start()
+
+    def close(self):
+        """Stop the health checks and close the idle replica connections"""
+        self._stop.set()
+        self._thread = None
+        for replica in self.replicas:
+            replica.pool.close_all()
+
+    def stats(self) -> list[dict]:
+        """The health and pool counters of every replica"""
+        return [
+            {
+                "address": replica.address,
+                "healthy": replica.healthy,
+                "lag": replica.lag,
+                "error": replica.error,
+                "pool": replica.pool.stats(),
+            }
+            for replica in self.replicas
+        ]
+
+
+replicas = ReplicaSet(MYSQL_REPLICA_HOSTS)
+
+
+class RecentWriters:
+    """The users who wrote in the last `window` seconds, by expiry"""
+
+    def __init__(self, window: float = MYSQL_READ_YOUR_WRITES):
+        self.window = window
+        self._until: dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def wrote(self, user_id: int | None):
+        """Record a write by the user"""
+        if user_id is None or self.window <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._until[user_id] = now + self.window
+            if len(self._until) > 10_000:
+                self._until = {u: t for u, t in self._until.items() if t > now}
+
+    def recent(self, user_id: int | None) -> bool:
+        """Whether the user wrote in the last `window` seconds"""
+        if user_id is None:
+            return False
+        with self._lock:
+            return self._until.get(user_id, 0) > time.monotonic()
+
+
+recent_writers = RecentWriters()
+
+# The authenticated user of the request, set by the auth dependency and
+# copied into the executor threads by `run_blocking`
+current_user: contextvars.ContextVar[int | None] = contextvars.ContextVar(
+    "current_user", default=None
+)
+
+
+def get_connection() -> PooledConnection:
+    """
+    Check out a connection from the pool.
+
+    Use it as a context manager so it always goes back to the pool:
+
+        with get_connection() as conn:
+            cur = get_cursor(conn)
+            ...
+    """
+    return pool.acquire()
+
+
+def get_read_connection() -> PooledConnection:
+    """
+    Check out a connection for reads only, from a healthy replica.
+
+    Falls back to the primary when no replica is configured or healthy, when
+    the replica can't be reached or its pool is exhausted, and when the current user wrote in the last
+    `MYSQL_READ_YOUR_WRITES` seconds, so they always read their own writes.
+    Data the replica may not have yet, e.g. a membership check right after a
+    join, must be read from `get_connection`.
+    """
+    if recent_writers.recent(current_user.get()):
+        return pool.acquire()
+    replica = replicas.choose()
+    if replica is None:
+        return pool.acquire()
+    try:
+        return replica.pool.acquire()
+    except PoolTimeoutError:
+        # saturated, not failing: it stays in rotation for the next reads
+        return pool.acquire()
+    except (mysql.connector.Error, OSError) as e:
+        replica.mark_down(str(e))
+        return pool.acquire()
+
+
+def get_cursor(connection, handler: str | None = None) -> InstrumentedCursor:
+    """
+    Get cursor from connection, timed and tagged with the calling handler, and
+    running its parameterized queries as prepared statements
+    """
+    return InstrumentedCursor(
+        connection.cursor(dictionary=True),
+        handler or calling_handler(),
+        getattr(connection, "statements", None),
     )
-    return conn
 
 
-def get_cursor(connection) -> MySQLCursorAbstract:
-    """Get cursor from connection"""
-    return connection.cursor(dictionary=True)
+class UnitOfWork:
+    """
+    The writes of one handler call, committed together or not at all.
+
+    `cur` runs its statements; `after_commit` queues what must only happen
+    once they are committed, e.g. bumping the cached versions.
+    """
+
+    def __init__(self, conn: PooledConnection, cur: InstrumentedCursor):
+        self.conn = conn
+        self.cur = cur
+        self._callbacks: list[functools.partial] = []
+
+    def after_commit(self, func, *args, **kwargs):
+        """Call `func` once the transaction is committed"""
+        self._callbacks.append(functools.partial(func, *args, **kwargs))
+
+    def committed(self):
+        """Run the queued callbacks"""
+        for callback in self._callbacks:
+            callback()
+
+
+_RETRYABLE_ERRNOS = {errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT}
+
+
+def _rollback(conn: PooledConnection):
+    try:
+        conn.rollback()
+    except Exception:  # pylint: disable=broad-except
+        # the pool drops a connection it can't reset
+        pass
+
+
+def transactional(func):
+    """
+    Run a blocking DB function as one unit of work.
+
+    The function takes a `UnitOfWork` as its first argument, which callers
+    don't pass. Its statements run in one transaction on one connection: it
+    is committed when the function returns, in a single round trip, and
+    rolled back when it raises. On a deadlock or a lock wait timeout, MySQL
+    has rolled it back already and the whole function is rerun, up to
+    `MYSQL_TX_ATTEMPTS` times with a jittered exponential backoff; it must
+    therefore only touch the database before committing.
+
+        @non_blocking
+        @transactional
+        def create(uow: UnitOfWork, ...):
+            uow.cur.execute(...)
+            uow.after_commit(resource_versions.bump, "task", task_id)
+    """
+    handler = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in itertools.count(1):
+            with get_connection() as conn:
+                uow = UnitOfWork(conn, get_cursor(conn, handler))
+                try:
+                    ret = func(uow, *args, **kwargs)
+                    conn.commit()
+                except mysql.connector.Error as e:
+                    _rollback(conn)
+                    if e.errno not in _RETRYABLE_ERRNOS or attempt >= MYSQL_TX_ATTEMPTS:
+                        raise
+                except BaseException:
+                    _rollback(conn)
+                    raise
+                else:
+                    break
+            db_transaction_retries.inc(1, handler)
+            time.sleep(MYSQL_TX_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        uow.committed()
+        return ret
+
+    return wrapper
+
+
+def pool_stats() -> dict[str, int | float]:
+    """Expose the pool counters, used by the stats endpoint"""
+    return pool.stats()
+
+
+def prepared_stats() -> dict[str, int | float]:
+    """Expose the prepared statement counters, used by the stats endpoint"""
+    return statement_stats.snapshot()
+
+
+# One worker per pooled connection: a DB call never waits on the pool while
+# holding a thread, and the event loop never waits on either.
+executor = ThreadPoolExecutor(
+    max_workers=MYSQL_POOL_SIZE, thread_name_prefix="meet_team_db"
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking DB function on the DB executor and await its result.
+
+    The function runs in a copy of the caller's context, so the request's
+    context variables (e.g. its timings) follow it to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def non_blocking(func):
+    """
+    Turn a blocking DB function into a coroutine function.
+
+    The decorated handler keeps its call signature, so routes keep doing
+    `await handler(...)` while the `mysql.connector` calls run off the event
+    loop.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(func, *args, **kwargs)
+
+    return wrapper
@@ -1,12 +1,36 @@
 """main"""
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
+from .api.handlers import course, handler_message
 from .api.routes import router
+from .api.utils.json_response import JSONResponse
+from .api.utils.pubsub import broker
+from .db import pool_stats, prepared_stats, replicas
+from .metrics import TimingMiddleware, query_listeners, register_gauge, render
+from .slow_query import slow_query_log
+from .write_behind import write_behind
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Start and stop the background machinery"""
+    handler_message.install_backend()
+    replicas.start()
+    course.course_catalog.start()
+    write_behind.start()
+    yield
+    write_behind.close()
+    course.course_catalog.close()
+    replicas.close()
+    broker.close()
 
 
-app = FastAPI()
+app = FastAPI(default_response_class=JSONResponse, lifespan=lifespan)
 app.include_router(router)
 
 origins = ["http://localhost",
@@ -17,6 +41,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
+)
+app.add_middleware(TimingMiddleware)
+query_listeners.append(slow_query_log.observe)
+
+for _name in ("in_use", "idle", "waiters"):
+    register_gauge(
+        f"meet_team_db_pool_{_name}",
+        f"Pooled connections {_name.replace('_', ' ')}",
+        lambda name=_name: pool_stats()[name],
+    )
+register_gauge(
+    "meet_team_db_prepared_hit_rate",
+    "Share of statement executions reusing a prepared statement",
+    lambda: prepared_stats()["hit_rate"],
 )
 
 
@@ -24,3 +63,23 @@ app.add_middleware(
 async def root():
     """This is the default route to the root"""
     return {"message": "Hello World"}
+
+
+@app.get("/stats/db")
+async def db_stats():
+    """This route exposes the connection pool counters"""
+    return {
+        "data": {
+            "pool": pool_stats(),
+            "replicas": replicas.stats(),
+            "prepared": prepared_stats(),
+            "write_behind": write_behind.stats(),
+            "pubsub": broker.stats(),
+        }
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """This route exposes the request and query timings to Prometheus"""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
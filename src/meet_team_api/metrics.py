@@ -0,0 +1,353 @@
+"""
+This module collects the request and query timings.
+
+`TimingMiddleware` times every request per route; `db.get_cursor` hands out
+an `InstrumentedCursor` timing every query, tagged with the handler that ran
+it. Everything lands in process-wide histograms, rendered in the Prometheus
+text format by `/metrics`, and the share of a request spent in the database
+is reported back in its `Server-Timing` header.
+"""
+
+import bisect
+import contextvars
+import sys
+import threading
+import time
+from typing import Callable
+
+# Upper bounds, in seconds, of the latency buckets
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """A thread-safe Prometheus histogram, one series per label values"""
+
+    def __init__(
+        self, name: str, doc: str, labels: tuple[str, ...], buckets=LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        """Record one observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        """The exposition lines of this histogram"""
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labels, label_values)
+            )
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                cumulative += count
+                sep = "," if labels else ""
+                lines.append(
+                    f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}'
+                )
+            braces = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{braces} {values[-1]}")
+            lines.append(f"{self.name}_count{braces} {cumulative}")
+        return lines
+
+
+class Counter:
+    """A thread-safe Prometheus counter, one series per label values"""
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...]):
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self._series: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, *label_values: str):
+        """Add to the counter"""
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        """The exposition lines of this counter"""
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for label_values, value in sorted(series.items()):
+            labels = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labels, label_values)
+            )
+            lines.append(f"{self.name}{{{labels}}} {value}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+http_request_duration = Histogram(
+    "meet_team_http_request_duration_seconds",
+    "Time to serve a request, until the end of its response body",
+    ("method", "route", "status"),
+)
+db_query_duration = Histogram(
+    "meet_team_db_query_duration_seconds",
+    "Time of one execute() round trip",
+    ("handler", "statement"),
+)
+db_rows = Counter(
+    "meet_team_db_rows_total",
+    "Rows fetched from the database",
+    ("handler",),
+)
+db_transaction_retries = Counter(
+    "meet_team_db_transaction_retries_total",
+    "Transactions rerun after a deadlock or a lock wait timeout",
+    ("handler",),
+)
+db_acquire_duration = Histogram(
+    "meet_team_db_pool_acquire_seconds",
+    "Time spent waiting for a pooled connection",
+    (),
+)
+
+# Called as (handler, operation, params, seconds, many) after every query;
+# e.g. the slow-query log
+query_listeners: list[Callable[[str, str, object, float, bool], None]] = []
+
+# Extra gauges, name -> (help, callable returning the value); e.g. the pool
+_gauges: dict[str, tuple[str, Callable[[], float]]] = {}
+
+
+def register_gauge(name: str, doc: str, read: Callable[[], float]):
+    """Expose a value read at scrape time"""
+    _gauges[name] = (doc, read)
+
+
+def render() -> str:
+    """Every metric in the Prometheus text format"""
+    lines = []
+    for metric in (
+        http_request_duration,
+        db_query_duration,
+        db_rows,
+        db_acquire_duration,
+        db_transaction_retries,
+    ):
+        lines.extend(metric.render())
+    for name, (doc, read) in sorted(_gauges.items()):
+        lines.extend(
+            [f"# HELP {name} {doc}", f"# TYPE {name} gauge", f"{name} {read()}"]
+        )
+    return "\n".join(lines) + "\n"
+
+
+class RequestTimings:
+    """What one request spent in the database, for its Server-Timing header"""
+
+    __slots__ = ("db", "queries", "acquire")
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+        self.acquire = 0.0
+
+
+# Set by the middleware; `db.run_blocking` copies it into the executor threads
+current_timings: contextvars.ContextVar[RequestTimings | None] = contextvars.ContextVar(
+    "current_timings", default=None
+)
+
+
+def record_acquire(seconds: float):
+    """Record the wait for a pooled connection"""
+    db_acquire_duration.observe(seconds)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.acquire += seconds
+
+
+def calling_handler(depth: int = 2) -> str:
+    """
+    The `module.function` of the caller's caller, e.g. `task.find_all` for a
+    `get_cursor` call in `handlers/task.py`.
+    """
+    frame = sys._getframe(depth)  # pylint: disable=protected-access
+    module = frame.f_globals.get("__name__", "?").rsplit(".", 1)[-1]
+    return f"{module}.{frame.f_code.co_name}"
+
+
+class InstrumentedCursor:
+    """
+    A cursor recording the time, statement kind and row count of its queries.
+
+    Anything it doesn't wrap is passed through to the `mysql.connector`
+    cursor. Given the `statements` of its connection, a query with parameters
+    runs as a prepared statement, its results then read from that statement's
+    cursor.
+    """
+
+    def __init__(self, cursor, handler: str, statements=None):
+        self._cursor = cursor
+        self._active = cursor
+        self.handler = handler
+        self.statements = statements
+
+    def __getattr__(self, name):
+        return getattr(self._active, name)
+
+    def __iter__(self):
+        return iter(self._active)
+
+    @property
+    def raw(self):
+        """The wrapped `mysql.connector` cursor"""
+        return self._cursor
+
+    def _timed(self, method, operation: str, *args, many=False, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(operation, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            statement = (
+                operation.lstrip().split(None, 1)[0].upper()
+                if operation.strip()
+                else "?"
+            )
+            db_query_duration.observe(elapsed, self.handler, statement)
+            timings = current_timings.get()
+            if timings is not None:
+                timings.db += elapsed
+                timings.queries += 1
+            params = args[0] if args else kwargs.get("params")
+            for listener in query_listeners:
+                listener(self.handler, operation, params, elapsed, many)
+
+    def _count(self, rows):
+        if rows:
+            db_rows.inc(len(rows) if isinstance(rows, list) else 1, self.handler)
+        return rows
+
+    def _execute(self, operation, params=None, *args, **kwargs):
+        prepared = None
+        if self.statements is not None and not args and not kwargs:
+            prepared = self.statements.execute(operation, params)
+        if prepared is not None:
+            self._active = prepared
+            return None
+        self._active = self._cursor
+        return self._cursor.execute(operation, params, *args, **kwargs)
+
+    def execute(self, operation, *args, **kwargs):
+        """Run a query, timed"""
+        return self._timed(self._execute, operation, *args, **kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        """Run a query over many parameter sets, timed"""
+        self._active = self._cursor
+        return self._timed(
+            self._cursor.executemany, operation, *args, many=True, **kwargs
+        )
+
+    def fetchone(self):
+        """Fetch a row, counted"""
+        return self._count(self._active.fetchone())
+
+    def fetchmany(self, *args, **kwargs):
+        """Fetch rows, counted"""
+        return self._count(self._active.fetchmany(*args, **kwargs))
+
+    def fetchall(self):
+        """Fetch the remaining rows, counted"""
+        return self._count(self._active.fetchall())
+
+
+def route_template(scope) -> str:
+    """
+    The path template of the route a request matched, e.g. `/task/{task_id}`,
+    keeping the metric labels few; `unmatched` when no route matched.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # the routes of an included router may lack its prefix, cut it off the path
+    prefix = scope["path"].rsplit("/", route.path.count("/"))[0]
+    return prefix + route.path
+
+
+class TimingMiddleware:
+    """
+    The ASGI middleware timing every HTTP request.
+
+    The latency is recorded per route template (`/task/{task_id}`, not the
+    raw path) and the response gets a `Server-Timing` header with the time
+    spent so far in the app, in queries and in waiting for a connection.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total = (time.perf_counter() - start) * 1000
+                header = (
+                    f"app;dur={total:.1f}, "
+                    f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries", '
+                    f"pool;dur={timings.acquire * 1000:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                route_template(scope),
+                str(status),
+            )
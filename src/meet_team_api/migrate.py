@@ -0,0 +1,195 @@
+"""
+The schema migration runner.
+
+Migrations are the `NNNN_name.sql` files in `migrations/`, applied in order
+and recorded in the `schema_migrations` table. `db/init.sql` only creates the
+base schema on the first container boot; everything after it lives here.
+
+    python -m src.meet_team_api.migrate status
+    python -m src.meet_team_api.migrate up
+    python -m src.meet_team_api.migrate check
+    python -m src.meet_team_api.migrate rebuild-ratings
+"""
+
+import argparse
+import ast
+import re
+import sys
+from pathlib import Path
+
+import mysql.connector
+
+from .api.utils import ratings
+from .db import get_connection, get_cursor
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+HANDLER_DIRS = [
+    Path(__file__).parent / "api" / "handlers",
+    Path(__file__).parent / "api" / "utils",
+]
+
+_MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+_PLACEHOLDER = re.compile(r"%(\([^)]+\))?s")
+
+
+def available_migrations() -> list[tuple[int, str, Path]]:
+    """The migration files as (version, name, path), in order"""
+    migrations = []
+    for path in MIGRATIONS_DIR.glob("*.sql"):
+        match = _MIGRATION_FILE.match(path.name)
+        if match is not None:
+            migrations.append((int(match[1]), match[2], path))
+    return sorted(migrations)
+
+
+def split_statements(sql: str) -> list[str]:
+    """Split a migration file into statements, dropping the `--` comments"""
+    lines = [line for line in sql.splitlines() if not line.lstrip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+
+def applied_versions(cur) -> set[int]:
+    """Create the bookkeeping table if needed and return the applied versions"""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT NOW()
+        )
+        """
+    )
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row["version"] for row in cur.fetchall()}
+
+
+def status():
+    """Print every migration and whether it has been applied"""
+    with get_connection() as conn:
+        applied = applied_versions(get_cursor(conn))
+    for version, name, _ in available_migrations():
+        print(f"[{'x' if version in applied else ' '}] {version:04d} {name}")
+
+
+def up(target: int | None = None):
+    """Apply the pending migrations, up to `target` if given"""
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        applied = applied_versions(cur)
+        for version, name, path in available_migrations():
+            if version in applied or (target is not None and version > target):
+                continue
+            print(f"Applying {version:04d} {name}")
+            # MySQL commits DDL implicitly, a failed migration must be fixed
+            # forward; the version is only recorded once every statement ran
+            for statement in split_statements(path.read_text()):
+                cur.execute(statement)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name),
+            )
+            conn.commit()
+
+
+def rebuild_ratings():
+    """Recompute the rating aggregates from the reviews"""
+    with get_connection() as conn:
+        ratings.rebuild(get_cursor(conn))
+        conn.commit()
+    print("Rating aggregates rebuilt")
+
+
+def handler_queries() -> list[tuple[str, str]]:
+    """
+    Every SELECT literal in the handlers, as (location, sql).
+
+    f-strings are skipped: their pieces are not runnable queries on their own.
+    """
+    queries = []
+    for directory in HANDLER_DIRS:
+        for path in sorted(directory.glob("*.py")):
+            tree = ast.parse(path.read_text())
+            fragments = {
+                id(value)
+                for node in ast.walk(tree)
+                if isinstance(node, ast.JoinedStr)
+                for value in node.values
+            }
+            for node in ast.walk(tree):
+                if (
+                    not isinstance(node, ast.Constant)
+                    or not isinstance(node.value, str)
+                    or id(node) in fragments
+                ):
+                    continue
+                sql = node.value.strip()
+                if re.match(r"(SELECT|WITH)\b", sql, re.IGNORECASE):
+                    queries.append((f"{path.name}:{node.lineno}", sql))
+    return queries
+
+
+def check() -> int:
+    """
+    EXPLAIN every handler query and report the ones that can't use an index.
+
+    A table read with `type=ALL` and no possible key is flagged, unless the
+    query has no WHERE clause at all (a deliberate whole-table read), and so
+    is a query MySQL refuses to explain. Returns the number of flagged
+    queries.
+    """
+    flagged = 0
+    with get_connection() as conn:
+        cur = get_cursor(conn)
+        for location, sql in handler_queries():
+            bound = re.sub(r"AGAINST \(%s", "AGAINST ('1'", sql.rstrip(";"))
+            bound = _PLACEHOLDER.sub("1", bound).replace("%%", "%")
+            try:
+                cur.execute(f"EXPLAIN {bound}")
+                plan = cur.fetchall()
+            except mysql.connector.Error as e:
+                flagged += 1
+                print(f"ERROR     {location}: {e.msg}")
+                continue
+            scans = [
+                row["table"]
+                for row in plan
+                if row["type"] == "ALL"
+                and row["possible_keys"] is None
+                and not str(row["table"]).startswith("<")
+            ]
+            if scans and re.search(r"\bWHERE\b", sql, re.IGNORECASE):
+                flagged += 1
+                print(f"FULL SCAN {location}: {', '.join(scans)}")
+            else:
+                print(f"ok        {location}")
+    return flagged
+
+
+def main(argv: list[str] | None = None) -> int:
+    """The CLI entry point"""
+    parser = argparse.ArgumentParser(
+        prog="migrate", description=__doc__.split("\n\n")[0]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="list the migrations and their state")
+    up_parser = commands.add_parser("up", help="apply the pending migrations")
+    up_parser.add_argument("--target", type=int, default=None)
+    commands.add_parser("check", help="EXPLAIN the handler queries")
+    commands.add_parser(
+        "rebuild-ratings", help="recompute the rating aggregates from the reviews"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        status()
+    elif args.command == "up":
+        up(args.target)
+    elif args.command == "check":
+        return 1 if check() else 0
+    elif args.command == "rebuild-ratings":
+        rebuild_ratings()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
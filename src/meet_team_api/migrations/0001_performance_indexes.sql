@@ -0,0 +1,37 @@
+-- Secondary indexes backing the queries in api/handlers and api/utils.
+-- InnoDB drops the implicit foreign-key index once one of these can enforce
+-- the constraint, so none of them duplicates an existing index.
+
+-- user_in_group: SELECT group_id FROM group_member WHERE user_id = ? (covering)
+CREATE INDEX idx_group_member_user_group ON group_member (user_id, group_id);
+
+-- group.join must be idempotent: keep the oldest row of any duplicate pair
+DELETE gm FROM group_member gm
+INNER JOIN group_member dup
+    ON dup.group_id = gm.group_id
+    AND dup.user_id = gm.user_id
+    AND dup.id < gm.id;
+
+-- group.find_one / review members: WHERE group_id = ?
+CREATE UNIQUE INDEX uq_group_member_group_user ON group_member (group_id, user_id);
+
+-- task.find_all: WHERE group_id = ? [AND status = ?]
+CREATE INDEX idx_task_group_status ON task (group_id, status);
+
+-- user.fetch_tasks: WHERE assignee_id = ?
+CREATE INDEX idx_task_assignee ON task (assignee_id, status);
+
+-- task.find_all(me=True): ? IN (assignee_id, reviewer_id)
+CREATE INDEX idx_task_reviewer ON task (reviewer_id, status);
+
+-- task.find_one: commits of a task in creation order
+CREATE INDEX idx_commit_task_create ON `commit` (task_id, create_at);
+
+-- handler_message.find_all: messages of a task in creation order
+CREATE INDEX idx_message_task_create ON message (task_id, create_at);
+
+-- review.get_group_members_and_reviews: WHERE group_id = ? AND reviewer_id = ?
+CREATE INDEX idx_review_group_reviewer ON review (group_id, reviewer_id);
+
+-- course.find_all(search_term): MATCH(name, description) AGAINST (...)
+CREATE FULLTEXT INDEX ft_course_search ON course (name, description) WITH PARSER ngram;
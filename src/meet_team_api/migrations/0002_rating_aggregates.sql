@@ -0,0 +1,34 @@
+-- Running rating totals, so a profile read is a primary-key lookup instead of
+-- a scan of `review`. Kept up to date by review.upsert_review and rebuilt
+-- from scratch with `migrate rebuild-ratings`.
+
+CREATE TABLE IF NOT EXISTS user_group_rating (
+    user_id INT NOT NULL,
+    group_id INT NOT NULL,
+    rating_sum DOUBLE NOT NULL DEFAULT 0,
+    rating_count INT NOT NULL DEFAULT 0,
+    avg_rating DOUBLE AS (IF(rating_count = 0, NULL, rating_sum / rating_count)),
+    PRIMARY KEY (user_id, group_id),
+    FOREIGN KEY (user_id) REFERENCES `user`(id),
+    FOREIGN KEY (group_id) REFERENCES `group`(id)
+);
+
+CREATE TABLE IF NOT EXISTS user_rating (
+    user_id INT PRIMARY KEY,
+    rating_sum DOUBLE NOT NULL DEFAULT 0,
+    rating_count INT NOT NULL DEFAULT 0,
+    avg_rating DOUBLE AS (IF(rating_count = 0, NULL, rating_sum / rating_count)),
+    FOREIGN KEY (user_id) REFERENCES `user`(id)
+);
+
+-- backfill from the existing reviews
+INSERT INTO user_group_rating (user_id, group_id, rating_sum, rating_count)
+SELECT user_id, group_id, SUM(rating), COUNT(*)
+FROM review
+WHERE user_id IS NOT NULL AND group_id IS NOT NULL
+GROUP BY user_id, group_id;
+
+INSERT INTO user_rating (user_id, rating_sum, rating_count)
+SELECT user_id, SUM(rating_sum), SUM(rating_count)
+FROM user_group_rating
+GROUP BY user_id;
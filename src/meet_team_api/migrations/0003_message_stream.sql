@@ -0,0 +1,6 @@
+-- handler_message.find_all and the streams read a task's messages by id:
+-- WHERE task_id = ? AND id > ? ORDER BY id
+CREATE INDEX idx_message_task_id ON message (task_id, id);
+
+-- superseded by the index above, nothing orders messages by create_at
+DROP INDEX idx_message_task_create ON message;
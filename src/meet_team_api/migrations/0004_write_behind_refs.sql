@@ -0,0 +1,10 @@
+-- The write-behind flusher inserts journaled commits and messages with their
+-- ref, so a batch replayed after a crash skips the rows already inserted:
+-- INSERT IGNORE ... (client_ref). NULL for the rows inserted directly.
+ALTER TABLE `commit`
+    ADD COLUMN client_ref CHAR(32) NULL,
+    ADD UNIQUE INDEX uq_commit_client_ref (client_ref);
+
+ALTER TABLE message
+    ADD COLUMN client_ref CHAR(32) NULL,
+    ADD UNIQUE INDEX uq_message_client_ref (client_ref);
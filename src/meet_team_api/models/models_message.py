@@ -4,5 +4,6 @@ from pydantic import BaseModel, Field
 class MessageCreateRequest(BaseModel):
     """This model is to represent the request of message creation"""
     task_id: int
-    creator_id: int
+    # ignored: the creator is the authenticated user
+    creator_id: int | None = Field(default=None)
     description: str | None = Field(default=None)
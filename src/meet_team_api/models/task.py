@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# The most tasks one bulk request may create
+MAX_BULK_TASKS = 500
 
 
 class TaskCreateModel(BaseModel):
@@ -6,3 +9,9 @@ class TaskCreateModel(BaseModel):
     description: str | None
     assignee: int | None
     reviewer: int | None
+
+
+class TaskBulkCreateModel(BaseModel):
+    """The tasks of a bulk creation, created in this order"""
+
+    tasks: list[TaskCreateModel] = Field(min_length=1, max_length=MAX_BULK_TASKS)
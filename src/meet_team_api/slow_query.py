@@ -0,0 +1,162 @@
+"""
+This module keeps the slow-query log.
+
+Every query slower than `MEET_TEAM_SLOW_QUERY_MS` is logged with its
+normalized SQL, the shape of its parameters and the handler that ran it, and
+kept in a bounded per-handler table of its slowest statements. The plan of
+each new slow statement is captured with `EXPLAIN FORMAT=JSON` on a
+background thread, off the request's path, and served with it by
+`GET /admin/slow-queries`.
+"""
+
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from .db import pool
+
+SLOW_QUERY_MS = float(os.getenv("MEET_TEAM_SLOW_QUERY_MS", "200"))
+SLOW_QUERY_TOP_N = int(os.getenv("MEET_TEAM_SLOW_QUERY_TOP_N", "20"))
+
+logger = logging.getLogger(__name__)
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.I)
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"(?<![\w`])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%(?:\([^)]+\))?s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+", re.I)
+
+
+def normalize(sql: str) -> str:
+    """
+    The query without its values, so its runs group together: literals and
+    placeholders become `?` and lists of them `(...)`.
+    """
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _VALUES_LIST.sub(r"\1, ...", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return " ".join(sql.split())
+
+
+def params_shape(params: Any) -> str:
+    """The types of the parameters, never their values"""
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return (
+            "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+        )
+    types = [type(value).__name__ for value in params]
+    if len(types) > 8:
+        return f"({', '.join(types[:8])}, ... {len(types)} params)"
+    return f"({', '.join(types)})"
+
+
+class SlowQueryLog:
+    """
+    The slowest statements of each handler, at most `top_n` per handler.
+
+    Runs of the same normalized statement are merged: its count, its worst
+    and last durations, and the plan captured for its first slow run.
+    """
+
+    def __init__(
+        self, threshold_ms: float = SLOW_QUERY_MS, top_n: int = SLOW_QUERY_TOP_N
+    ):
+        self.threshold = threshold_ms / 1000
+        self.top_n = top_n
+        self._entries: dict[str, dict[str, dict]] = {}
+        self._lock = threading.Lock()
+        self._explainer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="meet_team_explain"
+        )
+
+    def observe(
+        self,
+        handler: str,
+        operation: str,
+        params: Any,
+        seconds: float,
+        many: bool = False,
+    ):
+        """Record a query if it was slow; called by the instrumented cursor"""
+        if self.threshold <= 0 or seconds < self.threshold:
+            return
+        sql = normalize(operation)
+        shape = f"[{len(params)} x ...]" if many else params_shape(params)
+        logger.warning(
+            "slow query %.1fms in %s: %s params=%s", seconds * 1000, handler, sql, shape
+        )
+        with self._lock:
+            statements = self._entries.setdefault(handler, {})
+            entry = statements.get(sql)
+            new = entry is None
+            if new:
+                entry = statements[sql] = {
+                    "sql": sql,
+                    "params": shape,
+                    "count": 0,
+                    "max_ms": 0.0,
+                    "plan": None,
+                }
+            entry["count"] += 1
+            entry["last_ms"] = round(seconds * 1000, 3)
+            entry["max_ms"] = max(entry["max_ms"], entry["last_ms"])
+            entry["last_at"] = time.time()
+            self._evict(statements)
+            # one plan per statement, and none for one already evicted
+            explain = (
+                new
+                and not many
+                and sql in statements
+                and _EXPLAINABLE.match(operation) is not None
+            )
+        if explain:
+            self._explainer.submit(self._explain, entry, operation, params)
+
+    def _evict(self, statements: dict[str, dict]):
+        while len(statements) > self.top_n:
+            fastest = min(statements.values(), key=lambda e: e["max_ms"])
+            del statements[fastest["sql"]]
+
+    @staticmethod
+    def _explain(entry: dict, operation: str, params: Any):
+        # a raw cursor: the EXPLAIN itself is neither timed nor logged
+        try:
+            with pool.acquire() as conn:
+                cur = conn.cursor()
+                cur.execute(f"EXPLAIN FORMAT=JSON {operation}", params)
+                entry["plan"] = json.loads(cur.fetchone()[0])
+        except Exception as e:  # pylint: disable=broad-except
+            entry["plan"] = {"error": str(e)}
+
+    def top(self, handler: str | None = None) -> dict[str, list[dict]]:
+        """The slow statements per handler, slowest first"""
+        with self._lock:
+            handlers = [handler] if handler is not None else list(self._entries)
+            return {
+                name: heapq.nlargest(
+                    self.top_n,
+                    (dict(e) for e in self._entries.get(name, {}).values()),
+                    key=lambda e: e["max_ms"],
+                )
+                for name in handlers
+                if name in self._entries
+            }
+
+    def clear(self):
+        """Forget every statement"""
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog()
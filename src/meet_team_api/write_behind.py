@@ -0,0 +1,266 @@
+"""
+This module is the write-behind mode of the commit and message inserts.
+
+With `MEET_TEAM_WRITE_BEHIND=1`, `POST /commit/` and `POST /message/` check
+the user's access, append the new row to a SQLite journal and answer `202`
+with the row's `ref`, instead of waiting on MySQL. A background flusher takes
+the journal in order, in batches: each handler inserts the rows of its kind
+with one multi-row `INSERT IGNORE` and coalesces their side effects (e.g.
+one task status update per task), all in one transaction, and the entries
+are dropped from the journal once it is committed.
+
+The journal outlives the process: the flusher starts with whatever a crash
+left in it. Every row carries its `ref` into the `client_ref` column, unique
+in MySQL, so a batch committed but not yet dropped from the journal is not
+inserted twice when replayed.
+
+The rows reach MySQL, and so the reads, up to
+`MEET_TEAM_WRITE_BEHIND_INTERVAL` seconds after being acknowledged.
+
+Each worker needs its own journal. The `{slot}` in the journal path is the
+lowest number no live process holds the lock of, so a restarted worker takes
+over the journal a crashed one left, whatever the number of workers.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Callable
+
+from .db import UnitOfWork, transactional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows, a single worker then
+    fcntl = None
+
+WRITE_BEHIND = os.getenv("MEET_TEAM_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_JOURNAL = os.getenv(
+    "MEET_TEAM_WRITE_BEHIND_JOURNAL", "write_behind.{slot}.db"
+)
+# Seconds between two flushes, and the most entries flushed at once
+WRITE_BEHIND_INTERVAL = float(os.getenv("MEET_TEAM_WRITE_BEHIND_INTERVAL", "0.2"))
+WRITE_BEHIND_BATCH = int(os.getenv("MEET_TEAM_WRITE_BEHIND_BATCH", "500"))
+
+# Inserts the payloads of one kind within the flush transaction
+Flusher = Callable[[UnitOfWork, list[dict]], None]
+
+logger = logging.getLogger(__name__)
+
+
+def _claim(path: str):
+    """Lock `path` for this process, None if another process holds it"""
+    lock = open(f"{path}.lock", "a", encoding="utf-8")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+    return lock
+
+
+class Journal:
+    """
+    The entries waiting for MySQL, in a SQLite file.
+
+    Each append is its own SQLite transaction, synced to disk before the
+    request is acknowledged. The file is locked while open: a path without
+    `{slot}` held by another process is an error.
+    """
+
+    def __init__(self, path: str = WRITE_BEHIND_JOURNAL):
+        self.pattern = path
+        self.path: str | None = None
+        self._conn: sqlite3.Connection | None = None
+        self._file_lock = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if "{slot}" not in self.pattern:
+            self._file_lock = _claim(self.pattern)
+            if self._file_lock is None:
+                raise ValueError(
+                    f"The write-behind journal {self.pattern} is used by another "
+                    "process, put `{slot}` in its path to give each worker its own"
+                )
+            self.path = self.pattern
+            return
+        slot = 0
+        while self._file_lock is None:
+            self.path = self.pattern.format(slot=slot)
+            self._file_lock = _claim(self.path)
+            slot += 1
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self._file_lock is None:
+                self._open()
+            conn = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL
+                )
+                """,
+            )
+            self._conn = conn
+        return self._conn
+
+    def append(self, kind: str, payload: dict):
+        """Add an entry at the end of the journal"""
+        with self._lock:
+            self._db().execute(
+                "INSERT INTO entries (kind, payload) VALUES (?, ?)",
+                (kind, json.dumps(payload)),
+            )
+
+    def pending(self, limit: int) -> list[tuple[int, str, dict]]:
+        """The oldest entries, as (seq, kind, payload)"""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT seq, kind, payload FROM entries ORDER BY seq LIMIT ?",
+                (limit,),
+            )
+            return [(seq, kind, json.loads(payload)) for seq, kind, payload in rows]
+
+    def remove(self, last_seq: int):
+        """Drop the entries up to `last_seq`, once they are in MySQL"""
+        with self._lock:
+            self._db().execute("DELETE FROM entries WHERE seq <= ?", (last_seq,))
+
+    def size(self) -> int:
+        """The number of entries waiting"""
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        """Close the SQLite file, the entries stay in it"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            if self._file_lock is not None:
+                self._file_lock.close()
+                self._file_lock = None
+
+
+@transactional
+def _flush_batch(
+    uow: UnitOfWork, flushers: dict[str, Flusher], entries: list[tuple[int, str, dict]]
+):
+    by_kind: dict[str, list[dict]] = {}
+    for _, kind, payload in entries:
+        by_kind.setdefault(kind, []).append(payload)
+    for kind, payloads in by_kind.items():
+        flushers[kind](uow, payloads)
+
+
+class WriteBehind:
+    """The journal of the deferred inserts and its flusher thread"""
+
+    def __init__(
+        self,
+        enabled: bool = WRITE_BEHIND,
+        path: str = WRITE_BEHIND_JOURNAL,
+        interval: float = WRITE_BEHIND_INTERVAL,
+        batch: int = WRITE_BEHIND_BATCH,
+    ):
+        self.enabled = enabled
+        self.interval = interval
+        self.batch = batch
+        self.journal = Journal(path)
+        self._flushers: dict[str, Flusher] = {}
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stats = {"enqueued": 0, "flushed": 0, "batches": 0, "failures": 0}
+        self._stats_lock = threading.Lock()
+
+    def register(self, kind: str, flush: Flusher):
+        """Set the function inserting the entries of a kind, at import time"""
+        self._flushers[kind] = flush
+
+    def enqueue(self, kind: str, payload: dict) -> str:
+        """Journal a row to insert, returns the `ref` it will be inserted with"""
+        if kind not in self._flushers:
+            raise ValueError(f"No write-behind flusher for {kind!r}")
+        ref = uuid.uuid4().hex
+        self.journal.append(kind, {**payload, "ref": ref})
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+            backlog = self._stats["enqueued"] - self._stats["flushed"]
+        if backlog >= self.batch:
+            self._wake.set()
+        return ref
+
+    def flush(self) -> int:
+        """Insert the next batch of the journal, returns its number of entries"""
+        with self._flush_lock:
+            entries = self.journal.pending(self.batch)
+            if not entries:
+                return 0
+            _flush_batch(self._flushers, entries)
+            self.journal.remove(entries[-1][0])
+        with self._stats_lock:
+            self._stats["flushed"] += len(entries)
+            self._stats["batches"] += 1
+        return len(entries)
+
+    def _drain(self):
+        try:
+            while self.flush() >= self.batch:
+                pass
+        except Exception:  # pylint: disable=broad-except
+            with self._stats_lock:
+                self._stats["failures"] += 1
+            logger.exception("write-behind flush failed")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._drain()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        """Replay what the journal holds and keep flushing it, when enabled"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="meet_team_write_behind", daemon=True
+        )
+        self._thread.start()
+
+    def close(self):
+        """Stop the flusher after a last flush; what is left is replayed later"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self._drain()
+        self.journal.close()
+
+    def stats(self) -> dict[str, int | bool | str]:
+        """A snapshot of the counters, used by the stats endpoint"""
+        with self._stats_lock:
+            stats = {"enabled": self.enabled, **self._stats}
+        if self.enabled:
+            stats["pending"] = self.journal.size()
+            stats["journal"] = self.journal.path
+        return stats
+
+
+write_behind = WriteBehind()
@@ -0,0 +1,102 @@
+"""Shared fixtures, none of them needs a MySQL server"""
+
+from contextlib import contextmanager
+
+import pytest
+from mysql.connector.connection import MySQLConnection
+from mysql.connector.conversion import MySQLConverter
+from mysql.connector.cursor import MySQLCursorDict
+
+
+class StubCursor(MySQLCursorDict):
+    """A real dictionary cursor whose results are the rows queued on its connection"""
+
+    def fetchone(self):
+        return self._connection.rows.pop(0) if self._connection.rows else None
+
+    def fetchall(self):
+        rows, self._connection.rows = self._connection.rows, []
+        return rows
+
+
+class StubConnection(MySQLConnection):
+    """
+    A `mysql.connector` connection without a server.
+
+    The cursor binds the parameters exactly as it would for MySQL and the
+    resulting statements are recorded in `sent`; `fail` makes the next
+    statement containing a fragment raise instead. The cursor reads `rows`,
+    which each SELECT replaces with the next of `results` if any is queued,
+    and each INSERT takes the next of `insert_ids` as its `lastrowid`.
+    """
+
+    def __init__(self, rows: list[dict] | None = None):
+        super().__init__()
+        self._sql_mode = ""
+        self.converter = MySQLConverter("utf8mb4", True)
+        self.sent: list[str] = []
+        self.rows = list(rows or [])
+        self.results: list[list[dict]] = []
+        self.insert_ids: list[int] = []
+        self.commits = 0
+        self.rollbacks = 0
+        self._failures: list[tuple[str, Exception]] = []
+
+    def fail(self, fragment: str, error: Exception):
+        """Raise `error` on the next statement containing `fragment`"""
+        self._failures.append((fragment, error))
+
+    def cmd_query(self, query, *args, **kwargs):
+        query = query.decode() if isinstance(query, bytes) else query
+        for i, (fragment, error) in enumerate(self._failures):
+            if fragment in query:
+                del self._failures[i]
+                raise error
+        self.sent.append(query)
+        verb = query.split(None, 1)[0].upper() if query.strip() else ""
+        if verb in ("SELECT", "WITH") and self.results:
+            self.rows = list(self.results.pop(0))
+        insert_id = 0
+        if verb == "INSERT" and self.insert_ids:
+            insert_id = self.insert_ids.pop(0)
+        return {"affected_rows": 0, "insert_id": insert_id, "warning_count": 0}
+
+    def cursor(self, *args, **kwargs):
+        return StubCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def stub_connection(monkeypatch):
+    """
+    Patch `get_connection` of the given modules to hand out one
+    `StubConnection`, returned with its rows set by the test.
+    """
+
+    def install(*modules, rows: list[dict] | None = None) -> StubConnection:
+        conn = StubConnection(rows)
+
+        @contextmanager
+        def get_connection():
+            yield conn
+
+        for module in modules:
+            monkeypatch.setattr(module, "get_connection", get_connection)
+        return conn
+
+    return install
+
+
+@pytest.fixture
+def client():
+    """The app over HTTP, without its lifespan: no background thread runs"""
+    from fastapi.testclient import TestClient  # pylint: disable=import-outside-toplevel
+
+    from src.meet_team_api.main import app  # pylint: disable=import-outside-toplevel
+
+    return TestClient(app)
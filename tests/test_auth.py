@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import jwt
+import pytest
+
+from src.meet_team_api.api.utils import auth
+from src.meet_team_api.api.utils.auth import TokenCache
+
+SECRET = "s" * 32
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(auth, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_tokens_expire_after_the_ttl(clock):
+    cache = TokenCache(maxsize=4, ttl=300)
+    cache.put("a", 1)
+    clock.now += 299
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+
+
+def test_tokens_expire_with_their_exp(clock):
+    cache = TokenCache(maxsize=4, ttl=300)
+    cache.put("a", 1, exp=clock.now + 10)
+    clock.now += 10
+    assert cache.get("a") is None
+
+
+def test_tokens_are_evicted_least_recently_used(clock):
+    cache = TokenCache(maxsize=2, ttl=300)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert [cache.get(token) for token in "abc"] == [1, None, 3]
+
+
+def test_decode_token_verifies_once(clock, monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth, "token_cache", TokenCache(maxsize=4, ttl=300))
+    token = auth.issue_token(7)
+    assert auth.decode_token(token) == 7
+
+    monkeypatch.setattr(auth, "JWT_SECRET", "r" * 32)
+    assert auth.decode_token(token) == 7
+    clock.now += 300
+    with pytest.raises(jwt.InvalidSignatureError):
+        auth.decode_token(token)
+
+
+def test_decode_token_needs_a_user_id(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", SECRET)
+    token = jwt.encode({"name": "x"}, SECRET, algorithm=auth.JWT_ALGORITHM)
+    with pytest.raises(jwt.InvalidTokenError, match="no user id"):
+        auth.decode_token(token)
@@ -0,0 +1,14 @@
+import pytest
+
+from bench import micro
+
+
+@pytest.mark.parametrize("name", list(micro.SCENARIOS))
+def test_scenario_runs(name):
+    report = micro.run([name], scale=0.01)
+    assert report[name]
+
+
+def test_unknown_scenario():
+    with pytest.raises(ValueError, match="Unknown scenarios: nope"):
+        micro.run(["nope"])
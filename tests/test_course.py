@@ -0,0 +1,307 @@
+import itertools
+import json
+import tracemalloc
+from contextlib import contextmanager
+
+import mysql.connector
+import pytest
+from mysql.connector import errorcode
+
+from src.meet_team_api.api.handlers import course
+from src.meet_team_api.api.handlers.course import (
+    CatalogSnapshot,
+    CourseCatalog,
+    CourseSearchIndex,
+)
+
+from .conftest import StubConnection
+
+ROWS = [
+    {"id": 1, "name": "Database Systems", "year": 2024, "semester": 1},
+    {"id": 2, "name": "Data Structures", "year": 2024, "semester": 2},
+]
+
+
+def rows(*ids):
+    return [dict(row, description=None) for row in ROWS if row["id"] in ids]
+
+
+@pytest.fixture
+def catalog(stub_connection, monkeypatch):
+    """A catalog over a primary with both courses and a replica missing one"""
+    stub_connection(course, rows=rows(1, 2))
+
+    @contextmanager
+    def get_read_connection():
+        yield StubConnection(rows(1))
+
+    monkeypatch.setattr(course, "get_read_connection", get_read_connection)
+    return CourseCatalog(refresh=30)
+
+
+def test_rebuild_after_a_write_reads_the_primary(catalog):
+    catalog.invalidate()
+    assert sorted(catalog.rebuild().courses) == [1, 2]
+
+
+def test_periodic_rebuild_reads_a_replica(catalog):
+    assert sorted(catalog.rebuild().courses) == [1]
+
+
+@pytest.fixture
+def snapshot():
+    courses = [
+        {"id": 3, "name": "Data Structures", "year": 2024, "semester": 1},
+        {"id": 1, "name": "Database Systems", "year": 2024, "semester": 2},
+        {"id": 2, "name": "Construction Management", "year": 2023, "semester": 1},
+        {"id": 4, "name": "Discrete Mathematics", "year": 2024, "semester": 1},
+    ]
+    return CatalogSnapshot([dict(row, description=None) for row in courses])
+
+
+def ids(courses):
+    return [course["id"] for course in courses]
+
+
+@pytest.mark.parametrize(
+    "year, semester, after_id, offset, expected",
+    [
+        (None, None, None, 0, [1, 2]),
+        (None, None, None, 2, [3, 4]),
+        (None, None, 2, 0, [3, 4]),
+        (2024, None, None, 0, [1, 3]),
+        (2024, "1", 3, 0, [4]),
+        (None, "1", None, 1, [3, 4]),
+        (2022, None, None, 0, []),
+    ],
+)
+def test_snapshot_page(snapshot, year, semester, after_id, offset, expected):
+    assert ids(snapshot.page(year, semester, after_id, offset, 2)) == expected
+
+
+def test_snapshot_page_hides_the_description(snapshot):
+    assert snapshot.page(None, None, None, 0, 1) == [
+        {"id": 1, "name": "Database Systems", "year": 2024, "semester": 2}
+    ]
+
+
+@pytest.mark.parametrize(
+    "term, year, semester, expected",
+    [
+        ("struct", None, None, [3, 2]),
+        ("struct", 2024, None, [3]),
+        ("data", None, "2", [1]),
+        ("base", None, None, [1]),
+        ("math", None, None, [4]),
+        ("data math", None, None, []),
+    ],
+)
+def test_snapshot_search(snapshot, term, year, semester, expected):
+    assert ids(snapshot.search(term, year, semester)) == expected
+
+
+@pytest.mark.parametrize("trigram, sent", [(False, 1), (True, 0)])
+def test_search_backend(snapshot, monkeypatch, trigram, sent):
+    conn = StubConnection([{"id": 3, "name": "Data Structures"}])
+
+    @contextmanager
+    def get_read_connection():
+        yield conn
+
+    catalog = CourseCatalog(refresh=30)
+    catalog._snapshot = snapshot  # pylint: disable=protected-access
+    monkeypatch.setattr(course, "course_catalog", catalog)
+    monkeypatch.setattr(course.course_search_index, "enabled", trigram)
+    monkeypatch.setattr(course, "get_read_connection", get_read_connection)
+
+    page, _ = course.find_all.__wrapped__(0, 10, "struct")
+
+    assert ids(page) == ([3, 2] if trigram else [3])
+    assert len(conn.sent) == sent
+    assert all("AGAINST ('+struct*' IN BOOLEAN MODE)" in sql for sql in conn.sent)
+
+
+@pytest.mark.parametrize(
+    "term, query",
+    [
+        ("data str", "+data +str*"),
+        ("  C++ intro! ", "+C +intro*"),
+        ("base", "+base*"),
+        ("+-*", ""),
+    ],
+)
+def test_boolean_query(term, query):
+    assert course._boolean_query(term) == query
+
+
+class NoFulltext(StubConnection):
+    """A database without the FULLTEXT index"""
+
+    def cmd_query(self, query, *args, **kwargs):
+        if b"MATCH" in query:
+            raise mysql.connector.ProgrammingError(
+                errno=errorcode.ER_FT_MATCHING_KEY_NOT_FOUND
+            )
+        return super().cmd_query(query, *args, **kwargs)
+
+
+def test_search_falls_back_to_trigrams(monkeypatch):
+    conn = NoFulltext(rows(1, 2))
+
+    @contextmanager
+    def get_read_connection():
+        yield conn
+
+    monkeypatch.setattr(course, "course_catalog", CourseCatalog(refresh=0))
+    monkeypatch.setattr(course, "course_search_index", CourseSearchIndex())
+    monkeypatch.setattr(course, "get_read_connection", get_read_connection)
+
+    page, _ = course.find_all.__wrapped__(0, 10, "struct", year=2024)
+
+    assert ids(page) == [2]
+    assert course.course_search_index.enabled
+    assert "FROM course" in conn.sent[-1]
+
+
+@pytest.fixture
+def keyset(monkeypatch):
+    """The catalog off, the pages read from a stub replica"""
+    conn = StubConnection()
+
+    @contextmanager
+    def get_read_connection():
+        yield conn
+
+    monkeypatch.setattr(course, "course_catalog", CourseCatalog(refresh=0))
+    monkeypatch.setattr(course, "get_read_connection", get_read_connection)
+    return conn
+
+
+def sql(statement):
+    return " ".join(statement.split())
+
+
+def test_keyset_pages(keyset):
+    keyset.rows = rows(1, 2) + [dict(ROWS[0], id=3)]
+    page, cursor = course.find_all.__wrapped__(0, 2, year=2024)
+    assert ids(page) == [1, 2]
+    assert sql(keyset.sent[-1]).endswith(
+        "WHERE year = 2024 ORDER BY id LIMIT 3 OFFSET 0"
+    )
+
+    keyset.rows = [dict(ROWS[0], id=3)]
+    page, cursor = course.find_all.__wrapped__(0, 2, cursor=cursor, year=2024)
+    assert ids(page) == [3]
+    assert cursor is None
+    assert sql(keyset.sent[-1]).endswith(
+        "WHERE id > 2 AND year = 2024 ORDER BY id LIMIT 3"
+    )
+
+
+def test_keyset_empty_last_page(keyset):
+    cursor = course._encode_cursor(id=9)
+    assert course.find_all.__wrapped__(0, 2, cursor=cursor) == ([], None)
+    assert course.find_all.__wrapped__(40, 2) == ([], None)
+
+
+def test_keyset_limit_zero_has_no_cursor(keyset):
+    keyset.rows = rows(1)
+    assert course.find_all.__wrapped__(0, 0) == ([], None)
+
+
+@pytest.mark.parametrize(
+    "query", ["limit=0", "limit=-1", "limit=101", "offset=-1", "cursor=nope"]
+)
+def test_find_all_rejects_bad_paging(client, keyset, query):
+    assert client.get(f"/course?{query}").status_code in (400, 422)
+    assert not keyset.sent
+
+
+def test_find_all_route(client, keyset):
+    keyset.rows = rows(1, 2)
+    body = client.get("/course?limit=1").json()["data"]
+    assert ids(body["courses"]) == [1]
+    assert course._decode_cursor(body["meta"]["next_cursor"], "id") == 1
+
+
+class LazyCursor:
+    """An unbuffered result set of `rows` rows, made up as they are fetched"""
+
+    def __init__(self, rows: int):
+        self.column_names = ("id", "task_id", "title")
+        self._rows = ((i, i // 10, f"commit {i}") for i in range(rows))
+        self.fetched = 0
+
+    def execute(self, operation, params):
+        pass
+
+    def fetchmany(self, size):
+        batch = list(itertools.islice(self._rows, size))
+        self.fetched += len(batch)
+        return batch
+
+    def fetchall(self):
+        raise AssertionError("the export buffered a whole result set")
+
+
+class LazyConnection:
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.cursors: list[LazyCursor] = []
+        self.discarded = False
+
+    def cursor(self):
+        self.cursors.append(LazyCursor(self.rows))
+        return self.cursors[-1]
+
+    def discard(self):
+        self.discarded = True
+
+
+@pytest.fixture
+def lazy(monkeypatch):
+    conn = LazyConnection(200_000)
+
+    @contextmanager
+    def get_connection():
+        yield conn
+
+    monkeypatch.setattr(course, "get_connection", get_connection)
+    return conn
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_export_streams_in_bounded_memory(lazy, fmt):
+    tracemalloc.start()
+    try:
+        lines = 0
+        for chunk in course.export(1, ["commits"], fmt):
+            lines += chunk.count(b"\n")
+            assert lazy.cursors[-1].fetched <= lines + course.EXPORT_CHUNK_SIZE
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert lines == 200_000 + (fmt == "csv")
+    # the whole export is about 8 MB, a chunk about 50 KB
+    assert peak < 2_000_000
+    assert not lazy.discarded
+
+
+def test_export_tags_the_records_of_several_resources(lazy):
+    lazy.rows = 2
+    chunks = list(course.export(1, ["tasks", "commits"], "ndjson"))
+    assert [json.loads(line)["type"] for line in b"".join(chunks).splitlines()] == [
+        "tasks",
+        "tasks",
+        "commits",
+        "commits",
+    ]
+
+
+def test_an_abandoned_export_discards_its_connection(lazy):
+    stream = course.export(1, ["commits"], "ndjson")
+    next(stream)
+    stream.close()
+    assert lazy.discarded
+    assert lazy.cursors[-1].fetched == course.EXPORT_CHUNK_SIZE
@@ -0,0 +1,430 @@
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import mysql.connector
+import pytest
+from mysql.connector import errorcode
+
+from src.meet_team_api import db
+
+
+class PreparedCursor:
+    def __init__(self, error: int | None = None):
+        self.error = error
+        self.executed = []
+        self.closed = False
+
+    def execute(self, operation, params):
+        if self.error is not None:
+            raise mysql.connector.Error(errno=self.error)
+        self.executed.append((operation, params))
+
+    def close(self):
+        self.closed = True
+
+
+class RawConnection:
+    def __init__(self, error: int | None = None):
+        self.error = error
+        self.cursors = []
+
+    def cursor(self, **kwargs):
+        assert kwargs == {"prepared": True, "dictionary": True}
+        self.cursors.append(PreparedCursor(self.error))
+        return self.cursors[-1]
+
+
+@pytest.fixture(autouse=True)
+def fresh_sightings(monkeypatch):
+    monkeypatch.setattr(db, "statement_sightings", db.StatementSightings())
+
+
+@pytest.mark.parametrize(
+    "operation, params, eligible",
+    [
+        ("SELECT * FROM task WHERE id = %s", (1,), True),
+        ("  update task SET status = %s WHERE id = %s", ["Done", 1], True),
+        ("SELECT * FROM task", None, False),
+        ("SELECT * FROM task", (), False),
+        ("SELECT * FROM task WHERE id = %(id)s", {"id": 1}, False),
+        ("SELECT * FROM task WHERE id = %s AND group_id = %s", (1,), False),
+        ("SHOW TABLES LIKE %s", ("task",), False),
+        ("CALL refresh(%s)", (1,), False),
+    ],
+)
+def test_eligible(operation, params, eligible):
+    cache = db.StatementCache(RawConnection(), size=4)
+    assert cache._eligible(operation, params) is eligible
+
+
+def test_eligible_needs_a_cache():
+    cache = db.StatementCache(RawConnection(), size=0)
+    assert not cache._eligible("SELECT * FROM task WHERE id = %s", (1,))
+
+
+def test_prepares_hot_statements_only():
+    raw = RawConnection()
+    cache = db.StatementCache(raw, size=4, prepare_after=3)
+    sql = "SELECT * FROM task WHERE id = %s"
+
+    assert cache.execute(sql, (1,)) is None
+    assert cache.execute(sql, (2,)) is None
+    cursor = cache.execute(sql, (3,))
+    assert cursor is raw.cursors[0]
+    assert cache.execute(sql, (4,)) is cursor
+    assert len(raw.cursors) == 1
+    # the very text object it was prepared with, so it isn't prepared again
+    assert all(text is sql for text, _ in cursor.executed)
+
+
+def test_runtime_built_lists_stay_on_the_text_protocol():
+    raw = RawConnection()
+    cache = db.StatementCache(raw, size=4, prepare_after=3)
+    for length in range(1, 10):
+        sql = f"SELECT id FROM user WHERE id IN ({', '.join(['%s'] * length)})"
+        assert cache.execute(sql, list(range(length))) is None
+    assert not raw.cursors
+
+
+def test_evicts_the_least_recently_used():
+    raw = RawConnection()
+    cache = db.StatementCache(raw, size=2, prepare_after=1)
+    first, second, third = (f"SELECT {i} FROM task WHERE id = %s" for i in range(3))
+
+    cache.execute(first, (1,))
+    cache.execute(second, (1,))
+    cache.execute(first, (1,))
+    cache.execute(third, (1,))
+
+    assert raw.cursors[1].closed
+    assert not raw.cursors[0].closed
+    assert list(cache._cursors) == [first, third]
+
+
+def test_falls_back_to_text_when_it_cant_prepare():
+    raw = RawConnection(error=1295)
+    cache = db.StatementCache(raw, size=2, prepare_after=1)
+    sql = "SELECT * FROM task WHERE id = %s"
+
+    assert cache.execute(sql, (1,)) is None
+    assert raw.cursors[0].closed
+    assert not cache._eligible(sql, (1,))
+
+
+def test_other_errors_are_raised():
+    cache = db.StatementCache(RawConnection(error=1146), size=2, prepare_after=1)
+    with pytest.raises(mysql.connector.Error):
+        cache.execute("SELECT * FROM nope WHERE id = %s", (1,))
+
+
+def test_sightings_forget_the_oldest():
+    sightings = db.StatementSightings(size=2)
+    assert sightings.seen("a") == 1
+    assert sightings.seen("a") == 2
+    sightings.seen("b")
+    sightings.seen("c")
+    assert sightings.seen("a") == 1
+
+
+class StatusCursor:
+    def __init__(self, errors: dict[str, int], status: dict | None):
+        self.errors = errors
+        self.status = status
+        self.executed = []
+
+    def execute(self, operation):
+        self.executed.append(operation)
+        if operation in self.errors:
+            raise mysql.connector.ProgrammingError(errno=self.errors[operation])
+
+    def fetchone(self):
+        return self.status
+
+
+class StatusPool:
+    def __init__(self, cursor: StatusCursor):
+        self._cursor = cursor
+
+    @contextmanager
+    def acquire(self):
+        yield self
+
+    def cursor(self, dictionary=False):
+        return self._cursor
+
+
+def check(errors=None, status=None, max_lag=5):
+    replica = db.Replica("replica:3307", size=1)
+    cursor = StatusCursor(errors or {}, status)
+    replica.pool = StatusPool(cursor)
+    replica.check(max_lag)
+    return replica, cursor.executed
+
+
+def test_replica_check_measures_the_lag():
+    replica, executed = check(status={"Seconds_Behind_Source": 2})
+    assert (replica.healthy, replica.lag, replica.error) == (True, 2.0, None)
+    assert executed == ["SHOW REPLICA STATUS"]
+
+
+def test_replica_check_falls_back_to_slave_status_on_old_servers():
+    replica, executed = check(
+        errors={"SHOW REPLICA STATUS": errorcode.ER_PARSE_ERROR},
+        status={"Seconds_Behind_Master": 9},
+    )
+    assert executed == ["SHOW REPLICA STATUS", "SHOW SLAVE STATUS"]
+    assert (replica.healthy, replica.error) == (False, "9s behind the primary")
+
+
+def test_replica_check_without_the_grant_marks_it_down(caplog):
+    replica, executed = check(
+        errors={"SHOW REPLICA STATUS": errorcode.ER_SPECIFIC_ACCESS_DENIED_ERROR}
+    )
+    assert executed == ["SHOW REPLICA STATUS"]
+    assert not replica.healthy
+    assert "replica:3307 marked down" in caplog.text
+
+
+def test_replica_check_stopped_replication():
+    replica, _ = check(status={"Seconds_Behind_Source": None})
+    assert (replica.healthy, replica.error) == (False, "replication stopped")
+
+
+class FailingPool:
+    def __init__(self, error: Exception):
+        self.error = error
+
+    def acquire(self):
+        raise self.error
+
+
+@pytest.fixture
+def read_from(monkeypatch):
+    """A replica whose pool fails with the given error, and a primary"""
+    primary = object()
+    monkeypatch.setattr(db, "pool", SimpleNamespace(acquire=lambda: primary))
+
+    def read_from(error):
+        replicas = db.ReplicaSet(["replica:3307"])
+        replicas.replicas[0].pool = FailingPool(error)
+        monkeypatch.setattr(db, "replicas", replicas)
+        assert db.get_read_connection() is primary
+        return replicas.replicas[0]
+
+    return read_from
+
+
+def test_a_saturated_replica_stays_in_rotation(read_from):
+    replica = read_from(db.PoolTimeoutError("No database connection available"))
+    assert (replica.healthy, replica.error) == (True, None)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        mysql.connector.InterfaceError(errno=errorcode.CR_CONN_HOST_ERROR),
+        ConnectionRefusedError(111, "Connection refused"),
+    ],
+)
+def test_an_unreachable_replica_is_marked_down(read_from, error):
+    replica = read_from(error)
+    assert not replica.healthy
+
+
+def test_a_saturated_replica_keeps_its_health_check():
+    replica = db.Replica("replica:3307", size=1)
+    replica.pool = FailingPool(db.PoolTimeoutError("No database connection"))
+    replica.check(5)
+    assert (replica.healthy, replica.error) == (True, None)
+
+
+def deadlock():
+    return mysql.connector.DatabaseError(errno=errorcode.ER_LOCK_DEADLOCK)
+
+
+def retries(handler):
+    return db.db_transaction_retries._series.get((handler,), 0)
+
+
+@pytest.fixture
+def unit_of_work(stub_connection, monkeypatch):
+    """A stub primary, the `transactional` backoff recorded instead of slept"""
+    sleeps = []
+    monkeypatch.setattr(db.time, "sleep", sleeps.append)
+    monkeypatch.setattr(db, "MYSQL_TX_ATTEMPTS", 3)
+    conn = stub_connection(db)
+    conn.sleeps = sleeps
+    return conn
+
+
+def test_transactional_reruns_a_deadlocked_unit(unit_of_work):
+    calls, done = [], []
+
+    @db.transactional
+    def rename(uow, task_id, name):
+        calls.append(task_id)
+        uow.after_commit(done.append, task_id)
+        uow.cur.execute("UPDATE task SET name = %s WHERE id = %s", (name, task_id))
+        return task_id
+
+    before = retries("test_db.rename")
+    unit_of_work.fail("UPDATE task", deadlock())
+
+    assert rename(7, "x") == 7
+    assert calls == [7, 7]
+    assert done == [7]
+    assert (unit_of_work.rollbacks, unit_of_work.commits) == (1, 1)
+    assert unit_of_work.sent == ["UPDATE task SET name = 'x' WHERE id = 7"]
+    assert len(unit_of_work.sleeps) == 1
+    assert retries("test_db.rename") == before + 1
+
+
+def test_transactional_gives_up_after_the_last_attempt(unit_of_work):
+    done = []
+
+    @db.transactional
+    def close(uow):
+        uow.after_commit(done.append, "closed")
+        uow.cur.execute("UPDATE task SET status = 'Done'")
+
+    before = retries("test_db.close")
+    for _ in range(3):
+        unit_of_work.fail("UPDATE task", deadlock())
+
+    with pytest.raises(mysql.connector.DatabaseError):
+        close()
+    assert (unit_of_work.rollbacks, unit_of_work.commits) == (3, 0)
+    assert not done
+    assert retries("test_db.close") == before + 2
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        mysql.connector.IntegrityError(errno=errorcode.ER_DUP_ENTRY),
+        ValueError("not a database error"),
+    ],
+)
+def test_transactional_rolls_back_other_errors_once(unit_of_work, error):
+    done = []
+
+    @db.transactional
+    def create(uow):
+        uow.after_commit(done.append, "created")
+        uow.cur.execute("INSERT INTO task (name) VALUES ('x')")
+
+    unit_of_work.fail("INSERT INTO task", error)
+
+    with pytest.raises(type(error)):
+        create()
+    assert (unit_of_work.rollbacks, unit_of_work.commits) == (1, 0)
+    assert not done
+    assert not unit_of_work.sleeps
+
+
+class Socket:
+    """A raw `mysql.connector` connection, as far as the pool looks at it"""
+
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.unread_result = False
+        self.in_transaction = False
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.closed = True
+
+    def consume_results(self):
+        raise mysql.connector.OperationalError("Lost connection to MySQL server")
+
+    def rollback(self):
+        self.in_transaction = False
+
+
+@pytest.fixture
+def sockets(monkeypatch):
+    """The raw connections opened by the pools, in order"""
+    opened = []
+
+    def connect(**kwargs):
+        opened.append(Socket())
+        return opened[-1]
+
+    monkeypatch.setattr(db.mysql.connector, "connect", connect)
+    return opened
+
+
+def test_pool_reuses_the_last_returned_connection(sockets):
+    pool = db.ConnectionPool(size=2)
+    first, second = pool.acquire(), pool.acquire()
+    first.close()
+    second.close()
+    assert pool.acquire().raw is sockets[1]
+    assert pool.stats()["created"] == 2
+
+
+def test_pool_blocks_while_full(sockets):
+    pool = db.ConnectionPool(size=1, timeout=5)
+    conn = pool.acquire()
+    borrowed = []
+    waiter = threading.Thread(target=lambda: borrowed.append(pool.acquire()))
+    waiter.start()
+    while pool.stats()["waiters"] == 0:
+        time.sleep(0.001)
+    assert not borrowed
+
+    conn.close()
+    waiter.join(1)
+    assert borrowed[0].raw is sockets[0]
+    assert len(sockets) == 1
+
+
+def test_pool_times_out_while_full(sockets):
+    pool = db.ConnectionPool(size=1, timeout=0.01)
+    pool.acquire()
+    with pytest.raises(db.PoolTimeoutError):
+        pool.acquire()
+    stats = pool.stats()
+    assert (stats["in_use"], stats["waiters"], stats["timeouts"]) == (1, 0, 1)
+
+
+def test_pool_discards_a_connection_broken_on_release(sockets):
+    pool = db.ConnectionPool(size=1)
+    with pool.acquire() as conn:
+        conn.raw.unread_result = True
+    assert sockets[0].closed
+    assert pool.stats()["discarded"] == 1
+
+    assert pool.acquire().raw is sockets[1]
+
+
+def test_pool_discards_an_abandoned_stream(sockets):
+    pool = db.ConnectionPool(size=1)
+    pool.acquire().discard()
+    assert sockets[0].closed
+    assert (pool.stats()["in_use"], pool.stats()["idle"]) == (0, 0)
+
+
+def test_pool_replaces_a_connection_dropped_while_idle(sockets):
+    pool = db.ConnectionPool(size=1)
+    pool.acquire().close()
+    sockets[0].connected = False
+    assert pool.acquire().raw is sockets[1]
+    assert sockets[0].closed
+
+
+def test_pool_frees_the_slot_when_connecting_fails(monkeypatch):
+    def connect(**kwargs):
+        raise mysql.connector.InterfaceError(errno=errorcode.CR_CONN_HOST_ERROR)
+
+    monkeypatch.setattr(db.mysql.connector, "connect", connect)
+    pool = db.ConnectionPool(size=1, timeout=0.01)
+    for _ in range(2):
+        with pytest.raises(mysql.connector.InterfaceError):
+            pool.acquire()
+    assert pool.stats()["in_use"] == 0
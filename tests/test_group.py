@@ -0,0 +1,45 @@
+import mysql.connector
+import pytest
+from mysql.connector import errorcode
+
+from src.meet_team_api.api.handlers import group
+from src.meet_team_api.api.utils import user_in_group
+from src.meet_team_api.api.utils.user_in_group import MembershipCache
+
+
+@pytest.fixture(autouse=True)
+def membership(monkeypatch):
+    cache = MembershipCache()
+    monkeypatch.setattr(group, "membership_cache", cache)
+    monkeypatch.setattr(user_in_group, "membership_cache", cache)
+    return cache
+
+
+def duplicate():
+    return mysql.connector.IntegrityError(
+        msg="Duplicate entry '3-7' for key 'uq_group_member_group_user'",
+        errno=errorcode.ER_DUP_ENTRY,
+    )
+
+
+def test_joining_twice_succeeds(stub_connection, membership):
+    conn = stub_connection(group)
+    membership.set_groups(7, frozenset())
+
+    assert group.join.__wrapped__(7, 3)
+    conn.fail("INSERT INTO group_member", duplicate())
+    assert group.join.__wrapped__(7, 3)
+
+    assert len(conn.sent) == 1
+    assert conn.commits == 2
+    assert membership.groups_of(7) is None
+
+
+def test_joining_a_missing_group_fails(stub_connection):
+    conn = stub_connection(group)
+    conn.fail(
+        "INSERT INTO group_member",
+        mysql.connector.IntegrityError(errno=errorcode.ER_NO_REFERENCED_ROW_2),
+    )
+    with pytest.raises(mysql.connector.IntegrityError):
+        group.join.__wrapped__(7, 404)
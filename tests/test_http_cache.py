@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+from src.meet_team_api.api.utils import http_cache
+from src.meet_team_api.api.utils.http_cache import (
+    ConditionalGet,
+    ResourceVersions,
+    ValidatorCache,
+    VersionedCache,
+)
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    versions = ResourceVersions(maxsize=2)
+    monkeypatch.setattr(http_cache, "resource_versions", versions)
+    monkeypatch.setattr(http_cache, "validators", ValidatorCache(maxsize=8))
+    return versions
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        http_cache, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+def test_versions_tell_what_was_written_since():
+    versions = ResourceVersions(maxsize=10)
+    before = versions.clock()
+    versions.bump("task", 1, 2)
+    assert not versions.unchanged_since([("task", 1)], before)
+    assert versions.unchanged_since([("task", 3), ("group", 1)], before)
+    assert versions.unchanged_since([("task", 1)], versions.clock())
+
+
+def test_forgotten_versions_look_written():
+    versions = ResourceVersions(maxsize=1)
+    versions.bump("task", 1)
+    seen = versions.clock()
+    versions.bump("task", 2)
+    versions.bump("task", 3)
+    # task 1 and 2 fell off: they may have been written after `seen`
+    assert not versions.unchanged_since([("task", 1)], seen - 1)
+    assert not versions.unchanged_since([("task", 2)], seen)
+
+
+def test_versioned_cache_drops_written_values(versions, clock):
+    cache = VersionedCache(maxsize=4, max_age=5)
+    cache.put(1, [("group", 1)], versions.clock(), "dashboard")
+    assert cache.get(1) == "dashboard"
+    versions.bump("group", 2)
+    assert cache.get(1) == "dashboard"
+    versions.bump("group", 1)
+    assert cache.get(1) is None
+
+
+def test_versioned_cache_expires_values(versions, clock):
+    cache = VersionedCache(maxsize=4, max_age=5)
+    cache.put(1, [("group", 1)], versions.clock(), "dashboard")
+    clock.now += 4.9
+    assert cache.get(1) == "dashboard"
+    clock.now += 0.1
+    assert cache.get(1) is None
+
+
+@pytest.mark.parametrize("maxsize, max_age", [(0, 5), (4, 0)])
+def test_versioned_cache_off(versions, clock, maxsize, max_age):
+    cache = VersionedCache(maxsize=maxsize, max_age=max_age)
+    cache.put(1, [("group", 1)], versions.clock(), "dashboard")
+    assert cache.get(1) is None
+
+
+def request(etag: str | None = None) -> Request:
+    headers = [] if etag is None else [(b"if-none-match", etag.encode())]
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("test", 80),
+            "path": "/task/",
+            "query_string": b"group_id=1",
+            "headers": headers,
+        }
+    )
+
+
+def test_conditional_get(versions):
+    first = ConditionalGet(request(), 7, "private, no-cache")
+    assert first.not_modified() is None
+    response = first.respond({"data": [1]}, [("group", 1)])
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    # answered from the validators, before the handler reads anything
+    assert ConditionalGet(request(etag), 7, "").not_modified().status_code == 304
+    assert ConditionalGet(request(etag), 8, "").not_modified() is None
+
+    versions.bump("group", 1)
+    again = ConditionalGet(request(f"W/{etag}"), 7, "")
+    assert again.not_modified() is None
+    # the rebuilt body is the same, so is its ETag
+    assert again.respond({"data": [1]}, [("group", 1)]).status_code == 304
+    assert again.respond({"data": [2]}, [("group", 1)]).status_code == 200
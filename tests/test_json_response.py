@@ -0,0 +1,54 @@
+import datetime
+import json
+from decimal import Decimal
+
+import pytest
+
+from src.meet_team_api.api.utils import json_response
+from src.meet_team_api.api.utils.json_response import JSONResponse, dumps
+
+ROW = {
+    "id": 7,
+    "rating": Decimal("4.25"),
+    "created_at": datetime.datetime(2024, 3, 1, 9, 30),
+    "updated_at": datetime.datetime(2024, 3, 1, 9, 30, 0, 1500, datetime.timezone.utc),
+    "due": datetime.date(2024, 3, 8),
+    "duration": datetime.timedelta(hours=1, minutes=5),
+    "hash": b"9fceb02",
+    "title": "Ünïcode",
+    "scores": {1: 2.5},
+}
+
+EXPECTED = {
+    "id": 7,
+    "rating": 4.25,
+    "created_at": "2024-03-01T09:30:00",
+    "updated_at": "2024-03-01T09:30:00.001500+00:00",
+    "due": "2024-03-08",
+    "duration": "1:05:00",
+    "hash": "9fceb02",
+    "title": "Ünïcode",
+    "scores": {"1": 2.5},
+}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(json_response, "orjson", None)
+    return request.param
+
+
+def test_rows_are_rendered_as_is(encoder):
+    assert json.loads(JSONResponse(ROW).body) == EXPECTED
+
+
+def test_both_encoders_agree(monkeypatch):
+    fast = dumps([ROW])
+    monkeypatch.setattr(json_response, "orjson", None)
+    assert dumps([ROW]) == fast
+
+
+def test_unknown_types_still_fail(encoder):
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
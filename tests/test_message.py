@@ -0,0 +1,41 @@
+# pylint: disable=protected-access
+from src.meet_team_api.api.handlers import handler_message
+from src.meet_team_api.api.handlers.handler_message import MessagePollBackend
+
+
+def messages(*ids):
+    return [{"id": message_id, "task_id": 1} for message_id in ids]
+
+
+def test_poll_delivers_messages_committed_late(stub_connection, monkeypatch):
+    monkeypatch.setattr(handler_message, "_with_names", lambda cur, rows: rows)
+    conn = stub_connection(handler_message)
+    poller = MessagePollBackend(window=3)
+    delivered = []
+    poller._deliver = lambda channel, message: delivered.append(
+        (channel, message["id"])
+    )
+
+    def poll(last_id, *ids):
+        conn.rows = messages(*ids)
+        return poller._poll(last_id)
+
+    # the messages there at startup aren't delivered
+    assert poll(None, 5, 4) == 5
+    # 6 is still being inserted while 7 commits
+    assert poll(5, 4, 5, 7) == 7
+    assert poll(7, 5, 6, 7) == 7
+    assert poll(7, 5, 6, 7) == 7
+    assert delivered == [("task:1", 7), ("task:1", 6)]
+    assert "WHERE id > 4" in conn.sent[-1]
+
+
+def test_poll_forgets_ids_below_the_window(stub_connection, monkeypatch):
+    monkeypatch.setattr(handler_message, "_with_names", lambda cur, rows: rows)
+    conn = stub_connection(handler_message)
+    poller = MessagePollBackend(window=2)
+    poller._deliver = lambda channel, message: None
+
+    conn.rows = messages(*range(1, 11))
+    assert poller._poll(0) == 10
+    assert poller._delivered == {9, 10}
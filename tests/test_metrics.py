@@ -0,0 +1,90 @@
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from src.meet_team_api import metrics
+from src.meet_team_api.metrics import InstrumentedCursor, TimingMiddleware
+
+from .conftest import StubConnection
+
+app = FastAPI()
+app.add_middleware(TimingMiddleware)
+
+
+@app.get("/group/{group_id}/user/{user_id}")
+async def member(group_id: int, user_id: int):
+    conn = StubConnection()
+    cur = InstrumentedCursor(conn.cursor(), "group.member")
+    cur.execute("SELECT 1")
+    cur.execute("SELECT 2")
+    return {"group_id": group_id, "user_id": user_id}
+
+
+@app.get("/task/{task_id}")
+async def task(task_id: int):
+    raise ValueError(task_id)
+
+
+commits = APIRouter()
+
+
+@commits.get("")
+async def commit_list():
+    return []
+
+
+@commits.get("/{commit_id}/task/{task_id}")
+async def commit_task(commit_id: int, task_id: int):
+    return {"commit_id": commit_id, "task_id": task_id}
+
+
+app.include_router(commits, prefix="/commit")
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    """A test client, and the requests it timed by method, route and status"""
+    histogram = metrics.Histogram("test", "", ("method", "route", "status"))
+    monkeypatch.setattr(metrics, "http_request_duration", histogram)
+    client = TestClient(app, raise_server_exceptions=False)
+    return client, histogram._series  # pylint: disable=protected-access
+
+
+def test_params_sharing_a_value_keep_their_names(requests):
+    client, timed = requests
+    assert client.get("/group/1/user/1").json() == {"group_id": 1, "user_id": 1}
+    assert list(timed) == [("GET", "/group/{group_id}/user/{user_id}", "200")]
+
+
+def test_included_routes_keep_their_prefix(requests):
+    client, timed = requests
+    client.get("/commit")
+    client.get("/commit/4/task/4")
+    assert list(timed) == [
+        ("GET", "/commit", "200"),
+        ("GET", "/commit/{commit_id}/task/{task_id}", "200"),
+    ]
+
+
+def test_unmatched_paths_share_a_label(requests):
+    client, timed = requests
+    client.get("/group/1")
+    client.get("/nowhere/7")
+    assert list(timed) == [("GET", "unmatched", "404")]
+    assert sum(timed[("GET", "unmatched", "404")][:-1]) == 2
+
+
+def test_a_failing_request_is_timed_as_a_500(requests):
+    client, timed = requests
+    assert client.get("/task/3").status_code == 500
+    assert list(timed) == [("GET", "/task/{task_id}", "500")]
+
+
+def test_server_timing_counts_the_queries(requests):
+    client, _ = requests
+    header = client.get("/group/1/user/2").headers["server-timing"]
+    app_timing, db_timing, pool_timing = header.split(", ")
+    assert app_timing.startswith("app;dur=")
+    assert db_timing.startswith("db;dur=")
+    assert db_timing.endswith(';desc="2 queries"')
+    assert pool_timing == "pool;dur=0.0"
@@ -0,0 +1,41 @@
+import pytest
+
+from src.meet_team_api import migrate
+
+
+def test_split_statements():
+    sql = """
+    -- the first index
+    CREATE INDEX a ON task (group_id);
+      -- an indented comment; with a semicolon
+    ALTER TABLE task
+        ADD COLUMN x INT;
+
+    ;
+    """
+    assert migrate.split_statements(sql) == [
+        "CREATE INDEX a ON task (group_id)",
+        "ALTER TABLE task\n        ADD COLUMN x INT",
+    ]
+
+
+def test_split_statements_without_a_final_semicolon():
+    assert migrate.split_statements("SELECT 1; SELECT 2") == ["SELECT 1", "SELECT 2"]
+
+
+def test_migrations_are_numbered_in_order():
+    versions = [version for version, _, _ in migrate.available_migrations()]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+@pytest.mark.parametrize(
+    "path",
+    [path for _, _, path in migrate.available_migrations()],
+    ids=lambda path: path.name,
+)
+def test_migrations_split_into_statements(path):
+    statements = migrate.split_statements(path.read_text())
+    assert statements
+    for statement in statements:
+        assert "--" not in statement
+        assert statement.split()[0].isupper()
@@ -0,0 +1,72 @@
+import asyncio
+
+from src.meet_team_api.api.utils import pubsub
+from src.meet_team_api.api.utils.pubsub import Broker
+
+
+def message(message_id):
+    return {"id": message_id, "task_id": 1}
+
+
+def test_seen_drops_duplicates_and_the_backlog():
+    async def main():
+        subscription = Broker().subscribe("task:1", last_id=5)
+        assert subscription.seen(message(5))
+        assert not subscription.seen(message(7))
+        assert subscription.seen(message(7))
+        # committed after 7, still new
+        assert not subscription.seen(message(6))
+        assert subscription.last_id == 7
+        # journaled and not flushed yet
+        assert not subscription.seen({"id": None, "ref": "a"})
+
+    asyncio.run(main())
+
+
+def test_seen_forgets_past_the_queue_size(monkeypatch):
+    monkeypatch.setattr(pubsub, "SUBSCRIBER_QUEUE_SIZE", 3)
+
+    async def main():
+        subscription = Broker().subscribe("task:1")
+        for message_id in (1, 2, 3, 4):
+            assert not subscription.seen(message(message_id))
+        # 1 fell off the recent ids, everything up to it counts as seen
+        assert subscription.seen(message(1))
+        assert subscription.seen(message(4))
+        assert not subscription.seen(message(5))
+
+    asyncio.run(main())
+
+
+def test_get_skips_what_was_seen():
+    async def main():
+        broker = Broker()
+        with broker.subscribe("task:1") as subscription:
+            for message_id in (1, 1, 2):
+                broker.publish("task:1", message(message_id))
+            assert await subscription.get(0.1) == message(1)
+            assert await subscription.get(0.1) == message(2)
+            assert await subscription.get(0.01) is None
+        assert broker.stats()["subscribers"] == 0
+
+    asyncio.run(main())
+
+
+def test_overflow_cuts_the_subscription_off(monkeypatch):
+    monkeypatch.setattr(pubsub, "SUBSCRIBER_QUEUE_SIZE", 2)
+
+    async def main():
+        broker = Broker()
+        subscription = broker.subscribe("task:1")
+        for message_id in range(3):
+            broker.publish("task:1", message(message_id + 1))
+        await asyncio.sleep(0)
+        assert subscription.overflowed
+        assert broker.channels() == []
+        assert [await subscription.get(0.1) for _ in range(3)] == [
+            message(1),
+            message(2),
+            None,
+        ]
+
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+import ast
+import re
+
+from src.meet_team_api import db
+from src.meet_team_api.api.handlers import review
+from src.meet_team_api.api.utils import ratings
+
+from .conftest import StubConnection
+
+
+def upserted(conn, table):
+    """The rows of the aggregate upsert into `table`, as bound"""
+    (statement,) = [sql for sql in conn.sent if f"INSERT INTO {table} " in sql]
+    values = re.search(r"VALUES (.*?) ON DUPLICATE", " ".join(statement.split()))
+    return list(ast.literal_eval(f"[{values[1]}]"))
+
+
+def fold(aggregates, rows):
+    """What MySQL makes of the upsert, the key being all but the last two"""
+    aggregates = dict(aggregates)
+    for *key, sum_delta, count_delta in rows:
+        rating_sum, count = aggregates.get(tuple(key), (0, 0))
+        aggregates[tuple(key)] = (rating_sum + sum_delta, count + count_delta)
+    return aggregates
+
+
+def apply(old, new, group_id=5):
+    conn = StubConnection()
+    ratings.apply_ratings(conn.cursor(), group_id, old, new)
+    return conn
+
+
+def test_a_new_rating_is_counted():
+    conn = apply({}, {3: 4.0})
+    assert upserted(conn, "user_group_rating") == [(3, 5, 4.0, 1)]
+    assert upserted(conn, "user_rating") == [(3, 4.0, 1)]
+
+
+def test_a_replaced_rating_only_moves_the_sum():
+    conn = apply({2: 3.0}, {2: 1.5})
+    assert upserted(conn, "user_group_rating") == [(2, 5, -1.5, 0)]
+    assert upserted(conn, "user_rating") == [(2, -1.5, 0)]
+
+
+def test_a_mixed_batch_keeps_the_averages():
+    # user 2 had 3.0 from this reviewer and 5.0 from another, user 3 nothing
+    stored = {(2, 5): (8.0, 2)}
+    conn = apply({2: 3.0}, {2: 4.5, 3: 2.0})
+
+    assert fold(stored, upserted(conn, "user_group_rating")) == {
+        (2, 5): (9.5, 2),
+        (3, 5): (2.0, 1),
+    }
+    assert fold({(2,): (8.0, 2)}, upserted(conn, "user_rating")) == {
+        (2,): (9.5, 2),
+        (3,): (2.0, 1),
+    }
+
+
+def test_nothing_to_apply():
+    assert not apply({}, {}).sent
+    assert ratings.previous_ratings(StubConnection().cursor(), 5, 1, []) == {}
+
+
+def test_upsert_review_applies_what_it_replaced(stub_connection, monkeypatch):
+    monkeypatch.setattr(review.resource_versions, "bump", lambda *args: None)
+    conn = stub_connection(db, rows=[{"user_id": 2, "rating": 3.0}])
+
+    review.upsert_review.__wrapped__(
+        5,
+        1,
+        {
+            "2": {"content": "better", "rating": 4.3},
+            "3": {"content": "good", "rating": 5},
+        },
+    )
+
+    select = " ".join(conn.sent[0].split())
+    assert select.endswith("user_id IN (2, 3) FOR UPDATE")
+    assert upserted(conn, "user_group_rating") == [(2, 5, 1.0, 0), (3, 5, 5.0, 1)]
+    assert conn.commits == 1
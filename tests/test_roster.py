@@ -0,0 +1,100 @@
+import pytest
+
+from src.meet_team_api.api.handlers import roster
+from src.meet_team_api.api.utils.user_in_group import MembershipCache
+
+ENTRIES = [
+    {"account": "ann", "group": "A"},
+    {"account": " bob ", "role": "TA", "group": "A"},
+    {"account": "cid", "group": "A"},
+    {"account": ""},
+    {"account": "dan", "role": "Admin"},
+    {"account": "eve", "group": "Z"},
+    {"account": "zed"},
+]
+
+
+@pytest.fixture
+def importing(stub_connection, monkeypatch):
+    monkeypatch.setattr(roster, "ROSTER_BATCH_SIZE", 3)
+    monkeypatch.setattr(roster, "membership_cache", MembershipCache())
+    monkeypatch.setattr(roster.resource_versions, "bump", lambda *args: None)
+    return stub_connection(roster)
+
+
+def test_import_roster(importing):
+    importing.results = [
+        # the groups of the course
+        [{"id": 10, "name": "A"}],
+        # first batch: bob is enrolled, cid is in group A too
+        [{"id": 1, "account": "ann"}, {"id": 2, "account": "bob"}]
+        + [{"id": 3, "account": "cid"}],
+        [{"user_id": 2}, {"user_id": 3}],
+        [{"user_id": 3, "group_id": 10}],
+        # second batch: zed has no account
+        [{"id": 4, "account": "dan"}, {"id": 5, "account": "eve"}],
+        [],
+        [],
+        # third batch
+        [],
+    ]
+
+    batches = list(roster.import_roster(9, ENTRIES))
+
+    assert [[r["status"] for r in batch] for batch in batches] == [
+        ["enrolled", "grouped", "unchanged"],
+        ["unknown account", "invalid role", "unknown group"],
+        ["unknown account"],
+    ]
+    assert batches[0][1] == {
+        "row": 2,
+        "account": "bob",
+        "user_id": 2,
+        "group_id": 10,
+        "status": "grouped",
+    }
+    assert [r["row"] for batch in batches for r in batch] == list(range(1, 8))
+
+    writes = [" ".join(sql.split()) for sql in importing.sent if "INSERT" in sql]
+    assert writes == [
+        "INSERT IGNORE INTO course_member (course_id, user_id, role) "
+        "VALUES (9, 1, 'Stu')",
+        "INSERT IGNORE INTO group_member (user_id, group_id) VALUES (1, 10), (2, 10)",
+    ]
+    assert importing.commits == 3
+    assert roster.membership_cache.groups_of(1) is None
+
+
+def test_import_roster_twice_writes_nothing(importing):
+    importing.results = [
+        [{"id": 10, "name": "A"}],
+        [{"id": 1, "account": "ann"}],
+        [{"user_id": 1}],
+        [{"user_id": 1, "group_id": 10}],
+    ]
+    (batch,) = roster.import_roster(9, ENTRIES[:1])
+    assert batch[0]["status"] == "unchanged"
+    assert not [sql for sql in importing.sent if "INSERT" in sql]
+
+
+@pytest.mark.parametrize(
+    "body, content_type",
+    [
+        (b"name,role\nann,Stu\n", "text/csv"),
+        (b'{"students": {"account": "ann"}}', "application/json"),
+        (b'["ann"]', "application/json"),
+    ],
+)
+def test_parse_roster_rejects_malformed_bodies(body, content_type):
+    with pytest.raises(ValueError):
+        roster.parse_roster(body, content_type)
+
+
+def test_parse_roster():
+    csv = b"\xef\xbb\xbfaccount,role,group\nann,TA,A\n"
+    assert roster.parse_roster(csv, "text/csv; charset=utf-8") == [
+        {"account": "ann", "role": "TA", "group": "A"}
+    ]
+    assert roster.parse_roster(b'{"students": [{"account": "ann"}]}', "") == [
+        {"account": "ann"}
+    ]
@@ -0,0 +1,55 @@
+import pytest
+
+from src.meet_team_api.slow_query import normalize, params_shape
+
+
+@pytest.mark.parametrize(
+    "sql, normalized",
+    [
+        (
+            "SELECT * FROM task\n  WHERE id = %s AND status = 'Done'",
+            "SELECT * FROM task WHERE id = ? AND status = ?",
+        ),
+        (
+            "SELECT name FROM `user` WHERE id IN (%s, %s, %s)",
+            "SELECT name FROM `user` WHERE id IN (...)",
+        ),
+        (
+            "SELECT * FROM task WHERE id IN (3, 4) LIMIT 10 OFFSET -1",
+            "SELECT * FROM task WHERE id IN (...) LIMIT ? OFFSET ?",
+        ),
+        (
+            "INSERT INTO message (task_id, description) VALUES (%s, %s), (%s, %s)",
+            "INSERT INTO message (task_id, description) VALUES (...), ...",
+        ),
+        (
+            'SELECT * FROM t1 WHERE name = %(name)s AND note = "it\'s"',
+            "SELECT * FROM t1 WHERE name = ? AND note = ?",
+        ),
+        (
+            "SELECT 'a\\'b;' AS x, 1.5 AS y",
+            "SELECT ? AS x, ? AS y",
+        ),
+    ],
+)
+def test_normalize(sql, normalized):
+    assert normalize(sql) == normalized
+
+
+def test_runs_with_different_values_group_together():
+    assert normalize("SELECT * FROM task WHERE id IN (1, 2)") == normalize(
+        "SELECT * FROM task WHERE id IN (%s, %s, %s)"
+    )
+
+
+@pytest.mark.parametrize(
+    "params, shape",
+    [
+        (None, "()"),
+        ((1, "a", None), "(int, str, NoneType)"),
+        ({"id": 1}, "{id: int}"),
+        (list(range(10)), "(int, int, int, int, int, int, int, int, ... 10 params)"),
+    ],
+)
+def test_params_shape(params, shape):
+    assert params_shape(params) == shape
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from src.meet_team_api.api.handlers import task
+
+
+def test_find_one_binds_its_parameters(stub_connection):
+    detail = {"task": {"id": 7}, "commits": []}
+    conn = stub_connection(task, rows=[{"detail": json.dumps(detail)}])
+
+    assert task.find_one.__wrapped__(7, 3) == detail
+
+    (statement,) = conn.sent
+    assert statement.count("DATE_FORMAT") == 3
+    assert statement.count("'%Y-%m-%dT%H:%i:%s'") == 3
+    assert "%%" not in statement
+    assert "gm.user_id=3" in statement
+    assert "t.id=7" in statement
+
+
+@pytest.fixture
+def tasks(stub_connection, monkeypatch):
+    """A stub primary, with every user a member of the groups they name"""
+    monkeypatch.setattr(task, "user_in_group", lambda *args: True)
+    monkeypatch.setattr(task.resource_versions, "bump", lambda *args: None)
+    return stub_connection(task)
+
+
+def inserts(conn):
+    return [sql for sql in conn.sent if sql.lstrip().startswith("INSERT")]
+
+
+def rows(n):
+    return [(f"t{i}", "", 1, 2, None, None) for i in range(n)]
+
+
+def test_insert_tasks_across_a_chunk_boundary(tasks):
+    tasks.results = [[{"step": 1}]]
+    tasks.insert_ids = [100, 700]
+
+    ids = task._insert_tasks(tasks.cursor(), rows(task.TASK_INSERT_CHUNK + 1))
+
+    assert ids == [*range(100, 600), 700]
+    assert [sql.count("('t") for sql in inserts(tasks)] == [500, 1]
+
+
+def test_insert_tasks_with_an_increment_step(tasks):
+    tasks.results = [[{"step": 3}]]
+    tasks.insert_ids = [10]
+    assert task._insert_tasks(tasks.cursor(), rows(3)) == [10, 13, 16]
+
+
+def new_task(name, assignee=None, reviewer=None):
+    return {
+        "name": name,
+        "description": "",
+        "assignee": assignee,
+        "reviewer": reviewer,
+    }
+
+
+def test_bulk_create(tasks):
+    tasks.results = [[{"user_id": 4}, {"user_id": 5}], [{"step": 1}]]
+    tasks.insert_ids = [20]
+
+    ids = task.bulk_create.__wrapped__(
+        2, 1, [new_task("a", 4, 5), new_task("b"), new_task("c", 5)]
+    )
+
+    assert ids == [20, 21, 22]
+    assert "user_id IN (4, 5)" in " ".join(tasks.sent[0].split())
+    assert "('a', '', 1, 2, 4, 5), ('b', '', 1, 2, NULL, NULL)" in inserts(tasks)[0]
+    assert tasks.commits == 1
+
+
+def test_bulk_create_rejects_outsiders(tasks):
+    tasks.results = [[{"user_id": 4}]]
+    with pytest.raises(ValueError, match=r"Users \[6, 9\] are not members"):
+        task.bulk_create.__wrapped__(2, 1, [new_task("a", 4, 9), new_task("b", 6)])
+    assert not inserts(tasks)
+    assert tasks.commits == 0
+
+
+def test_create_from_template_splits_the_ids_per_group(tasks):
+    tasks.results = [[{"id": 11}, {"id": 12}, {"id": 15}], [{"step": 2}]]
+    tasks.insert_ids = [40]
+
+    created = task.create_from_template.__wrapped__(
+        2, 9, [new_task("intro"), new_task("report")]
+    )
+
+    assert created == {11: [40, 42], 12: [44, 46], 15: [48, 50]}
+    (insert,) = inserts(tasks)
+    assert insert.count("'intro'") == 3
+    assert insert.index("('report', '', 11,") < insert.index("('intro', '', 12,")
@@ -0,0 +1,62 @@
+import pytest
+
+from src.meet_team_api.api.utils.trigram import TrigramIndex, trigrams
+
+COURSES = {
+    1: "Materials Science",
+    2: "Construction Management",
+    3: "Database Systems",
+    4: "Data Structures",
+    5: "Discrete Mathematics",
+    6: "AI",
+}
+
+
+@pytest.fixture
+def index():
+    index = TrigramIndex()
+    for doc_id, name in COURSES.items():
+        index.add(doc_id, name)
+    return index
+
+
+def matches(index, query):
+    return [doc_id for doc_id, _ in index.search(query)]
+
+
+def test_trigrams_are_padded_and_folded():
+    assert trigrams("Go") == {"  g", " go", "go "}
+    assert trigrams("Go", prefix=True) == {"  g", " go"}
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("math", [5]),
+        ("base", [3]),
+        ("ruct", [2, 4]),
+        ("DATA", [3, 4]),
+        ("data str", [4]),
+        ("sys data", [3]),
+        ("ai", [6]),
+        ("al", [1]),
+        ("mathematics science", []),
+        ("", []),
+    ],
+)
+def test_search_matches_substrings(index, query, expected):
+    assert matches(index, query) == expected
+
+
+def test_search_is_like_a_substring_filter(index):
+    for query in ("ma", "ster", "tion man", "at", "s"):
+        expected = {
+            doc_id
+            for doc_id, name in COURSES.items()
+            if all(word in name.casefold() for word in query.split())
+        }
+        assert set(matches(index, query)) == expected
+
+
+def test_word_starts_rank_first(index):
+    assert index.search("struct") == [(4, 1.0), (2, 0.0)]
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.meet_team_api.api.utils import user_in_group as membership
+from src.meet_team_api.api.utils.user_in_group import MembershipCache
+
+from .conftest import StubConnection
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        membership, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+@pytest.fixture
+def cache(monkeypatch, clock):
+    cache = MembershipCache(ttl=60, maxsize=2)
+    monkeypatch.setattr(membership, "membership_cache", cache)
+    return cache
+
+
+def test_groups_expire(cache, clock):
+    cache.set_groups(1, frozenset({10}))
+    clock.now += 59
+    assert cache.groups_of(1) == {10}
+    clock.now += 1
+    assert cache.groups_of(1) is None
+
+
+def test_invalidate_user(cache):
+    cache.set_groups(1, frozenset({10}))
+    cache.set_groups(2, frozenset({20}))
+    cache.invalidate_user(1)
+    assert cache.groups_of(1) is None
+    assert cache.groups_of(2) == {20}
+
+
+def test_least_recently_used_are_evicted(cache):
+    for user_id in (1, 2):
+        cache.set_groups(user_id, frozenset({user_id}))
+    cache.groups_of(1)
+    cache.set_groups(3, frozenset({3}))
+    assert [cache.groups_of(user_id) for user_id in (1, 2, 3)] == [{1}, None, {3}]
+
+
+def test_hits_skip_the_database(cache):
+    conn = StubConnection([{"group_id": 10}])
+    assert membership.user_in_group(1, 10, conn.cursor())
+    assert membership.user_in_group(1, 10, conn.cursor())
+    assert len(conn.sent) == 1
+
+
+def test_misses_are_checked_again(cache):
+    cache.set_groups(1, frozenset({10}))
+    conn = StubConnection([{"group_id": 10}, {"group_id": 20}])
+    # joined group 20 through another worker
+    assert membership.user_in_group(1, 20, conn.cursor())
+    assert cache.groups_of(1) == {10, 20}
+
+    with pytest.raises(Exception, match="not in this group"):
+        membership.user_in_group(1, 30, conn.cursor())
+    assert len(conn.sent) == 2
+
+
+def test_task_groups_are_cached(cache):
+    conn = StubConnection([{"group_id": 10}])
+    assert membership.task_group(5, conn.cursor()) == 10
+    assert membership.task_group(5, conn.cursor()) == 10
+    assert len(conn.sent) == 1
+
+    with pytest.raises(Exception, match="not in this group"):
+        membership.task_group(6, conn.cursor())
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.meet_team_api.api.utils import user_loader
+from src.meet_team_api.api.utils.user_loader import UserLoader, UserProfileCache
+
+from .conftest import StubConnection
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(user_loader, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def profile(user_id, name):
+    return {"id": user_id, "name": name, "description": None, "account": "x"}
+
+
+def test_profiles_expire(clock):
+    cache = UserProfileCache(maxsize=10, ttl=60)
+    cache.put_many([profile(1, "Ann")])
+    clock.now += 59
+    assert cache.get_many([1, 2]) == {1: {"id": 1, "name": "Ann", "description": None}}
+    clock.now += 1
+    assert cache.get_many([1]) == {}
+
+
+def test_profiles_are_evicted_least_recently_used(clock):
+    cache = UserProfileCache(maxsize=2, ttl=60)
+    cache.put_many([profile(1, "Ann"), profile(2, "Bob")])
+    cache.get_many([1])
+    cache.put_many([profile(3, "Cid")])
+    assert set(cache.get_many([1, 2, 3])) == {1, 3}
+
+
+def test_loader_reloads_expired_profiles(clock, monkeypatch):
+    monkeypatch.setattr(user_loader, "user_profiles", UserProfileCache(ttl=60))
+    conn = StubConnection([profile(1, "Ann")])
+    UserLoader(conn.cursor()).load_many([1])
+
+    conn.rows = [profile(1, "Anne")]
+    rows = UserLoader(conn.cursor()).resolve_names([{"by": 1}], "by", "by_name")
+    assert rows == [{"by": 1, "by_name": "Ann"}]
+    assert len(conn.sent) == 1
+
+    clock.now += 60
+    rows = UserLoader(conn.cursor()).resolve_names([{"by": 1}], "by", "by_name")
+    assert rows == [{"by": 1, "by_name": "Anne"}]
+    assert (
+        conn.sent[-1].split()
+        == "SELECT id, name, description FROM `user` WHERE id IN (1)".split()
+    )
@@ -0,0 +1,122 @@
+import re
+from contextlib import contextmanager
+
+import pytest
+
+from src.meet_team_api import db
+from src.meet_team_api.api.handlers import commit
+from src.meet_team_api.write_behind import Journal, WriteBehind
+
+from .conftest import StubConnection
+
+COMMIT = {
+    "user_id": 7,
+    "group_id": 3,
+    "title": "fix",
+    "description": "",
+    "reference_link": None,
+}
+
+
+def test_each_journal_claims_its_own_slot(tmp_path):
+    pattern = str(tmp_path / "journal.{slot}.db")
+    first, second = Journal(pattern), Journal(pattern)
+    first.append("message", {"n": 1})
+    second.append("message", {"n": 2})
+
+    assert first.path.endswith("journal.0.db")
+    assert second.path.endswith("journal.1.db")
+    assert [payload for _, _, payload in first.pending(10)] == [{"n": 1}]
+    first.close()
+    second.close()
+
+
+def test_a_restarted_worker_replays_a_free_slot(tmp_path):
+    pattern = str(tmp_path / "journal.{slot}.db")
+    crashed = Journal(pattern)
+    crashed.append("commit", {"n": 1})
+    crashed.close()
+
+    restarted = Journal(pattern)
+    assert restarted.size() == 1
+    assert restarted.path == crashed.path
+    ((seq, kind, payload),) = restarted.pending(10)
+    restarted.remove(seq)
+    assert (kind, payload, restarted.size()) == ("commit", {"n": 1}, 0)
+    restarted.close()
+
+
+def test_a_fixed_path_is_not_shared(tmp_path):
+    path = str(tmp_path / "journal.db")
+    owner = Journal(path)
+    owner.append("message", {"n": 1})
+
+    with pytest.raises(ValueError, match="used by another process"):
+        Journal(path).size()
+    owner.close()
+    reopened = Journal(path)
+    assert reopened.size() == 1
+    reopened.close()
+
+
+class CommitTable(StubConnection):
+    """The `commit` table as far as its unique `client_ref` goes"""
+
+    def __init__(self):
+        super().__init__()
+        self.refs: list[str] = []
+
+    def cmd_query(self, query, *args, **kwargs):
+        ok = super().cmd_query(query, *args, **kwargs)
+        sql = " ".join(self.sent[-1].split())
+        if sql.startswith("INSERT IGNORE INTO"):
+            for ref in re.findall(r"'([0-9a-f]{32})'\)", sql):
+                if ref not in self.refs:
+                    self.refs.append(ref)
+        return ok
+
+
+def behind(path) -> WriteBehind:
+    write_behind = WriteBehind(enabled=True, path=path, batch=10)
+    write_behind.register("commit", commit._flush_journal)
+    return write_behind
+
+
+def test_replaying_a_flushed_journal_inserts_nothing_twice(tmp_path, monkeypatch):
+    table = CommitTable()
+
+    @contextmanager
+    def get_connection():
+        yield table
+
+    monkeypatch.setattr(db, "get_connection", get_connection)
+    monkeypatch.setattr(commit.resource_versions, "bump", lambda *args: None)
+    path = str(tmp_path / "journal.{slot}.db")
+
+    crashed = behind(path)
+    refs = [
+        crashed.enqueue("commit", {**COMMIT, "task_id": task_id})
+        for task_id in (1, 2, 2)
+    ]
+
+    def crash(last_seq):
+        raise SystemExit("killed between the MySQL commit and the truncate")
+
+    monkeypatch.setattr(crashed.journal, "remove", crash)
+    with pytest.raises(SystemExit):
+        crashed.flush()
+    crashed.journal.close()
+    assert table.refs == refs
+    assert table.commits == 1
+
+    restarted = behind(path)
+    assert restarted.journal.size() == 3
+    assert restarted.flush() == 3
+
+    assert table.refs == refs
+    assert table.commits == 2
+    assert restarted.journal.size() == 0
+    assert restarted.flush() == 0
+    replays = [sql for sql in table.sent if "INSERT IGNORE" in sql]
+    assert len(replays) == 2 and replays[0] == replays[1]
+    restarted.journal.close()